@@ -5,27 +5,24 @@ import urbs
 
 input_files = 'Input'
 result_name = 'Mimo-ex'
-result_dir = urbs.prepare_result_directory(result_name)  # name + time stamp
-
-# copy input file to result directory
-try:
-    shutil.copytree(input_files, os.path.join(result_dir, 'Input'))
-except NotADirectoryError:
-    shutil.copyfile(input_files, os.path.join(result_dir, input_files))
-# copy runme.py to result directory
-shutil.copy(__file__, result_dir)
-
 # objective function
 objective = 'cost' # set either 'cost' or 'CO2' as objective
 
 # Choose Solver (cplex, glpk, gurobi, ...)
-solver = 'glpk'
+solver = 'glpk'  # or e.g. 'highs' (pip install highspy), solved in memory
 
 # simulation timesteps
 (offset, length) = (3500, 168)  # time step selection
 timesteps = range(offset, offset+length+1)
 dt = 1  # length of each time step (unit: hours)
 
+# optional: aggregate the timesteps to a number of representative periods
+# of period_length timesteps (c.f. urbs.aggregate_periods), e.g. a full year
+# (offset, length) = (0, 8760) with periods = 12; the plot periods then
+# refer to the aggregated timesteps
+periods = None
+period_length = 24
+
 # detailed reporting commodity/sites
 report_tuples = [
     (2019, 'North', 'Elec'),
@@ -96,11 +93,36 @@ scenarios = [
              urbs.scenario_all_together
             ]
 
-for scenario in scenarios:
-    prob = urbs.run_scenario(input_files, solver, timesteps, scenario, 
-                        result_dir, dt, objective, 
-                        plot_tuples=plot_tuples,
-                        plot_sites_name=plot_sites_name,
-                        plot_periods=plot_periods,
-                        report_tuples=report_tuples,
-                        report_sites_name=report_sites_name)
+# number of parallel worker processes (at most one per scenario); the
+# cores are split evenly among the solvers of the workers
+jobs = os.cpu_count()
+
+# the guard is required for parallel runs (jobs > 1), as worker processes
+# import this script
+if __name__ == '__main__':
+    # name + time stamp
+    result_dir = urbs.prepare_result_directory(result_name)
+
+    # copy input file to result directory
+    try:
+        shutil.copytree(input_files, os.path.join(result_dir, 'Input'),
+                        ignore=shutil.ignore_patterns('.cache'))
+    except NotADirectoryError:
+        shutil.copyfile(input_files, os.path.join(result_dir, input_files))
+    # copy runme.py to result directory
+    shutil.copy(__file__, result_dir)
+
+    # the model is built once and updated for each scenario where possible
+    # (c.f. urbs.run_scenarios); use urbs.run_scenario for a single scenario.
+    # Solved scenarios are cached in Input/.cache/results, so that a rerun,
+    # e.g. after an interruption, only solves the missing ones
+    status = urbs.run_scenarios(input_files, solver, timesteps, scenarios,
+                                result_dir, dt, objective,
+                                plot_tuples=plot_tuples,
+                                plot_sites_name=plot_sites_name,
+                                plot_periods=plot_periods,
+                                report_tuples=report_tuples,
+                                report_sites_name=report_sites_name,
+                                jobs=jobs, periods=periods,
+                                period_length=period_length, cache=True)
+    print(dict(zip((s.__name__ for s in scenarios), status)))
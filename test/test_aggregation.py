@@ -0,0 +1,29 @@
+import os
+import pytest
+
+pytest.importorskip('pyomo')
+import urbs
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+
+
+@pytest.fixture(scope='module')
+def data():
+    return urbs.read_input(INPUT, 2019, cache=False)
+
+
+@pytest.mark.parametrize('periods', [12, 24])
+def test_aggregate_full_year(data, periods):
+    aggregated = urbs.aggregate_periods(data, range(0, 8761), periods, 24)
+    assert len(aggregated['period']) == 365
+    assert aggregated['period']['representative'].nunique() <= periods
+    assert (aggregated['demand'].index.get_level_values('t').nunique() ==
+            aggregated['period']['representative'].nunique() * 24 + 1)
+
+
+@pytest.mark.parametrize('periods', [6, 60])
+def test_aggregate_up_to_all_days(data, periods):
+    aggregated = urbs.aggregate_periods(data, range(0, 60 * 24 + 1),
+                                        periods, 24)
+    assert len(aggregated['period']) == 60
+    assert aggregated['period']['representative'].nunique() <= periods
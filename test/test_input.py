@@ -0,0 +1,30 @@
+import os
+import shutil
+import pytest
+
+pytest.importorskip('pyomo')
+import urbs
+import urbs.input
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+
+
+def test_workbook_cache_is_opt_in(tmp_path):
+    filename = str(tmp_path / '2019.xlsx')
+    shutil.copyfile(INPUT, filename)
+    urbs.read_input(filename, 2019)
+    assert not os.path.exists(str(tmp_path / '.cache'))
+
+    cached = urbs.read_input(filename, 2019, cache=True)
+    assert os.path.exists(urbs.input.workbook_cache_file(filename, 2019))
+    assert cached['demand'].equals(
+        urbs.read_input(filename, 2019, cache=True)['demand'])
+
+
+def test_workbook_cache_file_version(tmp_path, monkeypatch):
+    filename = str(tmp_path / '2019.xlsx')
+    shutil.copyfile(INPUT, filename)
+    before = urbs.input.workbook_cache_file(filename, 2019)
+    monkeypatch.setattr(urbs.input, 'WORKBOOK_CACHE_VERSION',
+                        urbs.input.WORKBOOK_CACHE_VERSION + 1)
+    assert urbs.input.workbook_cache_file(filename, 2019) != before
@@ -0,0 +1,39 @@
+import os
+import pytest
+
+pyomo = pytest.importorskip('pyomo.environ')
+pytest.importorskip('scipy')
+import urbs
+from urbs.saveload import create_result_cache
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+TIMESTEPS = range(0, 7)
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = urbs.read_input(INPUT, 2019, cache=False)
+    # features not supported by the sparse LP backend
+    for name in ('dsm', 'buy_sell_price', 'eff_factor'):
+        data[name] = data[name].iloc[0:0]
+    return data
+
+
+def test_lp_result_round_trip(data):
+    lp = urbs.create_lp(data, 1, TIMESTEPS)
+    assert urbs.solve_lp(lp).status == 0
+    result = urbs.get_lp_result(lp)
+
+    prob = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    variables = list(prob.component_data_objects(pyomo.Var))
+    assert urbs.set_start_values(prob, result) == len(variables)
+    assert pyomo.value(prob.objective_function) == pytest.approx(
+        lp.c.dot(lp.x), rel=1e-6)
+
+    cache = create_result_cache(prob)
+    for name in urbs.list_entities(prob, 'var').index:
+        expected = cache[name]
+        actual = urbs.get_entity(result, name)
+        assert actual.index.names == expected.index.names, name
+        assert actual.reindex(expected.index).values == pytest.approx(
+            expected.values, abs=1e-6), name
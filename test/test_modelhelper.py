@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyomo')
+from urbs.features.modelhelper import timestep_weights
+
+
+def test_timestep_weights_scalar_and_series_dt():
+    timesteps = list(range(10, 15))
+    m = SimpleNamespace(timesteps=timesteps, mode={'rep': False})
+    scalar = timestep_weights(m, 2)
+    series = timestep_weights(m, pd.Series(2, index=timesteps[1:]))
+
+    assert scalar == pytest.approx(series)
+    assert scalar[timesteps[1]] == pytest.approx(8760 / (5 * 2))
+
@@ -0,0 +1,42 @@
+import os
+from datetime import date
+import pytest
+
+pyomo = pytest.importorskip('pyomo.environ')
+import urbs
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+TIMESTEPS = range(0, 7)
+
+
+def test_scenario_cache_dir():
+    assert urbs.scenario_cache_dir('Input', False) is None
+    assert urbs.scenario_cache_dir('Input', True) == os.path.join(
+        'Input', '.cache', 'results')
+    assert urbs.scenario_cache_dir(os.path.join('a', 'in.xlsx'), True) == \
+        os.path.join('a', '.cache', 'results')
+    assert urbs.scenario_cache_dir('Input', 'cache') == 'cache'
+
+
+def test_rerun_loads_cached_scenario(tmp_path):
+    # stand-in result of a previous, interrupted batch
+    data = urbs.scenario_base(urbs.read_input(INPUT, date.today().year))
+    cache_dir = str(tmp_path / 'cache')
+    cache_file = urbs.scenario_cache_file(
+        data, (list(TIMESTEPS), 1, 'cost', 'glpk', {'mutable': True}),
+        cache_dir)
+    prob = urbs.create_model(data, timesteps=TIMESTEPS, dual=False,
+                             mutable=True)
+    for var in prob.component_data_objects(pyomo.Var):
+        var.value = 1
+    urbs.write_scenario_cache(prob, cache_file)
+
+    # a new result directory, the cached scenario is not solved again
+    result_dir = str(tmp_path / 'result')
+    os.makedirs(result_dir)
+    status = urbs.run_scenarios(INPUT, 'glpk', TIMESTEPS,
+                                [urbs.scenario_base], result_dir, 1, 'cost',
+                                cache=cache_dir, save_only=True)
+    assert status == ['optimal']
+    saved = urbs.load(os.path.join(result_dir, 'scenario_base.h5'))
+    assert (saved._result['e_co_stock'] == 1).all()
@@ -0,0 +1,39 @@
+import os
+import pytest
+
+pyomo = pytest.importorskip('pyomo.environ')
+import urbs
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+TIMESTEPS = range(0, 7)
+
+
+@pytest.fixture(scope='module')
+def prob():
+    data = urbs.read_input(INPUT, 2019, cache=False)
+    prob = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    # stand-in solution, the result functions only read variable values
+    for var in prob.component_data_objects(pyomo.Var):
+        var.value = 1
+    return prob
+
+
+def test_stock_commodity_entities(prob):
+    assert len(prob.com_stock_tuples) > 0
+    stock = urbs.get_entity(prob, 'e_co_stock')
+    assert stock.index.names == ['t', 'stf', 'sit', 'com', 'com_type']
+    assert len(stock) == len(prob.tm) * len(prob.com_stock_tuples)
+    assert 'e_co_stock' in urbs.list_entities(prob, 'var').index
+
+
+def test_get_timeseries_and_save(prob, tmp_path):
+    stf, sit, _, _ = next(iter(prob.com_stock_tuples))
+    created, consumed = urbs.get_timeseries(prob, stf, 'Elec', sit)[:2]
+    assert (consumed['Demand'] > 0).all()
+    assert created.index.tolist() == list(TIMESTEPS[1:])
+
+    filename = str(tmp_path / 'result.h5')
+    urbs.save(prob, filename)
+    loaded = urbs.load(filename)
+    assert len(loaded._result['e_co_stock']) == len(prob.tm) * len(
+        prob.com_stock_tuples)
@@ -0,0 +1,97 @@
+import os
+import pytest
+
+pyomo = pytest.importorskip('pyomo.environ')
+from pyomo.core.expr.current import identify_variables
+import urbs
+
+INPUT = os.path.join(os.path.dirname(__file__), '..', 'Input', '2019.xlsx')
+TIMESTEPS = range(0, 13)
+
+
+def old_initial_and_final_storage_state_rule(m, t, stf, sit, sto, com):
+    # former formulation, declared for every timestep
+    if t == m.t[1]:
+        return (m.e_sto_con[t, stf, sit, sto, com] ==
+                m.cap_sto_c[stf, sit, sto, com] *
+                m.storage_dict['init'][(stf, sit, sto, com)])
+    elif t == m.t[len(m.t)]:
+        return (m.e_sto_con[t, stf, sit, sto, com] >=
+                m.cap_sto_c[stf, sit, sto, com] *
+                m.storage_dict['init'][(stf, sit, sto, com)])
+    else:
+        return pyomo.Constraint.Skip
+
+
+def old_initial_and_final_storage_state_var_rule(m, t, stf, sit, sto, com):
+    return (m.e_sto_con[m.t[1], stf, sit, sto, com] <=
+            m.e_sto_con[m.t[len(m.t)], stf, sit, sto, com])
+
+
+def use_old_formulation(m):
+    m.res_initial_storage_state.deactivate()
+    m.res_final_storage_state.deactivate()
+    m.res_initial_and_final_storage_state_var.deactivate()
+    m.old_initial_and_final_storage_state = pyomo.Constraint(
+        m.t, m.sto_init_bound_tuples,
+        rule=old_initial_and_final_storage_state_rule)
+    m.old_initial_and_final_storage_state_var = pyomo.Constraint(
+        m.t, m.sto_tuples - m.sto_init_bound_tuples,
+        rule=old_initial_and_final_storage_state_var_rule)
+
+
+def storage_state_rows(m):
+    return sum(len(con) for con in m.component_objects(pyomo.Constraint,
+                                                       active=True)
+               if 'storage_state' in con.name)
+
+
+def storage_state_rows_set(m):
+    return {(str(c.body), pyomo.value(c.lower), pyomo.value(c.upper))
+            for con in m.component_objects(pyomo.Constraint, active=True)
+            if 'storage_state' in con.name
+            for c in con.values()}
+
+
+def variable_names(constraint):
+    return {v.name for v in identify_variables(constraint.body)}
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = urbs.read_input(INPUT, 2019, cache=False)
+    # one storage with variable initial state
+    data['storage'].loc[data['storage'].index[0], 'init'] = float('nan')
+    return data
+
+
+def test_storage_state_rows_per_storage(data):
+    m = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    assert len(m.res_initial_and_final_storage_state_var) > 0
+    assert len(m.res_initial_storage_state) == len(m.sto_init_bound_tuples)
+    assert len(m.res_final_storage_state) == len(m.sto_init_bound_tuples)
+    assert (len(m.res_initial_and_final_storage_state_var) ==
+            len(m.sto_tuples) - len(m.sto_init_bound_tuples))
+
+    old = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    use_old_formulation(old)
+    assert (len(old.old_initial_and_final_storage_state_var) ==
+            len(old.t) * len(m.res_initial_and_final_storage_state_var))
+    assert storage_state_rows(m) < storage_state_rows(old)
+
+
+def test_storage_state_rows_unchanged(data):
+    m = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    first, last = m.t[1], m.t[len(m.t)]
+    for sto in m.sto_init_bound_tuples:
+        initial = m.res_initial_storage_state[sto]
+        assert initial.equality
+        assert m.e_sto_con[(first,) + sto].name in variable_names(initial)
+        final = m.res_final_storage_state[sto]
+        assert not final.equality
+        assert m.e_sto_con[(last,) + sto].name in variable_names(final)
+
+    # the former formulation only repeated the same rows for each timestep
+    old = urbs.create_model(data, timesteps=TIMESTEPS, dual=False)
+    use_old_formulation(old)
+    assert storage_state_rows_set(m) == storage_state_rows_set(old)
@@ -10,15 +10,25 @@ commodities.
 
 """
 
+from .aggregation import aggregate_periods, aggregate_timesteps
+from .admm import run_admm
+from .benders import run_benders
 from .data import COLORS
-from .model import create_model
+from .model import create_model, update_model
+from .independent import run_independent
 from .input import *
+from .lpmatrix import create_lp, write_mps, solve_lp, get_lp_result
 from .validation import validate_input
 from .output import get_constants, get_timeseries
 from .plot import plot, result_figures, to_color
-from .pyomoio import get_entity, get_entities, list_entities
+from .pyomoio import get_entity, get_entities, list_entities, \
+    set_start_values
 from .report import report
+from .rolling import run_rolling_horizon
 from .runfunctions import *
 from .saveload import load, save
 from .scenarios import *
-from .identify import identify_mode, identify_expansion
+from .stacked import run_stacked
+from .sweep import SweepAxis, run_sweep, load_sweep
+from .identify import identify_mode, identify_expansion, \
+    identify_independent
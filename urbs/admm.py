@@ -0,0 +1,348 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+from .identify import identify_mode
+from .model import create_model
+from .runfunctions import setup_solver
+from .saveload import ResultContainer, create_result_cache
+from .workers import ask_subproblems, start_subproblem, stop_subproblems
+
+# SPATIAL DECOMPOSITION (ADMM)
+# Regions (clusters of sites) are coupled only through the transmission
+# lines between them. run_admm solves each region as a model of its own
+# sites plus the far ends of its cross-region lines as "ghost" sites
+# without commodity balance. Both regions of a cross-region line hold a
+# copy of its capacity and flows (cap_tra_new, e_tra_in) and pay half of
+# its costs. The copies are driven to agreement by the alternating
+# direction method of multipliers (ADMM): each region minimizes its costs
+# plus a price and a quadratic penalty on the deviation of its copies from
+# their average, then the averages and prices are updated.
+
+# transmission cost columns split between the regions of a line
+LINE_COST_COLUMNS = ['inv-cost', 'fix-cost', 'var-cost']
+
+
+def run_admm(data, Solver, regions=None, timesteps=None, dt=1, rho=1.0,
+             tolerance=1e-3, max_iterations=500, parallel=True,
+             logfile='solver.log'):
+    """Solve a multi-site model by spatial decomposition into regions.
+
+    The regions are solved as separate subproblems, in one process each,
+    which agree iteratively on the capacities and flows of the transmission
+    lines between them (c.f. ADMM above). The penalty parameter rho is
+    adapted such that primal and dual residuals stay within a factor of 10
+    (residual balancing). The quadratic penalty requires a solver for
+    quadratic objectives (e.g. gurobi, cplex). Only the cost objective and
+    no finite global CO2 limit or budget are supported, as these couple
+    all sites.
+
+    Args:
+        - data: a dict of input DataFrames with transmission
+        - Solver: the user specified solver
+        - regions: list of lists of sites, default: one region per site
+        - timesteps: a list of timesteps, e.g. range(0,8761); default: all
+          timesteps of the demand time series
+        - dt: length of each time step (unit: hours)
+        - rho: initial penalty parameter, default: 1
+        - tolerance: relative primal and dual residual at which to stop,
+          default: 1e-3
+        - max_iterations: maximal number of iterations
+        - parallel: solve the regions in one process each
+        - logfile: solver log file name; the regions append their number,
+          e.g. solver-0.log
+
+    Returns:
+        (result, diagnostics) tuple: a ResultContainer with the merged
+        results of all regions, for report and result_figures, and a
+        DataFrame of the primal and dual residuals, rho and the total costs
+        per iteration
+    """
+    if not identify_mode(data)['tra']:
+        raise ValueError('Spatial decomposition requires transmission.')
+    values = data['global_prop']['value']
+    limits = values[values.index.get_level_values(1).isin(
+        ['CO2 limit', 'CO2 budget'])]
+    if ((limits >= 0) & (limits < float('inf'))).any():
+        raise ValueError('Spatial decomposition does not support a global '
+                         'CO2 limit or budget.')
+
+    sites = data['site'].index.get_level_values('Name').unique().tolist()
+    if regions is None:
+        regions = [[site] for site in sites]
+    regions = dict(enumerate(regions))
+    assigned = [site for region in regions.values() for site in region]
+    if sorted(assigned) != sorted(sites):
+        raise ValueError('Each site must belong to exactly one region.')
+
+    if timesteps is None:
+        timesteps = data['demand'].index.get_level_values('t').unique()
+    timesteps = list(timesteps)
+
+    # copies of the line capacities and flows per region, as positions in
+    # the vector of shared values
+    keys = {}
+    positions = {}
+    subproblems = {}
+    for region, region_sites in regions.items():
+        region_input, ghosts, lines = region_data(data, region_sites)
+        shared = ([('cap_tra_new', line) for line in lines] +
+                  [('e_tra_in', (t,) + line)
+                   for t in timesteps[1:] for line in lines])
+        positions[region] = np.array([keys.setdefault(key, len(keys))
+                                      for key in shared], dtype=int)
+        sublog = '{1}-{0}{2}'.format(region, *os.path.splitext(logfile))
+        subproblems[region] = start_subproblem(
+            _build, _serve,
+            (Solver, sublog, region_input, ghosts, shared, dt, timesteps),
+            parallel)
+
+    copies = np.bincount(np.concatenate(list(positions.values())),
+                         minlength=len(keys))
+    average = np.zeros(len(keys))
+    prices = {region: np.zeros(len(pos))
+              for region, pos in positions.items()}
+
+    diagnostics = []
+    try:
+        for iteration in range(max_iterations):
+            replies = ask_subproblems(subproblems, {
+                region: (average[pos], prices[region], rho)
+                for region, pos in positions.items()})
+            values = {region: np.array(reply['values'])
+                      for region, reply in replies.items()}
+
+            # averages of the copies (shifted by the scaled prices) and
+            # price updates
+            previous = average
+            average = sum(np.bincount(pos, minlength=len(keys),
+                                      weights=values[region] +
+                                      prices[region] / rho)
+                          for region, pos in positions.items()) / copies
+            primal = dual = norm_values = norm_prices = 0
+            for region, pos in positions.items():
+                deviation = values[region] - average[pos]
+                prices[region] = prices[region] + rho * deviation
+                primal += deviation.dot(deviation)
+                dual += ((average[pos] - previous[pos]) ** 2).sum()
+                norm_values += values[region].dot(values[region])
+                norm_prices += prices[region].dot(prices[region])
+            primal = math.sqrt(primal)
+            dual = rho * math.sqrt(dual)
+
+            diagnostics.append({
+                'iteration': iteration,
+                'primal residual': primal,
+                'dual residual': dual,
+                'rho': rho,
+                'costs': sum(reply['costs'] for reply in replies.values())})
+            if (primal <= tolerance * max(1, math.sqrt(norm_values)) and
+                    dual <= tolerance * max(1, math.sqrt(norm_prices))):
+                break
+
+            # residual balancing
+            if primal > 10 * dual:
+                rho *= 2
+            elif dual > 10 * primal:
+                rho /= 2
+        else:
+            print("Warning from run_admm: residuals {:.3g} (primal), {:.3g} "
+                  "(dual) after {} iterations".format(primal, dual,
+                                                      max_iterations))
+
+        caches = ask_subproblems(subproblems,
+                                 dict.fromkeys(regions, 'result'))
+    finally:
+        stop_subproblems(subproblems)
+
+    return (ResultContainer(data, combine_regions(caches, regions)),
+            pd.DataFrame(diagnostics).set_index('iteration'))
+
+
+def region_data(data, sites):
+    """Input data of a region.
+
+    Contains the sites of the region, all transmission lines from or to
+    them and, as ghost sites, the far ends of the lines leaving the region,
+    each with the commodities of these lines at zero price. Lines leaving
+    the region get half of their costs (c.f. LINE_COST_COLUMNS).
+
+    Args:
+        - data: input data dictionary
+        - sites: list of sites of the region
+
+    Returns:
+        (data, ghosts, lines) tuple: the input data dictionary of the
+        region, the set of ghost sites and the list of lines leaving the
+        region (transmission index tuples)
+    """
+    def rows(df, level, values):
+        if df.empty:
+            return df
+        return df[df.index.get_level_values(level).isin(values)].copy()
+
+    def columns(df):
+        if df.empty:
+            return df
+        return df.loc[:, df.columns.get_level_values(0).isin(sites)].copy()
+
+    sites = set(sites)
+    transmission = data['transmission']
+    site_in = transmission.index.get_level_values('Site In')
+    site_out = transmission.index.get_level_values('Site Out')
+    inside_in = site_in.isin(sites)
+    inside_out = site_out.isin(sites)
+    cross = inside_in != inside_out
+    lines = transmission.index[cross].tolist()
+    ghosts = (set(site_in[cross & ~inside_in]) |
+              set(site_out[cross & ~inside_out]))
+
+    region = dict(data)
+    region['transmission'] = transmission[inside_in | inside_out].copy()
+    half = region['transmission'].index.isin(lines)
+    for column in LINE_COST_COLUMNS:
+        region['transmission'].loc[half, column] *= 0.5
+
+    region['site'] = rows(data['site'], 'Name', sites | ghosts)
+    commodity = data['commodity']
+    ghost_commodity = rows(
+        rows(commodity, 'Site', ghosts), 'Commodity',
+        transmission.index[cross].get_level_values('Commodity').unique())
+    ghost_commodity['price'] = 0
+    ghost_commodity[['max', 'maxperhour']] = np.inf
+    region['commodity'] = pd.concat([rows(commodity, 'Site', sites),
+                                     ghost_commodity])
+    for name in ['process', 'storage', 'dsm']:
+        region[name] = rows(data[name], 'Site', sites)
+    for name in ['demand', 'supim', 'eff_factor']:
+        region[name] = columns(data[name])
+    return region, ghosts, lines
+
+
+def build_region(data, ghosts, shared, dt, timesteps):
+    """Model of a region (c.f. region_data) with an ADMM objective.
+
+    Args:
+        - data: input data of the region
+        - ghosts: set of ghost sites, whose commodity balance is dropped
+        - shared: list of (variable name, index) tuples of the copies
+        - dt: length of each time step (unit: hours)
+        - timesteps: a list of timesteps
+
+    Returns:
+        a urbs model instance
+    """
+    m = create_model(data, dt, timesteps, dual=False)
+    for index in m.res_vertex:
+        if index[2] in ghosts:
+            m.res_vertex[index].deactivate()
+    m.objective_function.deactivate()
+    m.admm_shared = shared
+
+    m.admm_copy = pyomo.Set(
+        initialize=range(len(shared)),
+        doc='Copies of capacities and flows shared with other regions')
+    m.admm_average = pyomo.Param(
+        m.admm_copy,
+        initialize=0, mutable=True,
+        doc='Average of the copies of all regions')
+    m.admm_price = pyomo.Param(
+        m.admm_copy,
+        initialize=0, mutable=True,
+        doc='Price of the copy (ADMM multiplier)')
+    m.admm_rho = pyomo.Param(
+        initialize=1, mutable=True,
+        doc='ADMM penalty parameter')
+    m.admm_objective = pyomo.Objective(
+        rule=admm_objective_rule,
+        sense=pyomo.minimize,
+        doc='minimize(costs + prices * copies + rho / 2 * '
+            '(copies - averages) ** 2)')
+    return m
+
+
+def admm_objective_rule(m):
+    penalty = 0
+    for copy in m.admm_copy:
+        name, index = m.admm_shared[copy]
+        value = getattr(m, name)[index]
+        penalty += (m.admm_price[copy] * value +
+                    m.admm_rho / 2 * (value - m.admm_average[copy]) ** 2)
+    return pyomo.summation(m.costs) + penalty
+
+
+def solve_region(m, optim, average, prices, rho):
+    """Solve a region for the given averages, prices and penalty.
+
+    Returns:
+        dict of the values of the copies (list) and the costs
+    """
+    for copy in m.admm_copy:
+        m.admm_average[copy] = average[copy]
+        m.admm_price[copy] = prices[copy]
+    m.admm_rho = rho
+
+    result = optim.solve(m)
+    if str(result.solver.termination_condition) != 'optimal':
+        raise RuntimeError('Region with sites {} is {}.'.format(
+            sorted(m.sit), result.solver.termination_condition))
+    return {'values': [pyomo.value(getattr(m, name)[index])
+                       for name, index in m.admm_shared],
+            'costs': pyomo.value(pyomo.summation(m.costs))}
+
+
+def combine_regions(caches, regions):
+    """Merge the result caches of the regions.
+
+    Entities indexed by site are taken from the region of the site (for
+    transmission: of the input site), all others are united. The costs are
+    the sum of the costs of all regions.
+
+    Args:
+        - caches: dict of result caches by region
+        - regions: dict of lists of sites by region
+
+    Returns:
+        a result cache dict
+    """
+    names = []
+    for cache in caches.values():
+        names.extend(name for name in cache
+                     if name not in names and not name.startswith('admm_'))
+
+    combined = {}
+    for name in names:
+        parts = []
+        for region, cache in caches.items():
+            if name not in cache:
+                continue
+            entity = cache[name]
+            if 'sit' in entity.index.names:
+                entity = entity[entity.index.get_level_values('sit')
+                                .isin(regions[region])]
+            parts.append(entity)
+        entity = pd.concat(parts)
+        if 'sit' not in entity.index.names:
+            entity = entity[~entity.index.duplicated()]
+        combined[name] = entity
+
+    combined['costs'] = pd.concat(
+        [cache['costs'] for cache in caches.values()]
+    ).groupby(level=0, sort=False).sum()
+    return combined
+
+
+def _build(Solver, logfile, *args):
+    """Region model and solver instance, c.f. build_region."""
+    return (build_region(*args),
+            setup_solver(Solver, logfile=logfile))
+
+
+def _serve(region, request):
+    """Answer an (average, prices, rho) request (c.f. solve_region) or
+    'result' with the result cache."""
+    m, optim = region
+    if request == 'result':
+        return create_result_cache(m)
+    return solve_region(m, optim, *request)
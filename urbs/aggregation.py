@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# TIME SERIES AGGREGATION
+# Reduces the time series of an input dict, such that long horizons (e.g. a
+# full year) can be modelled at a fraction of the LP size:
+# - aggregate_periods: a few representative periods (e.g. days or weeks).
+#   create_model weights each timestep by the number of periods its
+#   representative period stands for (m.weight) and links the storage
+#   content across the chronological order of periods.
+# - aggregate_timesteps: blocks of consecutive timesteps, e.g. hourly
+#   resolution in peak seasons and 4-hourly blocks elsewhere. create_model
+#   takes the resulting durations as dt.
+
+# input DataFrames with time series, indexed by (support_timeframe, t)
+TIMESERIES_KEYS = ['demand', 'supim', 'buy_sell_price', 'eff_factor']
+
+
+def aggregate_periods(data, timesteps, periods, period_length=24, seed=0):
+    """Aggregate the time series of an input dict to representative periods.
+
+    Splits the modelled timesteps (all but the first) into consecutive
+    periods of period_length timesteps and clusters them by their Demand,
+    SupIm, Buy-Sell-Price and TimeVarEff profiles (k-means on the profiles,
+    each scaled to its maximum). Each cluster is represented by its medoid,
+    i.e. the actual period closest to the cluster centre. Timesteps after the
+    last complete period are dropped.
+
+    Args:
+        - data: a dict of input DataFrames, as returned by read_input
+        - timesteps: list of timesteps, the first being the initial timestep,
+          e.g. range(0, 8761)
+        - periods: number of representative periods
+        - period_length: number of timesteps per period, default: 24
+        - seed: seed of the cluster initialization, default: 0
+
+    Returns:
+        a copy of data, with the time series reduced to the representative
+        periods at timesteps 0, 1, ..., periods * period_length and the
+        additional DataFrame 'period', which maps each chronological period
+        to its representative period. Create the model from it without
+        timesteps.
+    """
+    timesteps = list(timesteps)
+    count = (len(timesteps) - 1) // period_length
+    if not 0 < periods <= count:
+        raise ValueError('Number of representative periods must be between '
+                         '1 and the number of periods ({}).'.format(count))
+    steps = timesteps[1:count * period_length + 1]
+
+    # one row per period: the profiles of all time series columns
+    profiles = []
+    for key in TIMESERIES_KEYS:
+        if data[key].empty:
+            continue
+        for stf in data[key].index.get_level_values(0).unique():
+            values = (data[key].xs(stf, level=0).loc[steps]
+                      .fillna(0).values.astype(float))
+            scale = np.abs(values).max(axis=0)
+            values = values / np.where(scale > 0, scale, 1)
+            profiles.append(values.reshape(count, -1))
+    profiles = np.hstack(profiles)
+
+    labels = _cluster_medoids(profiles, periods, seed)
+    representatives, labels = np.unique(labels, return_inverse=True)
+
+    # initial timestep followed by the representative periods
+    selected = [timesteps[0]] + [
+        step for p in representatives
+        for step in steps[p * period_length:(p + 1) * period_length]]
+
+    aggregated = dict(data)
+    for key in TIMESERIES_KEYS:
+        if not data[key].empty:
+            aggregated[key] = _select_timesteps(data[key], selected)
+    aggregated['period'] = pd.DataFrame(
+        {'representative': labels},
+        index=pd.RangeIndex(count, name='period'))
+    return aggregated
+
+
+def aggregate_timesteps(data, timesteps, blocks, dt=1):
+    """Aggregate the time series of an input dict to timesteps of varying
+    duration.
+
+    Merges the modelled timesteps (all but the first) into blocks of
+    consecutive timesteps. Demand (energy per timestep) is summed over each
+    block, while SupIm, Buy-Sell-Price and TimeVarEff (per hour or per unit
+    of energy) are averaged, so that demand and intermittent supply energy
+    are conserved.
+
+    Args:
+        - data: a dict of input DataFrames, as returned by read_input
+        - timesteps: list of timesteps, the first being the initial timestep,
+          e.g. range(0, 8761)
+        - blocks: number of timesteps per block, either constant or a list
+          of block lengths covering all modelled timesteps
+        - dt: duration of the original timesteps in hours, default: 1
+
+    Returns:
+        (data, durations) tuple: a copy of data with the time series at
+        timesteps 0, 1, ..., number of blocks, and a Series of the duration
+        (hours) of each modelled timestep, to be passed as dt to
+        create_model without timesteps.
+    """
+    timesteps = list(timesteps)
+    steps = timesteps[1:]
+    if np.isscalar(blocks):
+        blocks = [blocks] * (len(steps) // blocks)
+    if sum(blocks) != len(steps):
+        raise ValueError('Blocks must cover all {} modelled timesteps.'
+                         .format(len(steps)))
+    labels = np.repeat(np.arange(1, len(blocks) + 1), blocks)
+
+    aggregated = dict(data)
+    for key in TIMESERIES_KEYS:
+        if data[key].empty:
+            continue
+        stfs = data[key].index.get_level_values(0).unique()
+        parts = []
+        for stf in stfs:
+            frame = data[key].xs(stf, level=0)
+            grouped = frame.loc[steps].groupby(labels)
+            if key == 'demand':
+                grouped = grouped.sum()
+            else:
+                grouped = grouped.mean()
+            part = pd.concat([frame.loc[[timesteps[0]]], grouped])
+            part.index = pd.RangeIndex(len(blocks) + 1, name='t')
+            parts.append(part)
+        aggregated[key] = pd.concat(parts, keys=stfs,
+                                    names=['support_timeframe'])
+
+    durations = pd.Series(np.asarray(blocks, dtype=float) * dt,
+                          index=pd.RangeIndex(1, len(blocks) + 1, name='t'),
+                          name='dt')
+    return aggregated, durations
+
+
+def _cluster_medoids(x, k, seed, iterations=100):
+    """ k-means clustering of the rows of x.
+
+    Returns:
+        array of the row index of the medoid of each row's cluster
+    """
+    rng = np.random.RandomState(seed)
+
+    # k-means++ initialization
+    centers = x[[rng.randint(len(x))]]
+    while len(centers) < k:
+        dist = _sq_distances(x, centers).min(axis=1)
+        p = dist / dist.sum() if dist.sum() > 0 else None
+        centers = np.vstack([centers, x[rng.choice(len(x), p=p)]])
+
+    for _ in range(iterations):
+        labels = _sq_distances(x, centers).argmin(axis=1)
+        new = np.array([x[labels == j].mean(axis=0)
+                        if (labels == j).any() else centers[j]
+                        for j in range(k)])
+        if np.allclose(new, centers):
+            break
+        centers = new
+
+    # medoids, then assign each row to the closest medoid
+    medoids = np.unique(_sq_distances(x, centers).argmin(axis=0))
+    return medoids[_sq_distances(x, x[medoids]).argmin(axis=1)]
+
+
+def _sq_distances(x, centers):
+    # clipped, as rounding makes distances of (nearly) equal rows negative
+    return np.maximum((x ** 2).sum(axis=1)[:, None] - 2 * x.dot(centers.T) +
+                      (centers ** 2).sum(axis=1)[None, :], 0)
+
+
+def _select_timesteps(df, selected):
+    """ Rows of timesteps selected of each support timeframe, renumbered
+    0, 1, ..., len(selected) - 1. """
+    stfs = df.index.get_level_values(0).unique()
+    parts = []
+    for stf in stfs:
+        part = df.xs(stf, level=0).loc[selected]
+        part.index = pd.RangeIndex(len(selected), name='t')
+        parts.append(part)
+    return pd.concat(parts, keys=stfs, names=['support_timeframe'])
@@ -0,0 +1,430 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+from .features.modelhelper import (discount_factor, effective_distance,
+                                   stf_dist)
+from .input import select_support_timeframe
+from .model import create_model
+from .rolling import TIME_DEPENDENT_COSTS
+from .runfunctions import setup_solver
+from .saveload import ResultContainer, create_result_cache
+from .workers import ask_subproblems, start_subproblem, stop_subproblems
+
+# BENDERS DECOMPOSITION
+# Intertemporal models couple the support timeframes only through the
+# capacities (and the CO2 budget). run_benders splits them into
+# - a master problem with the capacity variables, investment and fixed
+#   costs and one estimate of the operational costs per support timeframe,
+# - one operational subproblem per support timeframe, i.e. the single-year
+#   model of that support timeframe with its total capacities linked to the
+#   values of the master problem,
+# and adds optimality cuts from the duals of these links to the master
+# problem, until the gap between its lower and the resulting upper bound
+# closes. The subproblems are kept in memory and can be solved in parallel.
+
+# capacity expressions linking master and subproblems
+CAPACITY_EXPRESSIONS = ['cap_pro', 'cap_tra', 'cap_sto_c', 'cap_sto_p']
+
+# capacity columns of the subproblem input, set to 0 (inst-cap, cap-lo)
+# or inf (cap-up), such that only the links restrict the capacities
+CAPACITY_COLUMNS = {
+    'process': ['inst-cap', 'cap-lo', 'cap-up'],
+    'transmission': ['inst-cap', 'cap-lo', 'cap-up'],
+    'storage': ['inst-cap-c', 'cap-lo-c', 'cap-up-c',
+                'inst-cap-p', 'cap-lo-p', 'cap-up-p']}
+
+# constraints of the intertemporal model kept in the master problem
+MASTER_CONSTRAINTS = ['def_costs', 'res_process_capacity', 'res_area',
+                      'res_transmission_capacity',
+                      'res_transmission_symmetry', 'res_storage_power',
+                      'res_storage_capacity',
+                      'def_storage_energy_power_ratio']
+
+
+def run_benders(data, Solver, timesteps=None, dt=1, tolerance=1e-4,
+                max_iterations=100, penalty=1e8, parallel=True,
+                logfile='solver.log'):
+    """Solve an intertemporal model by Benders decomposition.
+
+    Equivalent to solving create_model(data, dt, timesteps) with the cost
+    objective. Capacities of a subproblem may deviate from the master
+    problem at the given penalty cost per unit, so that every master
+    solution gives feasible subproblems and thus an optimality cut; the
+    penalty must exceed the value of any additional capacity. Likewise, the
+    CO2 budget is split into non-negative annual allowances per support
+    timeframe, decided by the master problem.
+
+    Args:
+        - data: a dict of input DataFrames of several support timeframes
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761); default: all
+          timesteps of the demand time series
+        - dt: length of each time step (unit: hours)
+        - tolerance: relative gap between the upper and lower bound of the
+          total costs at which to stop, default: 1e-4
+        - max_iterations: maximal number of master problem solutions
+        - penalty: cost per unit of capacity or CO2 deviating from the
+          master problem, default: 1e8
+        - parallel: solve the subproblems in one process each
+        - logfile: solver log file name of the master problem; subproblems
+          append their support timeframe, e.g. solver-2030.log
+
+    Returns:
+        a ResultContainer with the capacities and costs of the master
+        problem and the operation of the subproblems, for report and
+        result_figures
+    """
+    if timesteps is None:
+        timesteps = data['demand'].index.get_level_values('t').unique()
+    timesteps = list(timesteps)
+
+    # master problem: intertemporal model of a single timestep, without its
+    # operational constraints
+    master_data = {name: df for name, df in data.items() if name != 'period'}
+    master = create_model(master_data, dt, timesteps[:2], dual=False)
+    if not master.mode['int']:
+        raise ValueError('Benders decomposition requires several support '
+                         'timeframes.')
+    for con in list(master.component_objects(pyomo.Constraint,
+                                             active=True)):
+        if con.local_name not in MASTER_CONSTRAINTS:
+            con.deactivate()
+    for cost_type in TIME_DEPENDENT_COSTS:
+        if cost_type in master.cost_type:
+            master.def_costs[cost_type].deactivate()
+    master.objective_function.deactivate()
+
+    links = {stf: [(name, index)
+                   for name in CAPACITY_EXPRESSIONS if hasattr(master, name)
+                   for index in getattr(master, name) if index[0] == stf]
+             for stf in master.stf}
+    factors = {stf: discount_factor(stf, master) *
+               effective_distance(stf_dist(stf, master), master)
+               for stf in master.stf}
+
+    # CO2 budget as allowances of the support timeframes with CO2
+    budget = master.global_prop_dict['value'][min(master.stf), 'CO2 budget']
+    co2_stf = []
+    if not math.isinf(budget) and budget >= 0:
+        co2_stf = sorted(set(stf for (stf, sit, com)
+                             in master.com_balance_tuples if com == 'CO2'))
+    master.benders_co2_stf = pyomo.Set(
+        initialize=co2_stf,
+        doc='Support timeframes with a CO2 allowance')
+    master.benders_allowance = pyomo.Var(
+        master.benders_co2_stf,
+        within=pyomo.NonNegativeReals,
+        doc='Annual CO2 output allowed per support timeframe')
+    master.co2_budget = budget
+    master.res_benders_co2_budget = pyomo.Constraint(
+        rule=res_benders_co2_budget_rule,
+        doc='sum of CO2 allowances <= global.prop CO2 budget')
+
+    # subproblems
+    subproblems = {}
+    for stf in master.stf:
+        sublog = '{1}-{0}{2}'.format(stf, *os.path.splitext(logfile))
+        subproblems[stf] = start_subproblem(
+            _build, _serve,
+            (Solver, sublog, support_timeframe_data(data, stf), links[stf],
+             stf in co2_stf, factors[stf], dt, timesteps, penalty),
+            parallel)
+
+    try:
+        # operational costs without capacity links bound theta from below
+        free = ask_subproblems(subproblems,
+                               dict.fromkeys(master.stf, (None, None)))
+        master.benders_theta_min = {stf: reply['objective']
+                                    for stf, reply in free.items()}
+        master.benders_theta = pyomo.Var(
+            master.stf,
+            bounds=benders_theta_bounds_rule,
+            doc='Estimated operational costs per support timeframe')
+        master.benders_cuts = pyomo.ConstraintList(
+            doc='Benders optimality cuts')
+        master.benders_objective = pyomo.Objective(
+            expr=(master.costs['Invest'] + master.costs['Fixed'] +
+                  pyomo.summation(master.benders_theta)),
+            sense=pyomo.minimize,
+            doc='minimize(investment + fixed + estimated operational costs)')
+
+        optim = setup_solver(Solver, logfile=logfile)
+        for iteration in range(max_iterations):
+            result = optim.solve(master)
+            if str(result.solver.termination_condition) != 'optimal':
+                raise RuntimeError('Master problem is {}.'.format(
+                    result.solver.termination_condition))
+            lower = pyomo.value(master.benders_objective)
+
+            requests = {}
+            for stf in master.stf:
+                allowance = None
+                if stf in co2_stf:
+                    allowance = pyomo.value(master.benders_allowance[stf])
+                requests[stf] = ([pyomo.value(getattr(master, name)[index])
+                                  for name, index in links[stf]],
+                                 allowance)
+            replies = ask_subproblems(subproblems, requests)
+
+            upper = pyomo.value(master.costs['Invest'] +
+                                master.costs['Fixed'])
+            for stf, reply in replies.items():
+                upper += reply['objective']
+                add_cut(master, stf, links[stf], requests[stf], reply)
+            if upper - lower <= tolerance * max(abs(upper), 1):
+                break
+        else:
+            print("Warning from run_benders: gap {:.3g} after {} iterations"
+                  .format((upper - lower) / max(abs(upper), 1),
+                          max_iterations))
+
+        for stf, reply in replies.items():
+            if reply['slack'] > 1e-6:
+                raise RuntimeError(
+                    'Subproblem {} deviates from the master problem by {} '
+                    '(capacity or CO2). The model is infeasible, or the '
+                    'penalty too small.'.format(stf, reply['slack']))
+
+        caches = ask_subproblems(subproblems,
+                                 dict.fromkeys(master.stf, 'result'))
+    finally:
+        stop_subproblems(subproblems)
+
+    return ResultContainer(
+        data, combine_results(create_result_cache(master), caches, factors))
+
+
+def benders_theta_bounds_rule(m, stf):
+    return (m.benders_theta_min[stf], None)
+
+
+def res_benders_co2_budget_rule(m):
+    if not m.benders_co2_stf:
+        return pyomo.Constraint.Skip
+    return (sum(m.benders_allowance[stf] * stf_dist(stf, m)
+                for stf in m.benders_co2_stf) <=
+            m.co2_budget)
+
+
+def add_cut(master, stf, links, request, reply):
+    """Add the optimality cut of a subproblem solution to the master
+    problem: theta >= objective + duals * (master values - link values)."""
+    capacities, allowance = request
+    cut = reply['objective']
+    for (name, index), value, dual in zip(links, capacities,
+                                          reply['duals']):
+        if dual:
+            cut += dual * (getattr(master, name)[index] - value)
+    if allowance is not None and reply['co2']:
+        cut += reply['co2'] * (master.benders_allowance[stf] - allowance)
+    master.benders_cuts.add(master.benders_theta[stf] >= cut)
+
+
+def support_timeframe_data(data, stf):
+    """Input data of a single support timeframe, with unrestricted
+    capacities (c.f. CAPACITY_COLUMNS)."""
+    selected = select_support_timeframe(data, stf)
+    for name, columns in CAPACITY_COLUMNS.items():
+        df = selected[name]
+        for column in columns:
+            if column in df.columns:
+                df[column] = np.inf if column.startswith('cap-up') else 0
+    return selected
+
+
+def build_subproblem(data, links, co2, factor, dt, timesteps, penalty):
+    """Operational subproblem of one support timeframe.
+
+    Args:
+        - data: input data of the support timeframe, c.f.
+          support_timeframe_data
+        - links: list of (capacity expression, index) tuples
+        - co2: True if the CO2 output is limited by an allowance
+        - factor: cost factor of the support timeframe in the intertemporal
+          model, applied to the operational costs
+        - dt: length of each time step (unit: hours)
+        - timesteps: a list of timesteps
+        - penalty: cost per unit of capacity or CO2 deviating from the
+          master problem
+
+    Returns:
+        a urbs model instance minimizing the weighted operational costs
+    """
+    m = create_model(data, dt, timesteps)
+    m.objective_function.deactivate()
+    m.benders_links = links
+    m.benders_factor = factor
+    m.benders_penalty = penalty
+
+    m.benders_link = pyomo.Set(
+        initialize=range(len(links)),
+        doc='Capacities linked to the master problem')
+    m.benders_capacity = pyomo.Param(
+        m.benders_link,
+        initialize=0, mutable=True,
+        doc='Capacity of the master problem')
+    m.benders_slack_up = pyomo.Var(
+        m.benders_link,
+        within=pyomo.NonNegativeReals,
+        doc='Capacity above the master problem')
+    m.benders_slack_down = pyomo.Var(
+        m.benders_link,
+        within=pyomo.NonNegativeReals,
+        doc='Capacity below the master problem')
+    m.res_benders_capacity = pyomo.Constraint(
+        m.benders_link,
+        rule=res_benders_capacity_rule,
+        doc='capacity + slack down - slack up == master capacity')
+
+    m.benders_co2_allowance = pyomo.Param(
+        initialize=0, mutable=True,
+        doc='CO2 allowance of the master problem')
+    m.benders_slack_co2 = pyomo.Var(
+        within=pyomo.NonNegativeReals,
+        doc='CO2 output above the allowance')
+    if co2:
+        m.res_benders_co2 = pyomo.Constraint(
+            rule=res_benders_co2_rule,
+            doc='total co2 commodity output - slack <= CO2 allowance')
+
+    m.benders_objective = pyomo.Objective(
+        rule=benders_subproblem_cost_rule,
+        sense=pyomo.minimize,
+        doc='minimize(weighted operational costs + penalties)')
+    return m
+
+
+def res_benders_capacity_rule(m, link):
+    name, index = m.benders_links[link]
+    return (getattr(m, name)[index] + m.benders_slack_down[link] -
+            m.benders_slack_up[link] ==
+            m.benders_capacity[link])
+
+
+def res_benders_co2_rule(m):
+    co2_output_sum = 0
+    for stf, sit, com in m.com_balance_tuples:
+        if com != 'CO2':
+            continue
+        for tm in m.tm:
+            co2_output_sum += (- m.e_co_balance[tm, stf, sit, com] *
+                               m.weight[tm])
+    return (co2_output_sum - m.benders_slack_co2 <=
+            m.benders_co2_allowance)
+
+
+def benders_subproblem_cost_rule(m):
+    return (m.benders_factor *
+            sum(m.costs[cost_type] for cost_type in m.cost_type
+                if cost_type in TIME_DEPENDENT_COSTS) +
+            m.benders_penalty *
+            (pyomo.summation(m.benders_slack_up) +
+             pyomo.summation(m.benders_slack_down) +
+             m.benders_slack_co2))
+
+
+def solve_subproblem(m, optim, capacities=None, allowance=None):
+    """Solve a subproblem for the given master problem values.
+
+    Without capacities, the links are dropped, which gives a lower bound of
+    the operational costs.
+
+    Returns:
+        dict of the objective value, the duals of the capacity links (list),
+        the dual of the CO2 allowance and the total slack
+    """
+    linked = capacities is not None
+    co2 = hasattr(m, 'res_benders_co2')
+    if linked:
+        m.res_benders_capacity.activate()
+        for link, value in enumerate(capacities):
+            m.benders_capacity[link] = value
+    else:
+        m.res_benders_capacity.deactivate()
+    if co2:
+        if linked and allowance is not None:
+            m.res_benders_co2.activate()
+            m.benders_co2_allowance = allowance
+        else:
+            m.res_benders_co2.deactivate()
+
+    result = optim.solve(m)
+    if str(result.solver.termination_condition) != 'optimal':
+        raise RuntimeError('Subproblem {} is {}.'.format(
+            m.stf.first(), result.solver.termination_condition))
+
+    reply = {'objective': pyomo.value(m.benders_objective),
+             'duals': [], 'co2': 0, 'slack': 0}
+    if linked:
+        reply['duals'] = [m.dual[m.res_benders_capacity[link]]
+                          for link in m.benders_link]
+        reply['slack'] = sum(pyomo.value(m.benders_slack_up[link] +
+                                         m.benders_slack_down[link])
+                             for link in m.benders_link)
+        if co2 and m.res_benders_co2.active:
+            reply['co2'] = m.dual[m.res_benders_co2]
+            reply['slack'] += pyomo.value(m.benders_slack_co2)
+    return reply
+
+
+def combine_results(master, caches, factors):
+    """Combine the result caches of the master and subproblems.
+
+    Time-indexed entities and entities only in the subproblems are taken
+    from the subproblems, all others from the master problem. The
+    operational costs are the weighted sum of the subproblem costs.
+
+    Args:
+        - master: result cache of the master problem
+        - caches: dict of result caches of the subproblems by support
+          timeframe
+        - factors: dict of cost factors by support timeframe
+
+    Returns:
+        a result cache dict
+    """
+    def concat(name):
+        entities = [cache[name] for cache in caches.values()
+                    if name in cache]
+        if 'stf' in entities[0].index.names:
+            return pd.concat(entities)
+        return entities[0]
+
+    combined = {}
+    for name, entity in master.items():
+        if name.startswith('benders_'):
+            continue
+        if 't' in entity.index.names or name == 'tm':
+            combined[name] = concat(name)
+        else:
+            combined[name] = entity
+    for cache in caches.values():
+        for name in cache:
+            if name not in combined and not name.startswith('benders_'):
+                combined[name] = concat(name)
+
+    costs = combined['costs'].copy()
+    for cost_type in TIME_DEPENDENT_COSTS:
+        if cost_type in costs.index:
+            costs[cost_type] = sum(
+                factors[stf] * cache['costs'][cost_type]
+                for stf, cache in caches.items())
+    combined['costs'] = costs
+    return combined
+
+
+def _build(Solver, logfile, *args):
+    """Subproblem and solver instance, c.f. build_subproblem."""
+    return (build_subproblem(*args),
+            setup_solver(Solver, logfile=logfile))
+
+
+def _serve(subproblem, request):
+    """Answer a (capacities, allowance) request (c.f. solve_subproblem) or
+    'result' with the result cache."""
+    m, optim = subproblem
+    if request == 'result':
+        return create_result_cache(m)
+    return solve_subproblem(m, optim, *request)
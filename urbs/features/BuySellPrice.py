@@ -1,6 +1,6 @@
 import math
 import pyomo.core as pyomo
-from .modelhelper import commodity_subset
+from .modelhelper import commodity_subset, finite_or_none
 
 
 def add_buy_sell_price(m):
@@ -14,32 +14,35 @@ def add_buy_sell_price(m):
         within=m.com,
         initialize=commodity_subset(m.com_tuples, 'Buy'),
         doc='Commodities that can be purchased')
+    m.com_sell_tuples = pyomo.Set(
+        within=m.stf * m.sit * m.com * m.com_type,
+        initialize=commodity_subset(m.com_tuples, m.com_sell),
+        doc='Combinations of sell commodities, e.g. '
+            '(2018,Mid,Elec sell,Sell)')
+    m.com_buy_tuples = pyomo.Set(
+        within=m.stf * m.sit * m.com * m.com_type,
+        initialize=commodity_subset(m.com_tuples, m.com_buy),
+        doc='Combinations of buy commodities, e.g. (2018,Mid,Elec buy,Buy)')
 
     # Variables
     m.e_co_sell = pyomo.Var(
-        m.tm, m.com_tuples,
+        m.tm, m.com_sell_tuples,
         within=pyomo.NonNegativeReals,
+        bounds=e_co_sell_bounds_rule,
         doc='Use of sell commodity source (MW) per timestep')
     m.e_co_buy = pyomo.Var(
-        m.tm, m.com_tuples,
+        m.tm, m.com_buy_tuples,
         within=pyomo.NonNegativeReals,
+        bounds=e_co_buy_bounds_rule,
         doc='Use of buy commodity source (MW) per timestep')
 
     # Rules
-    m.res_sell_step = pyomo.Constraint(
-        m.tm, m.com_tuples,
-        rule=res_sell_step_rule,
-        doc='sell commodity output per step <= commodity.maxperstep')
     m.res_sell_total = pyomo.Constraint(
-        m.com_tuples,
+        m.com_sell_tuples,
         rule=res_sell_total_rule,
         doc='total sell commodity output <= commodity.max')
-    m.res_buy_step = pyomo.Constraint(
-        m.tm, m.com_tuples,
-        rule=res_buy_step_rule,
-        doc='buy commodity output per step <= commodity.maxperstep')
     m.res_buy_total = pyomo.Constraint(
-        m.com_tuples,
+        m.com_buy_tuples,
         rule=res_buy_total_rule,
         doc='total buy commodity output <= commodity.max')
 
@@ -51,58 +54,47 @@ def add_buy_sell_price(m):
     return m
 
 
-# constraints
+# variable bounds
 
 # limit sell commodity use per time step
-def res_sell_step_rule(m, tm, stf, sit, com, com_type):
-    if com not in m.com_sell:
-        return pyomo.Constraint.Skip
-    else:
-        return (m.e_co_sell[tm, stf, sit, com, com_type] <=
-                m.dt * m.commodity_dict['maxperhour']
-                [(stf, sit, com, com_type)])
+def e_co_sell_bounds_rule(m, tm, stf, sit, com, com_type):
+    return (0, finite_or_none(
+        pyomo.value(m.dt[tm]) *
+        m.commodity_dict['maxperhour'][(stf, sit, com, com_type)]))
+
+
+# limit buy commodity use per time step
+def e_co_buy_bounds_rule(m, tm, stf, sit, com, com_type):
+    return (0, finite_or_none(
+        pyomo.value(m.dt[tm]) *
+        m.commodity_dict['maxperhour'][(stf, sit, com, com_type)]))
+
+
+# constraints
 
 
 # limit sell commodity use in total (scaled to annual consumption, thanks
 # to m.weight)
 def res_sell_total_rule(m, stf, sit, com, com_type):
-    if com not in m.com_sell:
-        return pyomo.Constraint.Skip
-    else:
-        # calculate total sale of commodity com
-        total_consumption = 0
-        for tm in m.tm:
-            total_consumption += (
-                m.e_co_sell[tm, stf, sit, com, com_type])
-        total_consumption *= m.weight
-        return (total_consumption <=
-                m.commodity_dict['max'][(stf, sit, com, com_type)])
-
-
-# limit buy commodity use per time step
-def res_buy_step_rule(m, tm, stf, sit, com, com_type):
-    if com not in m.com_buy:
-        return pyomo.Constraint.Skip
-    else:
-        return (m.e_co_buy[tm, stf, sit, com, com_type] <=
-                m.dt * m.commodity_dict['maxperhour']
-                [(stf, sit, com, com_type)])
+    # calculate total sale of commodity com
+    total_consumption = 0
+    for tm in m.tm:
+        total_consumption += (
+            m.e_co_sell[tm, stf, sit, com, com_type] * m.weight[tm])
+    return (total_consumption <=
+            m.commodity_dict['max'][(stf, sit, com, com_type)])
 
 
 # limit buy commodity use in total (scaled to annual consumption, thanks
 # to m.weight)
 def res_buy_total_rule(m, stf, sit, com, com_type):
-    if com not in m.com_buy:
-        return pyomo.Constraint.Skip
-    else:
-        # calculate total sale of commodity com
-        total_consumption = 0
-        for tm in m.tm:
-            total_consumption += (
-                m.e_co_buy[tm, stf, sit, com, com_type])
-        total_consumption *= m.weight
-        return (total_consumption <=
-                m.commodity_dict['max'][(stf, sit, com, com_type)])
+    # calculate total sale of commodity com
+    total_consumption = 0
+    for tm in m.tm:
+        total_consumption += (
+            m.e_co_buy[tm, stf, sit, com, com_type] * m.weight[tm])
+    return (total_consumption <=
+            m.commodity_dict['max'][(stf, sit, com, com_type)])
 
 
 # power connection capacity: Sell == Buy
@@ -170,40 +162,40 @@ def bsp_surplus(m, tm, stf, sit, com, com_type):
 
 
 def revenue_costs(m):
-    sell_tuples = commodity_subset(m.com_tuples, m.com_sell)
+    sell_tuples = m.com_sell_tuples
     try:
         return -sum(
             m.e_co_sell[(tm,) + c] *
-            m.buy_sell_price_dict[c[2]][(c[0], tm)] * m.weight *
-            m.commodity_dict['price'][c] *
+            m.buy_sell_price_dict[c[2]][(c[0], tm)] * m.weight[tm] *
+            m.commodity_price[c] *
             m.commodity_dict['cost_factor'][c]
             for tm in m.tm
             for c in sell_tuples)
     except KeyError:
         return -sum(
             m.e_co_sell[(tm,) + c] *
-            m.buy_sell_price_dict[c[2], ][(c[0], tm)] * m.weight *
-            m.commodity_dict['price'][c] *
+            m.buy_sell_price_dict[c[2], ][(c[0], tm)] * m.weight[tm] *
+            m.commodity_price[c] *
             m.commodity_dict['cost_factor'][c]
             for tm in m.tm
             for c in sell_tuples)
 
 
 def purchase_costs(m):
-    buy_tuples = commodity_subset(m.com_tuples, m.com_buy)
+    buy_tuples = m.com_buy_tuples
     try:
         return sum(
             m.e_co_buy[(tm,) + c] *
-            m.buy_sell_price_dict[c[2]][(c[0], tm)] * m.weight *
-            m.commodity_dict['price'][c] *
+            m.buy_sell_price_dict[c[2]][(c[0], tm)] * m.weight[tm] *
+            m.commodity_price[c] *
             m.commodity_dict['cost_factor'][c]
             for tm in m.tm
             for c in buy_tuples)
     except KeyError:
         return sum(
             m.e_co_buy[(tm,) + c] *
-            m.buy_sell_price_dict[c[2], ][(c[0], tm)] * m.weight *
-            m.commodity_dict['price'][c] *
+            m.buy_sell_price_dict[c[2], ][(c[0], tm)] * m.weight[tm] *
+            m.commodity_price[c] *
             m.commodity_dict['cost_factor'][c]
             for tm in m.tm
             for c in buy_tuples)
@@ -1,5 +1,6 @@
 import math
 import pyomo.core as pyomo
+from .modelhelper import partial_process_output
 
 
 def add_time_variable_efficiency(m):
@@ -20,6 +21,9 @@ def add_time_variable_efficiency(m):
         doc='Outputs of processes with time dependent efficiency')
 
     # time variable efficiency rules
+    # (compact formulation: part of the e_pro_out expression instead)
+    if m.compact:
+        return m
     m.def_process_timevar_output = pyomo.Constraint(
         m.tm, (m.pro_timevar_output_tuples -
                (m.pro_partial_output_tuples & m.pro_timevar_output_tuples)),
@@ -46,15 +50,6 @@ def def_pro_timevar_output_rule(m, tm, stf, sit, pro, com):
 
 
 def def_pro_partial_timevar_output_rule(m, tm, stf, sit, pro, coo):
-    # input ratio at maximum operation point
-    R = m.r_out_dict[stf, pro, coo]
-    # input ratio at lowest operation point
-    r = m.r_out_min_fraction_dict[stf, pro, coo]
-    min_fraction = m.process_dict['min-fraction'][(stf, sit, pro)]
-
-    online_factor = min_fraction * (r - R) / (1 - min_fraction)
-    throughput_factor = (R - min_fraction * r) / (1 - min_fraction)
     return (m.e_pro_out[tm, stf, sit, pro, coo] ==
-            (m.dt * m.cap_pro[stf, sit, pro] * online_factor +
-             m.tau_pro[tm, stf, sit, pro] * throughput_factor) *
+            partial_process_output(m, tm, stf, sit, pro, coo) *
             m.eff_factor_dict[(sit, pro)][(stf, tm)])
@@ -7,8 +7,9 @@
 """
 
 from .transmission import add_transmission, transmission_balance, \
-                          transmission_cost
-from .storage import add_storage, storage_balance, storage_cost
+                          transmission_balance_dicts, transmission_cost
+from .storage import add_storage, storage_balance, storage_balance_dict, \
+                     storage_cost
 from .dsm import add_dsm, dsm_surplus
 from .BuySellPrice import add_buy_sell_price, bsp_surplus, revenue_costs, \
                           purchase_costs
@@ -1,3 +1,5 @@
+import bisect
+import itertools
 import math
 import pyomo.core as pyomo
 
@@ -12,6 +14,15 @@ def add_dsm(m):
         ordered=True,
         doc='Set of additional DSM time steps')
 
+    # start and end hour of each modelled timestep, so that delay and
+    # recovery times apply to timesteps of varying duration
+    m.dsm_steps = list(m.timesteps[1:])
+    m.dsm_position = {t: i for i, t in enumerate(m.dsm_steps)}
+    m.dsm_end = list(itertools.accumulate(
+        pyomo.value(m.dt[t]) for t in m.dsm_steps))
+    m.dsm_start = [end - pyomo.value(m.dt[t])
+                   for t, end in zip(m.dsm_steps, m.dsm_end)]
+
     # DSM Tuples
     m.dsm_site_tuples = pyomo.Set(
         within=m.stf*m.sit*m.com,
@@ -72,10 +83,7 @@ def add_dsm(m):
 # DSMup == DSMdo * efficiency factor n
 def def_dsm_variables_rule(m, tm, stf, sit, com):
     dsm_down_sum = 0
-    for tt in dsm_time_tuples(tm,
-                              m.timesteps[1:],
-                              max(int(1 / m.dt *
-                                  m.dsm_dict['delay'][(stf, sit, com)]), 1)):
+    for tt in dsm_time_tuples(m, tm, m.dsm_dict['delay'][(stf, sit, com)]):
         dsm_down_sum += m.dsm_down[tm, tt, stf, sit, com]
     return dsm_down_sum == (m.dsm_up[tm, stf, sit, com] *
                             m.dsm_dict['eff'][(stf, sit, com)])
@@ -83,7 +91,7 @@ def def_dsm_variables_rule(m, tm, stf, sit, com):
 
 # DSMup <= Cup (threshold capacity of DSMup)
 def res_dsm_upward_rule(m, tm, stf, sit, com):
-    return m.dsm_up[tm, stf, sit, com] <= (m.dt *
+    return m.dsm_up[tm, stf, sit, com] <= (m.dt[tm] *
                                            m.dsm_dict['cap-max-up']
                                            [(stf, sit, com)])
 
@@ -91,35 +99,27 @@ def res_dsm_upward_rule(m, tm, stf, sit, com):
 # DSMdo <= Cdo (threshold capacity of DSMdo)
 def res_dsm_downward_rule(m, tm, stf, sit, com):
     dsm_down_sum = 0
-    for t in dsm_time_tuples(tm,
-                             m.timesteps[1:],
-                             max(int(1 / m.dt *
-                                 m.dsm_dict['delay'][(stf, sit, com)]), 1)):
+    for t in dsm_time_tuples(m, tm, m.dsm_dict['delay'][(stf, sit, com)]):
         dsm_down_sum += m.dsm_down[t, tm, stf, sit, com]
-    return dsm_down_sum <= (m.dt * m.dsm_dict['cap-max-do'][(stf, sit, com)])
+    return dsm_down_sum <= (m.dt[tm] *
+                            m.dsm_dict['cap-max-do'][(stf, sit, com)])
 
 
 # DSMup + DSMdo <= max(Cup,Cdo)
 def res_dsm_maximum_rule(m, tm, stf, sit, com):
     dsm_down_sum = 0
-    for t in dsm_time_tuples(tm,
-                             m.timesteps[1:],
-                             max(int(1 / m.dt *
-                                 m.dsm_dict['delay'][(stf, sit, com)]), 1)):
+    for t in dsm_time_tuples(m, tm, m.dsm_dict['delay'][(stf, sit, com)]):
         dsm_down_sum += m.dsm_down[t, tm, stf, sit, com]
 
-    max_dsm_limit = m.dt * max(m.dsm_dict['cap-max-up'][(stf, sit, com)],
-                               m.dsm_dict['cap-max-do'][(stf, sit, com)])
+    max_dsm_limit = m.dt[tm] * max(m.dsm_dict['cap-max-up'][(stf, sit, com)],
+                                   m.dsm_dict['cap-max-do'][(stf, sit, com)])
     return m.dsm_up[tm, stf, sit, com] + dsm_down_sum <= max_dsm_limit
 
 
 # DSMup(t, t + recovery time R) <= Cup * delay time L
 def res_dsm_recovery_rule(m, tm, stf, sit, com):
     dsm_up_sum = 0
-    for t in dsm_recovery(tm,
-                          m.timesteps[1:],
-                          max(int(1 / m.dt *
-                              m.dsm_dict['recov'][(stf, sit, com)]), 1)):
+    for t in dsm_recovery(m, tm, m.dsm_dict['recov'][(stf, sit, com)]):
         dsm_up_sum += m.dsm_up[t, stf, sit, com]
     return dsm_up_sum <= (m.dsm_dict['cap-max-up'][(stf, sit, com)] *
                           m.dsm_dict['delay'][(stf, sit, com)])
@@ -133,9 +133,7 @@ def dsm_surplus(m, tm, stf, sit, com):
         return (- m.dsm_up[tm, stf, sit, com] +
                 sum(m.dsm_down[t, tm, stf, sit, com]
                     for t in dsm_time_tuples(
-                    tm, m.timesteps[1:],
-                    max(int(1 / m.dt *
-                        m.dsm_dict['delay'][(stf, sit, com)]), 1))))
+                    m, tm, m.dsm_dict['delay'][(stf, sit, com)])))
     else:
         return 0
 
@@ -151,64 +149,49 @@ def dsm_down_time_tuples(time, sit_com_tuple, m):
     """
 
     delay = m.dsm_dict['delay']
-    ub = max(time)
-    lb = min(time)
     time_list = []
 
     for (stf, site, commodity) in sit_com_tuple:
         for step1 in time:
-            for step2 in range(step1 -
-                               max(int(delay[stf, site, commodity] /
-                                   m.dt.value), 1),
-                               step1 +
-                               max(int(delay[stf, site, commodity] /
-                                   m.dt.value), 1) + 1):
-                if lb <= step2 <= ub:
-                    time_list.append((step1, step2, stf, site, commodity))
+            for step2 in dsm_time_tuples(m, step1,
+                                         delay[stf, site, commodity]):
+                time_list.append((step1, step2, stf, site, commodity))
 
     return time_list
 
 
-def dsm_time_tuples(timestep, time, delay):
+def dsm_time_tuples(m, timestep, delay):
     """ Tuples for the two time instances of DSM_down
     Args:
+        m: model instance
         timestep: current timestep
-        time: list with time indices
-        delay: allowed dsm delay in particular site and commodity
+        delay: allowed dsm delay (hours) in particular site and commodity
     Returns:
-        A list of possible time tuples of a current time step in a specific
-        stf, site and commodity
+        A list of the modelled time steps starting within delay hours of
+        the current time step (at least its neighbours) in a specific stf,
+        site and commodity
     """
 
-    ub = max(time)
-    lb = min(time)
+    i = m.dsm_position[timestep]
+    start = m.dsm_start[i]
+    lb = min(bisect.bisect_left(m.dsm_start, start - delay), i - 1)
+    ub = max(bisect.bisect_right(m.dsm_start, start + delay), i + 2)
 
-    time_list = list()
-
-    for step in range(timestep - delay, timestep + delay + 1):
-        if step >= lb and step <= ub:
-            time_list.append(step)
-
-    return time_list
+    return m.dsm_steps[max(lb, 0):ub]
 
 
-def dsm_recovery(timestep, time, recov):
+def dsm_recovery(m, timestep, recov):
     """ Time frame for the allowed time indices in case of recovery
     Args:
+        m: model instance
         timestep: current timestep
-        time: list with time indices
-        recov: allowed dsm recovery in particular site and commodity
+        recov: allowed dsm recovery (hours) in particular site and commodity
     Returns:
-        A list of possible time indices which are within the modelled time
-        area
+        A list of the modelled time steps from the current one that end
+        within recov hours (at least the current one)
     """
 
-    ub = max(time)
-
-    time_list = list()
+    i = m.dsm_position[timestep]
+    ub = max(bisect.bisect_right(m.dsm_end, m.dsm_start[i] + recov), i + 1)
 
-    for step in range(timestep, timestep+recov):
-        if step <= ub:
-            time_list.append(step)
-
-    return time_list
+    return m.dsm_steps[i:ub]
@@ -1,50 +1,62 @@
-from .transmission import transmission_balance
-from .storage import storage_balance
+import math
+import numpy as np
+from .transmission import transmission_balance, transmission_balance_dicts
+from .storage import storage_balance, storage_balance_dict
 
 
 def invcost_factor(dep_prd, interest, discount=None, year_built=None,
                    stf_min=None):
     """Investment cost factor formula.
     Evaluates the factor multiplied to the invest costs
-    for depreciation duration and interest rate.
+    for depreciation duration and interest rate. All arguments can be
+    scalars or arrays/columns of equal length (evaluated element-wise).
     Args:
         dep_prd: depreciation period (years)
         interest: interest rate (e.g. 0.06 means 6 %)
         year_built: year utility is built
         discount: discount rate for intertmeporal planning
     """
-    # invcost factor for non intertemporal planning
-    if discount is None:
-        if interest == 0:
-            return 1 / dep_prd
-        else:
-            return ((1 + interest) ** dep_prd * interest /
-                    ((1 + interest) ** dep_prd - 1))
-    # invcost factor for intertemporal planning
-    elif discount == 0:
-        if interest == 0:
-            return 1
-        else:
-            return (dep_prd * ((1 + interest) ** dep_prd * interest) /
-                    ((1 + interest) ** dep_prd - 1))
-    else:
-        if interest == 0:
-            return ((1 + discount) ** (1 - (year_built-stf_min)) *
-                    ((1 + discount) ** dep_prd - 1) /
-                    (dep_prd * discount * (1 + discount) ** dep_prd))
-        else:
-            return ((1 + discount) ** (1 - (year_built-stf_min)) *
-                    (interest * (1 + interest) ** dep_prd *
-                    ((1 + discount) ** dep_prd - 1)) /
-                    (discount * (1 + discount) ** dep_prd *
-                    ((1+interest) ** dep_prd - 1)))
+    dep_prd = np.asarray(dep_prd, dtype=float)
+    interest = np.asarray(interest, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # invcost factor for non intertemporal planning
+        if discount is None:
+            factor = np.where(
+                interest == 0,
+                1 / dep_prd,
+                ((1 + interest) ** dep_prd * interest /
+                 ((1 + interest) ** dep_prd - 1)))
+            return _unwrap(factor)
+
+        discount = np.asarray(discount, dtype=float)
+        year_built = np.asarray(year_built, dtype=float)
+        stf_min = np.asarray(stf_min, dtype=float)
+        # invcost factor for intertemporal planning
+        no_discount = np.where(
+            interest == 0,
+            1,
+            (dep_prd * ((1 + interest) ** dep_prd * interest) /
+             ((1 + interest) ** dep_prd - 1)))
+        with_discount = np.where(
+            interest == 0,
+            ((1 + discount) ** (1 - (year_built-stf_min)) *
+             ((1 + discount) ** dep_prd - 1) /
+             (dep_prd * discount * (1 + discount) ** dep_prd)),
+            ((1 + discount) ** (1 - (year_built-stf_min)) *
+             (interest * (1 + interest) ** dep_prd *
+             ((1 + discount) ** dep_prd - 1)) /
+             (discount * (1 + discount) ** dep_prd *
+             ((1+interest) ** dep_prd - 1))))
+        return _unwrap(np.where(discount == 0, no_discount, with_discount))
 
 
 def overpay_factor(dep_prd, interest, discount, year_built, stf_min, stf_end):
     """Overpay value factor formula.
     Evaluates the factor multiplied to the invest costs
     for all annuity payments of a unit after the end of the
-    optimization period.
+    optimization period. All arguments can be scalars or arrays/columns of
+    equal length (evaluated element-wise).
     Args:
         dep_prd: depreciation period (years)
         interest: interest rate (e.g. 0.06 means 6 %)
@@ -52,46 +64,60 @@ def overpay_factor(dep_prd, interest, discount, year_built, stf_min, stf_end):
         discount: discount rate for intertemporal planning
         k: operational time after simulation horizon
     """
+    dep_prd = np.asarray(dep_prd, dtype=float)
+    interest = np.asarray(interest, dtype=float)
+    discount = np.asarray(discount, dtype=float)
+    year_built = np.asarray(year_built, dtype=float)
+    stf_min = np.asarray(stf_min, dtype=float)
+    stf_end = np.asarray(stf_end, dtype=float)
 
     op_time = (year_built + dep_prd) - stf_end - 1
 
-    if discount == 0:
-        if interest == 0:
-            return op_time / dep_prd
-        else:
-            return (op_time * ((1 + interest) ** dep_prd * interest) /
-                    ((1 + interest) ** dep_prd - 1))
-    else:
-        if interest == 0:
-            return ((1 + discount) ** (1 - (year_built - stf_min)) *
-                    ((1 + discount) ** op_time - 1) /
-                    (dep_prd * discount * (1 + discount) ** dep_prd))
-        else:
-            return ((1 + discount) ** (1 - (year_built - stf_min)) *
-                    (interest * (1 + interest) ** dep_prd *
-                    ((1 + discount) ** op_time - 1)) /
-                    (discount * (1 + discount) ** dep_prd *
-                    ((1 + interest) ** dep_prd - 1)))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        no_discount = np.where(
+            interest == 0,
+            op_time / dep_prd,
+            (op_time * ((1 + interest) ** dep_prd * interest) /
+             ((1 + interest) ** dep_prd - 1)))
+        with_discount = np.where(
+            interest == 0,
+            ((1 + discount) ** (1 - (year_built - stf_min)) *
+             ((1 + discount) ** op_time - 1) /
+             (dep_prd * discount * (1 + discount) ** dep_prd)),
+            ((1 + discount) ** (1 - (year_built - stf_min)) *
+             (interest * (1 + interest) ** dep_prd *
+             ((1 + discount) ** op_time - 1)) /
+             (discount * (1 + discount) ** dep_prd *
+             ((1 + interest) ** dep_prd - 1))))
+        return _unwrap(np.where(discount == 0, no_discount, with_discount))
+
+
+def _unwrap(array):
+    """Return 0-d arrays as scalars, so that scalar arguments of the factor
+    formulas give scalar results."""
+    if array.ndim == 0:
+        return array.item()
+    return array
 
 
 # Energy related costs
 def stf_dist(stf, m):
     """Calculates the distance between the modeled support timeframes.
+    stf can be a single support timeframe or an array/column of them.
     """
     sorted_stf = sorted(m.stf_list)
-    dist = []
-
-    for s in sorted_stf:
-        if s == max(sorted_stf):
-            dist.append(m.global_prop.loc[(s, 'Weight')]['value'])
-        else:
-            dist.append(sorted_stf[sorted_stf.index(s) + 1] - s)
+    dist = {s: later - s for s, later in zip(sorted_stf, sorted_stf[1:])}
+    dist[sorted_stf[-1]] = m.global_prop.loc[(sorted_stf[-1],
+                                              'Weight')]['value']
 
-    return dist[sorted_stf.index(stf)]
+    if np.ndim(stf) == 0:
+        return dist[stf]
+    return np.array([dist[s] for s in stf], dtype=float)
 
 
 def discount_factor(stf, m):
     """Discount for any payment made in the year stf
+    (single support timeframe or array/column of them)
     """
     discount = (m.global_prop.xs('Discount rate', level=1)
                 .loc[m.global_prop.index.min()[0]]['value'])
@@ -102,6 +128,7 @@ def discount_factor(stf, m):
 def effective_distance(dist, m):
     """Factor for variable, fuel, purchase, sell, and fix costs.
     Calculated by repetition of modeled stfs and discount utility.
+    dist can be a single distance or an array/column of them.
     """
     discount = (m.global_prop.xs('Discount rate', level=1)
                 .loc[m.global_prop.index.min()[0]]['value'])
@@ -112,6 +139,26 @@ def effective_distance(dist, m):
         return (1 - (1 + discount) ** (-dist)) / discount
 
 
+def stf_const_cap(const_cap, units, cap_up, inst_cap):
+    """Constant capacity units for intertemporal planning.
+    Keeps only those rows of const_cap whose installed capacity equals the
+    maximum cap-up of the same unit over all support timeframes.
+    Args:
+        const_cap: rows of units with inst-cap == cap-up
+        units: process, transmission or storage DataFrame with the support
+               timeframe as first index level
+        cap_up: name of the cap-up column
+        inst_cap: name of the inst-cap column
+    Returns:
+        the remaining rows of const_cap
+    """
+    unit_levels = list(range(1, units.index.nlevels))
+    max_cap_up = units[cap_up].groupby(level=unit_levels).transform('max')
+    keep = (max_cap_up.loc[const_cap.index].values ==
+            const_cap[inst_cap].values)
+    return const_cap[keep]
+
+
 def commodity_balance(m, tm, stf, sit, com):
     """Calculate commodity balance at given timestep.
     For a given commodity co and timestep tm, calculate the balance of
@@ -127,16 +174,14 @@ def commodity_balance(m, tm, stf, sit, com):
     Returns
         balance: net value of consumed (positive) or provided (negative) power
     """
-    balance = (sum(m.e_pro_in[(tm, stframe, site, process, com)]
+    balance = (sum(m.e_pro_in[(tm, stf, sit, process, com)]
                    # usage as input for process increases balance
-                   for stframe, site, process in m.pro_tuples
-                   if site == sit and stframe == stf and
-                   (stframe, process, com) in m.r_in_dict) -
-               sum(m.e_pro_out[(tm, stframe, site, process, com)]
+                   for process in m.balance_pro_in_dict.get(
+                       (stf, sit, com), ())) -
+               sum(m.e_pro_out[(tm, stf, sit, process, com)]
                    # output from processes decreases balance
-                   for stframe, site, process in m.pro_tuples
-                   if site == sit and stframe == stf and
-                   (stframe, process, com) in m.r_out_dict))
+                   for process in m.balance_pro_out_dict.get(
+                       (stf, sit, com), ())))
     if m.mode['tra']:
         balance += transmission_balance(m, tm, stf, sit, com)
     if m.mode['sto']:
@@ -145,6 +190,124 @@ def commodity_balance(m, tm, stf, sit, com):
     return balance
 
 
+def timestep_durations(timesteps, dt):
+    """Duration (hours) of each modelled timestep (c.f. m.dt).
+    Args:
+        timesteps: list of timesteps, the first being the initial timestep
+        dt: constant duration or mapping of modelled timesteps to durations
+    Returns
+        dict mapping modelled timesteps to durations
+    """
+    if np.isscalar(dt):
+        return dict.fromkeys(timesteps[1:], dt)
+    return {tm: dt[tm] for tm in timesteps[1:]}
+
+
+def timestep_weights(m, dt):
+    """Weight of each modelled timestep (c.f. m.weight).
+    Uniform length of year / length of simulation; with representative
+    periods multiplied by the number of periods the timestep's
+    representative period stands for. The length of simulation includes
+    the initial timestep, which lasts as long as the first modelled
+    timestep if dt has no duration for it.
+    Returns
+        dict mapping modelled timesteps to weights
+    """
+    steps = m.timesteps[1:]
+    if not m.mode['rep']:
+        if np.isscalar(dt):
+            hours = len(m.timesteps) * dt
+        else:
+            initial = m.timesteps[0]
+            hours = (dt[initial] if initial in dt else dt[steps[0]]) + \
+                sum(dt[tm] for tm in steps)
+        return dict.fromkeys(steps, float(8760) / hours)
+
+    if not np.isscalar(dt):
+        raise ValueError('Representative periods require a constant '
+                         'timestep duration dt.')
+    counts = np.bincount(m.period_order)
+    scale = period_scale(m, dt)
+    return {tm: counts[i // m.period_length] * scale
+            for i, tm in enumerate(steps)}
+
+
+def period_scale(m, dt):
+    """Length of year / length of all chronological periods (hours)."""
+    return float(8760) / (len(m.period_order) * m.period_length * dt)
+
+
+def period_timesteps(m, period):
+    """Modelled timesteps of a representative period."""
+    first = 1 + period * m.period_length
+    return list(m.timesteps[first:first + m.period_length])
+
+
+def partial_process_input(m, tm, stf, sit, pro, coin):
+    """Input flow of a process with partial load behaviour.
+    Linear in capacity and throughput, such that the input ratio is R at
+    full load and r at the minimal load fraction.
+    Returns
+        dt * cap_pro * online_factor + tau_pro * throughput_factor
+    """
+    # input ratio at maximum operation point
+    R = m.r_in_dict[(stf, pro, coin)]
+    # input ratio at lowest operation point
+    r = m.r_in_min_fraction_dict[stf, pro, coin]
+    return partial_process_flow(m, tm, stf, sit, pro, R, r)
+
+
+def partial_process_output(m, tm, stf, sit, pro, coo):
+    """Output flow of a process with partial load behaviour
+    (c.f. partial_process_input).
+    """
+    # output ratio at maximum operation point
+    R = m.r_out_dict[stf, pro, coo]
+    # output ratio at lowest operation point
+    r = m.r_out_min_fraction_dict[stf, pro, coo]
+    return partial_process_flow(m, tm, stf, sit, pro, R, r)
+
+
+def partial_process_flow(m, tm, stf, sit, pro, R, r):
+    min_fraction = m.process_dict['min-fraction'][(stf, sit, pro)]
+
+    online_factor = min_fraction * (r - R) / (1 - min_fraction)
+    throughput_factor = (R - min_fraction * r) / (1 - min_fraction)
+
+    return (m.dt[tm] * m.cap_pro[stf, sit, pro] * online_factor +
+            m.tau_pro[tm, stf, sit, pro] * throughput_factor)
+
+
+def process_balance_dict(pro_index, ratio_dict):
+    """ Processes consuming or producing a commodity by (stf, site, com).
+    Precomputed once in pyomo_model_prep, so that commodity_balance only
+    visits the process tuples that actually contribute to a balance.
+    Args:
+        pro_index: iterable of (stf, site, process) tuples
+        ratio_dict: r_in_dict or r_out_dict with (stf, process, com) keys
+    Returns:
+        dict mapping (stf, site, com) to a list of process names
+    """
+    pro_coms = {}
+    for (stf, pro, com) in ratio_dict:
+        pro_coms.setdefault((stf, pro), []).append(com)
+
+    balance_dict = {}
+    for (stf, sit, pro) in pro_index:
+        for com in pro_coms.get((stf, pro), ()):
+            balance_dict.setdefault((stf, sit, com), []).append(pro)
+
+    return balance_dict
+
+
+def finite_or_none(value):
+    """Variable bound value: None for an infinite or NaN (i.e. missing)
+    bound, e.g. of an empty spreadsheet cell."""
+    if value is None or not math.isfinite(value):
+        return None
+    return value
+
+
 def commodity_subset(com_tuples, type_name):
     """ Unique list of commodity names for given type.
     Args:
@@ -76,10 +76,13 @@ def add_storage(m):
         m.tm, m.sto_tuples,
         within=pyomo.NonNegativeReals,
         doc='Power flow out of storage (MW) per timestep')
-    m.e_sto_con = pyomo.Var(
-        m.t, m.sto_tuples,
-        within=pyomo.NonNegativeReals,
-        doc='Energy content of storage (MWh) in timestep')
+    if m.mode['rep']:
+        add_storage_periods(m)
+    else:
+        m.e_sto_con = pyomo.Var(
+            m.t, m.sto_tuples,
+            within=pyomo.NonNegativeReals,
+            doc='Energy content of storage (MWh) in timestep')
 
     # storage rules
     m.def_storage_state = pyomo.Constraint(
@@ -94,10 +97,11 @@ def add_storage(m):
         m.tm, m.sto_tuples,
         rule=res_storage_output_by_power_rule,
         doc='storage output <= storage power')
-    m.res_storage_state_by_capacity = pyomo.Constraint(
-        m.t, m.sto_tuples,
-        rule=res_storage_state_by_capacity_rule,
-        doc='storage content <= storage capacity')
+    if not m.mode['rep']:
+        m.res_storage_state_by_capacity = pyomo.Constraint(
+            m.t, m.sto_tuples,
+            rule=res_storage_state_by_capacity_rule,
+            doc='storage content <= storage capacity')
     m.res_storage_power = pyomo.Constraint(
         m.sto_tuples,
         rule=res_storage_power_rule,
@@ -106,12 +110,16 @@ def add_storage(m):
         m.sto_tuples,
         rule=res_storage_capacity_rule,
         doc='storage.cap-lo-c <= storage capacity <= storage.cap-up-c')
-    m.res_initial_and_final_storage_state = pyomo.Constraint(
-        m.t, m.sto_init_bound_tuples,
-        rule=res_initial_and_final_storage_state_rule,
-        doc='storage content initial == and final >= storage.init * capacity')
+    m.res_initial_storage_state = pyomo.Constraint(
+        m.sto_init_bound_tuples,
+        rule=res_initial_storage_state_rule,
+        doc='storage content initial == storage.init * capacity')
+    m.res_final_storage_state = pyomo.Constraint(
+        m.sto_init_bound_tuples,
+        rule=res_final_storage_state_rule,
+        doc='storage content final >= storage.init * capacity')
     m.res_initial_and_final_storage_state_var = pyomo.Constraint(
-        m.t, m.sto_tuples - m.sto_init_bound_tuples,
+        m.sto_tuples - m.sto_init_bound_tuples,
         rule=res_initial_and_final_storage_state_var_rule,
         doc='storage content initial <= final, both variable')
     m.def_storage_energy_power_ratio = pyomo.Constraint(
@@ -122,21 +130,145 @@ def add_storage(m):
     return m
 
 
+def add_storage_periods(m):
+    """Storage content with representative periods (c.f. aggregate_periods).
+
+    e_sto_con is the content relative to the start of the representative
+    period. The absolute content at the boundaries of the chronological
+    periods, e_sto_con_period, links the periods: it changes over each
+    period by the relative content at the end of its representative period.
+    The capacity limits apply to the boundary content plus the extreme
+    relative contents of the representative period.
+    """
+    from .modelhelper import period_timesteps
+
+    m.rep_period = pyomo.Set(
+        initialize=range(max(m.period_order) + 1),
+        doc='Set of representative periods')
+    m.period = pyomo.Set(
+        initialize=range(len(m.period_order)),
+        ordered=True,
+        doc='Set of chronological periods')
+    m.period_bound = pyomo.Set(
+        initialize=range(len(m.period_order) + 1),
+        ordered=True,
+        doc='Set of boundaries of the chronological periods')
+
+    # representative period of each modelled timestep and the first and
+    # last timesteps of each representative period
+    m.period_of_timestep = {}
+    m.period_first = {}
+    m.period_last = {}
+    for r in m.rep_period:
+        steps = period_timesteps(m, r)
+        m.period_of_timestep.update(dict.fromkeys(steps, r))
+        m.period_first[r] = steps[0]
+        m.period_last[r] = steps[-1]
+
+    m.e_sto_con = pyomo.Var(
+        m.tm, m.sto_tuples,
+        within=pyomo.Reals,
+        doc='Energy content of storage (MWh) in timestep, relative to the '
+            'start of the representative period')
+    m.e_sto_con_period = pyomo.Var(
+        m.period_bound, m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Energy content of storage (MWh) at period boundary')
+    m.e_sto_con_max = pyomo.Var(
+        m.rep_period, m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Maximum relative energy content of storage (MWh) in period')
+    m.e_sto_con_min = pyomo.Var(
+        m.rep_period, m.sto_tuples,
+        within=pyomo.NonPositiveReals,
+        doc='Minimum relative energy content of storage (MWh) in period')
+
+    m.def_storage_state_period = pyomo.Constraint(
+        m.period, m.sto_tuples,
+        rule=def_storage_state_period_rule,
+        doc='storage[p+1] = (1 - sd) ** period * storage[p] + '
+            'relative storage at end of representative period')
+    m.res_storage_state_by_period_max = pyomo.Constraint(
+        m.tm, m.sto_tuples,
+        rule=res_storage_state_by_period_max_rule,
+        doc='relative storage content <= maximum of period')
+    m.res_storage_state_by_period_min = pyomo.Constraint(
+        m.tm, m.sto_tuples,
+        rule=res_storage_state_by_period_min_rule,
+        doc='relative storage content >= minimum of period')
+    m.res_storage_state_by_capacity = pyomo.Constraint(
+        m.period, m.sto_tuples,
+        rule=res_storage_state_period_by_capacity_rule,
+        doc='storage[p] + maximum of period <= storage capacity')
+    m.res_storage_state_period_min = pyomo.Constraint(
+        m.period, m.sto_tuples,
+        rule=res_storage_state_period_min_rule,
+        doc='(1 - sd) ** period * storage[p] + minimum of period >= 0')
+
+
 # constraints
 
 # storage content in timestep [t] == storage content[t-1] * (1-discharge)
 # + newly stored energy * input efficiency
 # - retrieved energy / output efficiency
 def def_storage_state_rule(m, t, stf, sit, sto, com):
+    if m.mode['rep'] and m.period_first[m.period_of_timestep[t]] == t:
+        # relative content at the start of a representative period
+        previous = 0
+    else:
+        previous = m.e_sto_con[t - 1, stf, sit, sto, com]
     return (m.e_sto_con[t, stf, sit, sto, com] ==
-            m.e_sto_con[t - 1, stf, sit, sto, com] *
+            previous *
             (1 - m.storage_dict['discharge']
-             [(stf, sit, sto, com)]) ** m.dt.value +
+             [(stf, sit, sto, com)]) ** pyomo.value(m.dt[t]) +
             m.e_sto_in[t, stf, sit, sto, com] *
             m.storage_dict['eff-in'][(stf, sit, sto, com)] -
             m.e_sto_out[t, stf, sit, sto, com] /
             m.storage_dict['eff-out'][(stf, sit, sto, com)])
 
+
+# storage content at period boundary [p+1] == storage content[p] *
+# (1-discharge) over the period + relative storage content at the end of
+# the representative period of p
+def def_storage_state_period_rule(m, p, stf, sit, sto, com):
+    r = m.period_order[p]
+    return (m.e_sto_con_period[p + 1, stf, sit, sto, com] ==
+            m.e_sto_con_period[p, stf, sit, sto, com] *
+            period_discharge_factor(m, stf, sit, sto, com) +
+            m.e_sto_con[m.period_last[r], stf, sit, sto, com])
+
+
+# relative storage content within extreme values of the period
+def res_storage_state_by_period_max_rule(m, t, stf, sit, sto, com):
+    return (m.e_sto_con[t, stf, sit, sto, com] <=
+            m.e_sto_con_max[m.period_of_timestep[t], stf, sit, sto, com])
+
+
+def res_storage_state_by_period_min_rule(m, t, stf, sit, sto, com):
+    return (m.e_sto_con[t, stf, sit, sto, com] >=
+            m.e_sto_con_min[m.period_of_timestep[t], stf, sit, sto, com])
+
+
+# storage content at period boundary + maximum relative content of the
+# period <= storage capacity
+def res_storage_state_period_by_capacity_rule(m, p, stf, sit, sto, com):
+    return (m.e_sto_con_period[p, stf, sit, sto, com] +
+            m.e_sto_con_max[m.period_order[p], stf, sit, sto, com] <=
+            m.cap_sto_c[stf, sit, sto, com])
+
+
+# discharged storage content at period boundary + minimum relative content
+# of the period >= 0
+def res_storage_state_period_min_rule(m, p, stf, sit, sto, com):
+    return (m.e_sto_con_period[p, stf, sit, sto, com] *
+            period_discharge_factor(m, stf, sit, sto, com) +
+            m.e_sto_con_min[m.period_order[p], stf, sit, sto, com] >= 0)
+
+
+def period_discharge_factor(m, stf, sit, sto, com):
+    return ((1 - m.storage_dict['discharge'][(stf, sit, sto, com)]) **
+            (pyomo.value(m.dt[m.tm.first()]) * m.period_length))
+
 # storage capacity (for m.cap_sto_c expression)
 
 
@@ -202,13 +334,13 @@ def def_storage_power_rule(m, stf, sit, sto, com):
 
 
 def res_storage_input_by_power_rule(m, t, stf, sit, sto, com):
-    return (m.e_sto_in[t, stf, sit, sto, com] <= m.dt *
+    return (m.e_sto_in[t, stf, sit, sto, com] <= m.dt[t] *
             m.cap_sto_p[stf, sit, sto, com])
 
 
 # storage output <= storage power
 def res_storage_output_by_power_rule(m, t, stf, sit, sto, co):
-    return (m.e_sto_out[t, stf, sit, sto, co] <= m.dt *
+    return (m.e_sto_out[t, stf, sit, sto, co] <= m.dt[t] *
             m.cap_sto_p[stf, sit, sto, co])
 
 
@@ -235,22 +367,39 @@ def res_storage_capacity_rule(m, stf, sit, sto, com):
 # initialization of storage content in first timestep t[1]
 # forced minimun  storage content in final timestep t[len(m.t)]
 # content[t=1] == storage capacity * fraction <= content[t=final]
-def res_initial_and_final_storage_state_rule(m, t, stf, sit, sto, com):
-    if t == m.t[1]:  # first timestep (Pyomo uses 1-based indexing)
-        return (m.e_sto_con[t, stf, sit, sto, com] ==
-                m.cap_sto_c[stf, sit, sto, com] *
-                m.storage_dict['init'][(stf, sit, sto, com)])
-    elif t == m.t[len(m.t)]:  # last timestep
-        return (m.e_sto_con[t, stf, sit, sto, com] >=
-                m.cap_sto_c[stf, sit, sto, com] *
-                m.storage_dict['init'][(stf, sit, sto, com)])
-    else:
-        return pyomo.Constraint.Skip
+def res_initial_storage_state_rule(m, stf, sit, sto, com):
+    return (initial_storage_state(m, stf, sit, sto, com) ==
+            m.cap_sto_c[stf, sit, sto, com] *
+            m.storage_dict['init'][(stf, sit, sto, com)])
+
 
+def res_final_storage_state_rule(m, stf, sit, sto, com):
+    return (final_storage_state(m, stf, sit, sto, com) >=
+            m.cap_sto_c[stf, sit, sto, com] *
+            m.storage_dict['init'][(stf, sit, sto, com)])
 
-def res_initial_and_final_storage_state_var_rule(m, t, stf, sit, sto, com):
-    return (m.e_sto_con[m.t[1], stf, sit, sto, com] <=
-            m.e_sto_con[m.t[len(m.t)], stf, sit, sto, com])
+
+def res_initial_and_final_storage_state_var_rule(m, stf, sit, sto, com):
+    return (initial_storage_state(m, stf, sit, sto, com) <=
+            final_storage_state(m, stf, sit, sto, com))
+
+
+def initial_storage_state(m, stf, sit, sto, com):
+    """Storage content in the first timestep (Pyomo uses 1-based
+    indexing), or at the first period boundary with representative
+    periods."""
+    if m.mode['rep']:
+        return m.e_sto_con_period[m.period_bound[1], stf, sit, sto, com]
+    return m.e_sto_con[m.t[1], stf, sit, sto, com]
+
+
+def final_storage_state(m, stf, sit, sto, com):
+    """Storage content in the last timestep, or at the last period
+    boundary with representative periods."""
+    if m.mode['rep']:
+        return m.e_sto_con_period[m.period_bound[len(m.period_bound)],
+                                  stf, sit, sto, com]
+    return m.e_sto_con[m.t[len(m.t)], stf, sit, sto, com]
 
 
 def def_storage_energy_power_ratio_rule(m, stf, sit, sto, com):
@@ -264,12 +413,26 @@ def storage_balance(m, tm, stf, sit, com):
     For a given commodity co and timestep tm, calculate the balance of
     storage input and output """
 
-    return sum(m.e_sto_in[(tm, stframe, site, storage, com)] -
-               m.e_sto_out[(tm, stframe, site, storage, com)]
+    return sum(m.e_sto_in[(tm, stf, sit, storage, com)] -
+               m.e_sto_out[(tm, stf, sit, storage, com)]
                # usage as input for storage increases consumption
                # output from storage decreases consumption
-               for stframe, site, storage, commodity in m.sto_tuples
-               if site == sit and stframe == stf and commodity == com)
+               for storage in m.balance_sto_dict.get((stf, sit, com), ()))
+
+
+def storage_balance_dict(sto_index):
+    """ Storages by (stf, site, com), precomputed once in pyomo_model_prep
+    for storage_balance.
+    Args:
+        sto_index: iterable of (stf, site, storage, com) tuples
+    Returns:
+        dict mapping (stf, site, com) to a list of storage names
+    """
+    balance_dict = {}
+    for (stf, sit, sto, com) in sto_index:
+        balance_dict.setdefault((stf, sit, com), []).append(sto)
+
+    return balance_dict
 
 # storage costs
 
@@ -299,14 +462,26 @@ def storage_cost(m, cost_type):
                    m.storage_dict['cost_factor'][s]
                    for s in m.sto_tuples)
     elif cost_type == 'Variable':
-        return sum(m.e_sto_con[(tm,) + s] * m.weight *
+        cost = sum(m.e_sto_con[(tm,) + s] * m.weight[tm] *
                    m.storage_dict['var-cost-c'][s] *
                    m.storage_dict['cost_factor'][s] +
                    (m.e_sto_in[(tm,) + s] + m.e_sto_out[(tm,) + s]) *
-                   m.weight * m.storage_dict['var-cost-p'][s] *
+                   m.weight[tm] * m.storage_dict['var-cost-p'][s] *
                    m.storage_dict['cost_factor'][s]
                    for tm in m.tm
                    for s in m.sto_tuples)
+        if m.mode['rep']:
+            from .modelhelper import period_scale
+            # content at the period boundaries, held through each period
+            # in addition to the relative content
+            scale = (period_scale(m, pyomo.value(m.dt[m.tm.first()])) *
+                     m.period_length)
+            cost += sum(m.e_sto_con_period[(p,) + s] * scale *
+                        m.storage_dict['var-cost-c'][s] *
+                        m.storage_dict['cost_factor'][s]
+                        for p in m.period
+                        for s in m.sto_tuples)
+        return cost
 
 
 def op_sto_tuples(sto_tuple, m):
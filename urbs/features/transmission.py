@@ -125,7 +125,7 @@ def def_transmission_output_rule(m, tm, stf, sin, sout, tra, com):
 # transmission input <= transmission capacity
 def res_transmission_input_by_capacity_rule(m, tm, stf, sin, sout, tra, com):
     return (m.e_tra_in[tm, stf, sin, sout, tra, com] <=
-            m.dt * m.cap_tra[stf, sin, sout, tra, com])
+            m.dt[tm] * m.cap_tra[stf, sin, sout, tra, com])
 
 
 # lower bound <= transmission capacity <= upper bound
@@ -147,20 +147,32 @@ def transmission_balance(m, tm, stf, sit, com):
     For a given commodity co and timestep tm, calculate the balance of
     import and export """
 
-    return (sum(m.e_tra_in[(tm, stframe, site_in, site_out,
-                            transmission, com)]
+    return (sum(m.e_tra_in[(tm, stf, sit, site_out, transmission, com)]
                 # exports increase balance
-                for stframe, site_in, site_out, transmission, commodity
-                in m.tra_tuples
-                if (site_in == sit and stframe == stf and commodity) ==
-                com) -
-            sum(m.e_tra_out[(tm, stframe, site_in, site_out,
-                             transmission, com)]
+                for site_out, transmission
+                in m.balance_tra_in_dict.get((stf, sit, com), ())) -
+            sum(m.e_tra_out[(tm, stf, site_in, sit, transmission, com)]
                 # imports decrease balance
-                for stframe, site_in, site_out, transmission, commodity
-                in m.tra_tuples
-                if site_out == sit and stframe == stf and
-                commodity == com))
+                for site_in, transmission
+                in m.balance_tra_out_dict.get((stf, sit, com), ())))
+
+
+def transmission_balance_dicts(tra_index):
+    """ Transmissions leaving and entering a site by (stf, site, com).
+    Precomputed once in pyomo_model_prep for transmission_balance.
+    Args:
+        tra_index: iterable of (stf, site in, site out, tra, com) tuples
+    Returns:
+        (exports, imports) dicts mapping (stf, site, com) to lists of
+        (site out, tra) and (site in, tra) tuples
+    """
+    exports = {}
+    imports = {}
+    for (stf, sin, sout, tra, com) in tra_index:
+        exports.setdefault((stf, sin, com), []).append((sout, tra))
+        imports.setdefault((stf, sout, com), []).append((sin, tra))
+
+    return exports, imports
 
 
 # transmission cost function
@@ -182,7 +194,7 @@ def transmission_cost(m, cost_type):
                    m.transmission_dict['cost_factor'][t]
                    for t in m.tra_tuples)
     elif cost_type == 'Variable':
-        return sum(m.e_tra_in[(tm,) + t] * m.weight *
+        return sum(m.e_tra_in[(tm,) + t] * m.weight[tm] *
                    m.transmission_dict['var-cost'][t] *
                    m.transmission_dict['cost_factor'][t]
                    for tm in m.tm
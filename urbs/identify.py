@@ -9,8 +9,8 @@ def identify_mode(data):
 
     Features:
         Intertemporal, Transmission, Storage, DSM, Buy Sell (Price), Time
-        Variable efficiency, Expansion (4 values for process, transmission,
-        storage capacity and storage power expansion)
+        Variable efficiency, Representative periods, Expansion (4 values for
+        process, transmission, storage capacity and storage power expansion)
 
     Returns:
         mode dictionary; contains bool values that define the urbs mode
@@ -28,6 +28,7 @@ def identify_mode(data):
         'dsm': False,                   # demand site management
         'bsp': False,                   # buy sell price
         'tve': False,                   # time variable efficiency
+        'rep': False,                   # representative periods
         'exp': {                        # expansion
                 'pro': True,
                 'tra': False,
@@ -51,6 +52,8 @@ def identify_mode(data):
         mode['bsp'] = True
     if not data['eff_factor'].empty:
         mode['tve'] = True
+    if 'period' in data and not data['period'].empty:
+        mode['rep'] = True
 
     return mode
 
@@ -68,3 +71,46 @@ def identify_expansion(const_unit_df, inst_cap_df):
         return False
     else:
         return True
+
+
+def identify_independent(data):
+    """ Identify if the support timeframes of an intertemporal input can be
+        solved independently of each other: no finite CO2 budget and all
+        units (processes, transmissions, storages) built in a support
+        timeframe are operational in that support timeframe only (c.f.
+        op_pro_tuples). Installed units are constant and do not couple the
+        support timeframes.
+
+    Args:
+        data: input data dictionary
+
+    Returns:
+        True if the support timeframes are independent
+    """
+    global_prop = data['global_prop']
+    stfs = sorted(global_prop.index.levels[0])
+    if not identify_mode(data)['int']:
+        return False
+
+    budget = global_prop.loc[(stfs[0], 'CO2 budget'), 'value']
+    if 0 <= budget < float('inf'):
+        return False
+
+    # a unit built in stf is operational in stf_later, if its depreciation
+    # reaches the support timeframe after stf_later (or the end of the
+    # last one)
+    end = stfs[-1] + global_prop.loc[(stfs[-1], 'Weight'), 'value'] - 1
+    reach = dict(zip(stfs, stfs[1:] + [end]))
+    reach_next = dict(zip(stfs, stfs[2:] + [end, float('inf')]))
+
+    for name in ['process', 'transmission', 'storage']:
+        units = data[name]
+        if units.empty:
+            continue
+        stf = pd.Series(units.index.get_level_values('support_timeframe'),
+                        index=units.index)
+        life_end = stf + units['depreciation']
+        if not ((stf.map(reach) <= life_end) &
+                (life_end < stf.map(reach_next))).all():
+            return False
+    return True
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .features.modelhelper import (discount_factor, effective_distance,
+                                   inst_pro_tuples, invcost_factor, stf_dist)
+from .features.storage import inst_sto_tuples
+from .features.transmission import inst_tra_tuples
+from .input import pyomo_model_prep, select_support_timeframe
+from .model import create_model
+from .saveload import ResultContainer, create_result_cache
+
+# INDEPENDENT SUPPORT TIMEFRAMES
+# If the support timeframes of an intertemporal input are independent (c.f.
+# identify_independent), the intertemporal model is block-diagonal: one
+# block per support timeframe, whose costs are weighted by the cost factor
+# of that support timeframe. Each block is solved as the single-year model
+# of its support timeframe, with investment costs and installed capacities
+# adjusted to the intertemporal model, in its own worker process.
+
+# per unit type: investment cost columns, installed capacity columns and
+# the function giving the support timeframes reached by installed units
+UNIT_COLUMNS = {
+    'process': (['inv-cost'], ['inst-cap'], inst_pro_tuples),
+    'transmission': (['inv-cost'], ['inst-cap'], inst_tra_tuples),
+    'storage': (['inv-cost-p', 'inv-cost-c'],
+                ['inst-cap-p', 'inst-cap-c'], inst_sto_tuples)}
+
+
+def run_independent(data, Solver, timesteps=None, dt=1, jobs=None,
+                    logfile='solver.log'):
+    """Solve an intertemporal model with independent support timeframes.
+
+    Equivalent to solving create_model(data, dt, timesteps) with the cost
+    objective, if identify_independent(data) is True.
+
+    Args:
+        - data: a dict of input DataFrames of several support timeframes
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761); default: all
+          timesteps of the demand time series
+        - dt: length of each time step (unit: hours)
+        - jobs: number of worker processes, default: one per CPU; 1 solves
+          the support timeframes one after another in this process
+        - logfile: solver log file name; the support timeframe is appended,
+          e.g. solver-2030.log
+
+    Returns:
+        a ResultContainer with the merged results of all support timeframes,
+        for report and result_figures
+    """
+    if timesteps is None:
+        timesteps = data['demand'].index.get_level_values('t').unique()
+    timesteps = list(timesteps)
+
+    blocks, factors = support_timeframe_blocks(data, timesteps)
+    args = {stf: (stf, block, Solver, dt, timesteps,
+                  '{1}-{0}{2}'.format(stf, *os.path.splitext(logfile)))
+            for stf, block in blocks.items()}
+    if jobs == 1:
+        caches = {stf: _solve_block(*args[stf]) for stf in blocks}
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {stf: pool.submit(_solve_block, *args[stf])
+                       for stf in blocks}
+            caches = {stf: future.result()
+                      for stf, future in futures.items()}
+
+    return ResultContainer(data, combine_blocks(caches, factors))
+
+
+def support_timeframe_blocks(data, timesteps):
+    """Single-year input data of each support timeframe, equivalent to its
+    block of the intertemporal model.
+
+    The investment costs are scaled, such that the single-year investment
+    cost factor gives the intertemporal one (invcost-factor minus
+    overpay-factor) divided by the cost factor of the support timeframe.
+    The installed capacities are those of the first support timeframe, if
+    reached by the installed units (c.f. inst_pro_tuples), otherwise 0.
+
+    Args:
+        - data: a dict of input DataFrames of several support timeframes
+        - timesteps: a list of timesteps
+
+    Returns:
+        (blocks, factors) tuple: dicts of the input data and of the cost
+        factor by support timeframe
+    """
+    prep = pyomo_model_prep(data, timesteps)
+    prep.stf = prep.stf_list
+    stf_min = min(prep.stf_list)
+    inst = {name: set(inst_tuples(prep))
+            for name, (_, _, inst_tuples) in UNIT_COLUMNS.items()
+            if not data[name].empty}
+
+    blocks, factors = {}, {}
+    for stf in prep.stf_list:
+        factors[stf] = (discount_factor(stf, prep) *
+                        effective_distance(stf_dist(stf, prep), prep))
+        block = select_support_timeframe(data, stf)
+        for name, (cost_columns, cap_columns, _) in UNIT_COLUMNS.items():
+            units = block[name]
+            if units.empty:
+                continue
+            table = getattr(prep, '{}_dict'.format(name))
+            keys = units.index.tolist()
+            scale = (np.array([(table['invcost-factor'][key] -
+                                table['overpay-factor'][key]) /
+                               table['cost_factor'][key] for key in keys]) /
+                     invcost_factor(units['depreciation'], units['wacc']))
+            for column in cost_columns:
+                units[column] = units[column] * scale
+            for column in cap_columns:
+                units[column] = [
+                    table[column].get((stf_min,) + key[1:], 0)
+                    if key[1:] + (stf,) in inst[name] else 0
+                    for key in keys]
+        blocks[stf] = block
+    return blocks, factors
+
+
+def combine_blocks(caches, factors):
+    """Merge the result caches of the support timeframes.
+
+    Entities indexed by support timeframe are concatenated, all others
+    (e.g. timesteps, sites) are united. The costs are the sum of the costs
+    of all support timeframes, weighted by their cost factors.
+
+    Args:
+        - caches: dict of result caches by support timeframe
+        - factors: dict of cost factors by support timeframe
+
+    Returns:
+        a result cache dict
+    """
+    names = []
+    for cache in caches.values():
+        names.extend(name for name in cache if name not in names)
+
+    combined = {}
+    for name in names:
+        entity = pd.concat([cache[name] for cache in caches.values()
+                            if name in cache])
+        if 'stf' not in entity.index.names:
+            entity = entity[~entity.index.duplicated()]
+        combined[name] = entity
+
+    combined['costs'] = pd.concat(
+        [cache['costs'] * factors[stf] for stf, cache in caches.items()]
+    ).groupby(level=0, sort=False).sum()
+    return combined
+
+
+def _solve_block(stf, data, Solver, dt, timesteps, logfile):
+    """Solve the single-year model of one support timeframe.
+
+    Returns:
+        the result cache
+    """
+    from .runfunctions import setup_solver
+
+    prob = create_model(data, dt, timesteps)
+    optim = setup_solver(Solver, logfile=logfile)
+    result = optim.solve(prob)
+    if str(result.solver.termination_condition) != 'optimal':
+        raise RuntimeError('Support timeframe {} is {}.'.format(
+            stf, result.solver.termination_condition))
+    return create_result_cache(prob)
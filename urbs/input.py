@@ -1,13 +1,18 @@
+import numpy as np
 import pandas as pd
 import os
 import glob
+import hashlib
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 from xlrd import XLRDError
 import pyomo.core as pyomo
 from .features.modelhelper import *
 from .identify import *
 
 
-def read_input(input_files, year):
+def read_input(input_files, year, cache=False, jobs=None):
     """Read Excel input file and prepare URBS input dict.
 
     Reads the Excel spreadsheets that adheres to the structure shown in
@@ -17,6 +22,11 @@ def read_input(input_files, year):
     Args:
         - filename: filename to Excel spreadsheets
         - year: current year for non-intertemporal problems
+        - cache: if True, parsed spreadsheets are cached in a HDF5 file in
+          the subfolder '.cache' next to them (c.f. workbook_cache_file),
+          default: False
+        - jobs: number of worker processes parsing spreadsheets that are
+          not cached, default: one per spreadsheet (at most one per core)
 
     Returns:
         a dict of up to 12 DataFrames
@@ -28,136 +38,155 @@ def read_input(input_files, year):
     else:
         input_files = [input_files]
 
-    gl = []
-    sit = []
-    com = []
-    pro = []
-    pro_com = []
-    tra = []
-    sto = []
-    dem = []
-    sup = []
-    bsp = []
-    ds = []
-    ef = []
-
-    for filename in input_files:
-        with pd.ExcelFile(filename) as xls:
-
-            global_prop = xls.parse('Global').set_index(['Property'])
-            # create support timeframe index
-            if ('Support timeframe' in
-                    xls.parse('Global').set_index('Property').value):
-                support_timeframe = (
-                    global_prop.loc['Support timeframe']['value'])
-                global_prop = (
-                    global_prop.drop(['Support timeframe'])
-                    .drop(['description'], axis=1))
-            else:
-                support_timeframe = year
-            global_prop = pd.concat([global_prop], keys=[support_timeframe],
-                                    names=['support_timeframe'])
-            gl.append(global_prop)
-            site = xls.parse('Site').set_index(['Name'])
-            site = pd.concat([site], keys=[support_timeframe],
-                             names=['support_timeframe'])
-            sit.append(site)
-            commodity = (
-                xls.parse('Commodity')
-                   .set_index(['Site', 'Commodity', 'Type']))
-            commodity = pd.concat([commodity], keys=[support_timeframe],
-                                  names=['support_timeframe'])
-            com.append(commodity)
-            process = xls.parse('Process').set_index(['Site', 'Process'])
-            process = pd.concat([process], keys=[support_timeframe],
+    # load cached spreadsheets, parse the others concurrently
+    workbooks = [None] * len(input_files)
+    if cache:
+        cache_files = [workbook_cache_file(filename, year)
+                       for filename in input_files]
+        for i, cache_file in enumerate(cache_files):
+            if os.path.exists(cache_file):
+                workbooks[i] = load_workbook_cache(cache_file)
+    missing = [i for i, wb in enumerate(workbooks) if wb is None]
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(missing))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = list(pool.map(read_workbook,
+                                   [input_files[i] for i in missing],
+                                   [year] * len(missing)))
+    else:
+        parsed = [read_workbook(input_files[i], year) for i in missing]
+
+    for i, workbook in zip(missing, parsed):
+        workbooks[i] = workbook
+        if cache:
+            write_workbook_cache(cache_files[i], workbook)
+
+    # prepare input data
+    data = {}
+    for key in WORKBOOK_KEYS:
+        data[key] = pd.concat([wb[key] for wb in workbooks], sort=False)
+    for key in ['buy_sell_price', 'eff_factor']:
+        data[key] = data[key].dropna(axis=1, how='all')
+
+    # sort nested indexes to make direct assignments work
+    for key in data:
+        if isinstance(data[key].index, pd.core.index.MultiIndex):
+            data[key].sort_index(inplace=True)
+    return data
+
+
+# version of the parsed DataFrames in workbook cache files; increase it
+# whenever read_workbook changes its result, so that older cache files are
+# not used anymore
+WORKBOOK_CACHE_VERSION = 1
+
+# keys of the DataFrames read from each input spreadsheet
+WORKBOOK_KEYS = ['global_prop', 'site', 'commodity', 'process',
+                 'process_commodity', 'demand', 'supim', 'transmission',
+                 'storage', 'dsm', 'buy_sell_price', 'eff_factor']
+
+
+def read_workbook(filename, year):
+    """Read a single Excel input spreadsheet.
+
+    Args:
+        - filename: filename of an Excel spreadsheet
+        - year: current year for non-intertemporal problems
+
+    Returns:
+        a dict of 12 DataFrames (c.f. WORKBOOK_KEYS), indexed by the support
+        timeframe of the spreadsheet; empty for missing optional sheets
+    """
+    with pd.ExcelFile(filename) as xls:
+
+        global_prop = xls.parse('Global').set_index(['Property'])
+        # create support timeframe index
+        if ('Support timeframe' in
+                xls.parse('Global').set_index('Property').value):
+            support_timeframe = (
+                global_prop.loc['Support timeframe']['value'])
+            global_prop = (
+                global_prop.drop(['Support timeframe'])
+                .drop(['description'], axis=1))
+        else:
+            support_timeframe = year
+        global_prop = pd.concat([global_prop], keys=[support_timeframe],
                                 names=['support_timeframe'])
-            pro.append(process)
-            process_commodity = (
-                xls.parse('Process-Commodity')
-                   .set_index(['Process', 'Commodity', 'Direction']))
-            process_commodity = pd.concat([process_commodity],
-                                          keys=[support_timeframe],
-                                          names=['support_timeframe'])
-            pro_com.append(process_commodity)
-            demand = xls.parse('Demand').set_index(['t'])
-            demand = pd.concat([demand], keys=[support_timeframe],
-                               names=['support_timeframe'])
-            # split columns by dots '.', so that 'DE.Elec' becomes
-            # the two-level column index ('DE', 'Elec')
-            demand.columns = split_columns(demand.columns, '.')
-            dem.append(demand)
-            supim = xls.parse('SupIm').set_index(['t'])
-            supim = pd.concat([supim], keys=[support_timeframe],
+        site = xls.parse('Site').set_index(['Name'])
+        site = pd.concat([site], keys=[support_timeframe],
+                         names=['support_timeframe'])
+        commodity = (
+            xls.parse('Commodity')
+               .set_index(['Site', 'Commodity', 'Type']))
+        commodity = pd.concat([commodity], keys=[support_timeframe],
                               names=['support_timeframe'])
-            supim.columns = split_columns(supim.columns, '.')
-            sup.append(supim)
-
-            # collect data for the additional features
-            # Transmission, Storage, DSM
-            if 'Transmission' in xls.sheet_names:
-                transmission = (
-                    xls.parse('Transmission')
-                    .set_index(['Site In', 'Site Out',
-                                'Transmission', 'Commodity']))
-                transmission = (
-                    pd.concat([transmission], keys=[support_timeframe],
-                              names=['support_timeframe']))
-            else:
-                transmission = pd.DataFrame()
-            tra.append(transmission)
-            if 'Storage' in xls.sheet_names:
-                storage = (
-                    xls.parse('Storage')
-                    .set_index(['Site', 'Storage', 'Commodity']))
-                storage = pd.concat([storage], keys=[support_timeframe],
-                                    names=['support_timeframe'])
-            else:
-                storage = pd.DataFrame()
-            sto.append(storage)
-            if 'DSM' in xls.sheet_names:
-                dsm = xls.parse('DSM').set_index(['Site', 'Commodity'])
-                dsm = pd.concat([dsm], keys=[support_timeframe],
+        process = xls.parse('Process').set_index(['Site', 'Process'])
+        process = pd.concat([process], keys=[support_timeframe],
+                            names=['support_timeframe'])
+        process_commodity = (
+            xls.parse('Process-Commodity')
+               .set_index(['Process', 'Commodity', 'Direction']))
+        process_commodity = pd.concat([process_commodity],
+                                      keys=[support_timeframe],
+                                      names=['support_timeframe'])
+        demand = xls.parse('Demand').set_index(['t'])
+        demand = pd.concat([demand], keys=[support_timeframe],
+                           names=['support_timeframe'])
+        # split columns by dots '.', so that 'DE.Elec' becomes
+        # the two-level column index ('DE', 'Elec')
+        demand.columns = split_columns(demand.columns, '.')
+        supim = xls.parse('SupIm').set_index(['t'])
+        supim = pd.concat([supim], keys=[support_timeframe],
+                          names=['support_timeframe'])
+        supim.columns = split_columns(supim.columns, '.')
+
+        # collect data for the additional features
+        # Transmission, Storage, DSM
+        if 'Transmission' in xls.sheet_names:
+            transmission = (
+                xls.parse('Transmission')
+                .set_index(['Site In', 'Site Out',
+                            'Transmission', 'Commodity']))
+            transmission = (
+                pd.concat([transmission], keys=[support_timeframe],
+                          names=['support_timeframe']))
+        else:
+            transmission = pd.DataFrame()
+        if 'Storage' in xls.sheet_names:
+            storage = (
+                xls.parse('Storage')
+                .set_index(['Site', 'Storage', 'Commodity']))
+            storage = pd.concat([storage], keys=[support_timeframe],
                                 names=['support_timeframe'])
-            else:
-                dsm = pd.DataFrame()
-            ds.append(dsm)
-            if 'Buy-Sell-Price'in xls.sheet_names:
-                buy_sell_price = xls.parse('Buy-Sell-Price').set_index(['t'])
-                buy_sell_price = pd.concat([buy_sell_price],
-                                           keys=[support_timeframe],
-                                           names=['support_timeframe'])
-                buy_sell_price.columns = \
-                    split_columns(buy_sell_price.columns, '.')
-            else:
-                buy_sell_price = pd.DataFrame()
-            bsp.append(buy_sell_price)
-            if 'TimeVarEff' in xls.sheet_names:
-                eff_factor = (xls.parse('TimeVarEff').set_index(['t']))
-                eff_factor = pd.concat([eff_factor], keys=[support_timeframe],
+        else:
+            storage = pd.DataFrame()
+        if 'DSM' in xls.sheet_names:
+            dsm = xls.parse('DSM').set_index(['Site', 'Commodity'])
+            dsm = pd.concat([dsm], keys=[support_timeframe],
+                            names=['support_timeframe'])
+        else:
+            dsm = pd.DataFrame()
+        if 'Buy-Sell-Price'in xls.sheet_names:
+            buy_sell_price = xls.parse('Buy-Sell-Price').set_index(['t'])
+            buy_sell_price = pd.concat([buy_sell_price],
+                                       keys=[support_timeframe],
                                        names=['support_timeframe'])
-                eff_factor.columns = split_columns(eff_factor.columns, '.')
-            else:
-                eff_factor = pd.DataFrame()
-            ef.append(eff_factor)
-
-    # prepare input data
-    try:
-        global_prop = pd.concat(gl, sort=False)
-        site = pd.concat(sit, sort=False)
-        commodity = pd.concat(com, sort=False)
-        process = pd.concat(pro, sort=False)
-        process_commodity = pd.concat(pro_com, sort=False)
-        demand = pd.concat(dem, sort=False)
-        supim = pd.concat(sup, sort=False)
-        transmission = pd.concat(tra, sort=False)
-        storage = pd.concat(sto, sort=False)
-        dsm = pd.concat(ds, sort=False)
-        buy_sell_price = pd.concat(bsp, sort=False)
-        eff_factor = pd.concat(ef, sort=False)
-    except KeyError:
-        pass
-
-    data = {
+            buy_sell_price.columns = \
+                split_columns(buy_sell_price.columns, '.')
+        else:
+            buy_sell_price = pd.DataFrame()
+        if 'TimeVarEff' in xls.sheet_names:
+            eff_factor = (xls.parse('TimeVarEff').set_index(['t']))
+            eff_factor = pd.concat([eff_factor], keys=[support_timeframe],
+                                   names=['support_timeframe'])
+            eff_factor.columns = split_columns(eff_factor.columns, '.')
+        else:
+            eff_factor = pd.DataFrame()
+
+    return {
         'global_prop': global_prop,
         'site': site,
         'commodity': commodity,
@@ -168,15 +197,89 @@ def read_input(input_files, year):
         'transmission': transmission,
         'storage': storage,
         'dsm': dsm,
-        'buy_sell_price': buy_sell_price.dropna(axis=1, how='all'),
-        'eff_factor': eff_factor.dropna(axis=1, how='all')
+        'buy_sell_price': buy_sell_price,
+        'eff_factor': eff_factor
     }
 
-    # sort nested indexes to make direct assignments work
-    for key in data:
-        if isinstance(data[key].index, pd.core.index.MultiIndex):
-            data[key].sort_index(inplace=True)
-    return data
+
+def workbook_cache_file(filename, year, cache_dir=None):
+    """Return the cache file name of an Excel input spreadsheet.
+
+    The name contains a hash of the spreadsheet content and of
+    WORKBOOK_CACHE_VERSION (and the year, which is used as support timeframe
+    if the spreadsheet has none), so that neither an edited spreadsheet nor
+    a changed reader matches a previous cache file.
+
+    Args:
+        - filename: filename of an Excel spreadsheet
+        - year: current year for non-intertemporal problems
+        - cache_dir: (optional) cache directory, default: subfolder '.cache'
+          in the directory of the spreadsheet
+
+    Returns:
+        the HDF5 cache file name
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(filename), '.cache')
+    name = os.path.splitext(os.path.basename(filename))[0]
+
+    digest = hashlib.sha1(str(WORKBOOK_CACHE_VERSION).encode())
+    with open(filename, 'rb') as f:
+        digest.update(f.read())
+    return os.path.join(cache_dir, '{}-{}-{}.h5'.format(
+        name, digest.hexdigest(), year))
+
+
+def load_workbook_cache(cache_file):
+    """Load the DataFrames of a spreadsheet from its cache file.
+
+    Args:
+        - cache_file: file name given by workbook_cache_file
+
+    Returns:
+        a dict of 12 DataFrames (c.f. read_workbook)
+    """
+    with pd.HDFStore(cache_file, mode='r') as store:
+        return {key: store[key] for key in WORKBOOK_KEYS}
+
+
+def write_workbook_cache(cache_file, workbook):
+    """Write the DataFrames of a spreadsheet to its cache file.
+
+    Outdated cache files of the same spreadsheet and year are removed. The
+    file is written to a temporary file first, so that concurrent runs never
+    read an incomplete cache file.
+
+    Args:
+        - cache_file: file name given by workbook_cache_file
+        - workbook: a dict of 12 DataFrames (c.f. read_workbook)
+
+    Returns:
+        Nothing
+    """
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # <name>-<sha1>-<year>.h5; the caches of other years stay valid
+    name, digest, year = os.path.basename(cache_file)[:-3].rsplit('-', 2)
+    pattern = '{}-{}-{}.h5'.format(name, '[0-9a-f]' * len(digest), year)
+    for old in glob.glob(os.path.join(cache_dir, pattern)):
+        if os.path.basename(old) == os.path.basename(cache_file):
+            continue
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+    handle, tmp_file = tempfile.mkstemp(suffix='.h5', dir=cache_dir)
+    os.close(handle)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore',
+                              category=pd.io.pytables.PerformanceWarning)
+        with pd.HDFStore(tmp_file, mode='w') as store:
+            for key in WORKBOOK_KEYS:
+                store[key] = workbook[key]
+    os.replace(tmp_file, cache_file)
 
 
 # preparing the pyomo model
@@ -204,6 +307,15 @@ def pyomo_model_prep(data, timesteps):
 
     m.mode = identify_mode(data)
     m.timesteps = timesteps
+    if m.mode['rep']:
+        # chronological order of the representative periods
+        # (c.f. aggregate_periods)
+        m.period_order = data['period']['representative'].tolist()
+        m.period_length, rest = divmod(len(timesteps) - 1,
+                                       max(m.period_order) + 1)
+        if rest:
+            raise ValueError('Timesteps must cover all representative '
+                             'periods. Create the model without timesteps.')
     m.global_prop = data['global_prop']
     commodity = data['commodity']
     process = data['process']
@@ -216,11 +328,11 @@ def pyomo_model_prep(data, timesteps):
     # creating list wih cost types
     m.cost_type_list = ['Invest', 'Fixed', 'Variable', 'Fuel', 'Environmental']
 
-    # Converting Data frames to dict
+    # Converting Data frames to parameter tables (c.f. ParamTable)
     # Data frames that need to be modified will be converted after modification
-    m.site_dict = data['site'].to_dict()
-    m.demand_dict = data['demand'].to_dict()
-    m.supim_dict = data['supim'].to_dict()
+    m.site_dict = ParamTable(data['site'])
+    m.demand_dict = ParamTable(data['demand'])
+    m.supim_dict = ParamTable(data['supim'])
 
     # additional features
     if m.mode['tra']:
@@ -236,15 +348,15 @@ def pyomo_model_prep(data, timesteps):
         sto_const_cap_p = storage[storage['inst-cap-p'] == storage['cap-up-p']]
 
     if m.mode['dsm']:
-        m.dsm_dict = data["dsm"].dropna(axis=0, how='all').to_dict()
+        m.dsm_dict = ParamTable(data["dsm"].dropna(axis=0, how='all'))
     if m.mode['bsp']:
-        m.buy_sell_price_dict = \
-            data["buy_sell_price"].dropna(axis=0, how='all').to_dict()
+        m.buy_sell_price_dict = ParamTable(
+            data["buy_sell_price"].dropna(axis=0, how='all'))
         # adding Revenue and Purchase to cost types
         m.cost_type_list.extend(['Revenue', 'Purchase'])
     if m.mode['tve']:
-        m.eff_factor_dict = \
-            data["eff_factor"].dropna(axis=0, how='all').to_dict()
+        m.eff_factor_dict = ParamTable(
+            data["eff_factor"].dropna(axis=0, how='all'))
 
     # Create columns of support timeframe values
     commodity['support_timeframe'] = (commodity.index.
@@ -276,6 +388,19 @@ def pyomo_model_prep(data, timesteps):
     m.r_out_dict = (data['process_commodity'].xs('Out', level='Direction')
                     ['ratio'].to_dict())
 
+    # commodity balance index: processes consuming/producing a commodity
+    # per (stf, site, com), so that commodity_balance does not need to scan
+    # all process tuples for each of its terms
+    m.balance_pro_in_dict = process_balance_dict(process.index, m.r_in_dict)
+    m.balance_pro_out_dict = process_balance_dict(process.index,
+                                                  m.r_out_dict)
+    if m.mode['tra']:
+        (m.balance_tra_in_dict,
+         m.balance_tra_out_dict) = transmission_balance_dicts(
+            transmission.index)
+    if m.mode['sto']:
+        m.balance_sto_dict = storage_balance_dict(storage.index)
+
     # process areas
     proc_area = data["process"]['area-per-cap']
     proc_area = proc_area[proc_area >= 0]
@@ -315,11 +440,8 @@ def pyomo_model_prep(data, timesteps):
     # derive invcost factor from WACC and depreciation duration
     if m.mode['int']:
         # modify pro_const_cap for intertemporal mode
-        for index in tuple(pro_const_cap.index):
-            stf_process = process.xs((index[1], index[2]), level=(1, 2))
-            if (not stf_process['cap-up'].max(axis=0) ==
-                    pro_const_cap.loc[index]['inst-cap']):
-                pro_const_cap = pro_const_cap.drop(index)
+        pro_const_cap = stf_const_cap(pro_const_cap, process,
+                                      'cap-up', 'inst-cap')
 
         # derive invest factor from WACC, depreciation and discount untility
         process['discount'] = (m.global_prop.xs('Discount rate', level=1)
@@ -330,44 +452,37 @@ def pyomo_model_prep(data, timesteps):
                               (max(commodity.index.get_level_values
                                    ('support_timeframe').unique()),
                                'Weight')]['value'] - 1)
-        process['invcost-factor'] = (process.apply(
-                                     lambda x: invcost_factor(
-                                         x['depreciation'],
-                                         x['wacc'],
-                                         x['discount'],
-                                         x['support_timeframe'],
-                                         x['stf_min']),
-                                     axis=1))
+        process['invcost-factor'] = invcost_factor(
+            process['depreciation'],
+            process['wacc'],
+            process['discount'],
+            process['support_timeframe'],
+            process['stf_min'])
 
         # derive overpay-factor from WACC, depreciation and discount untility
-        process['overpay-factor'] = (process.apply(
-                                     lambda x: overpay_factor(
-                                         x['depreciation'],
-                                         x['wacc'],
-                                         x['discount'],
-                                         x['support_timeframe'],
-                                         x['stf_min'],
-                                         x['stf_end']),
-                                     axis=1))
+        process['overpay-factor'] = overpay_factor(
+            process['depreciation'],
+            process['wacc'],
+            process['discount'],
+            process['support_timeframe'],
+            process['stf_min'],
+            process['stf_end'])
         process.loc[(process['overpay-factor'] < 0) |
                     (process['overpay-factor']
                      .isnull()), 'overpay-factor'] = 0
 
         # Derive multiplier for all energy based costs
-        commodity['stf_dist'] = (commodity['support_timeframe'].
-                                 apply(stf_dist, m=m))
-        commodity['discount-factor'] = (commodity['support_timeframe'].
-                                        apply(discount_factor, m=m))
-        commodity['eff-distance'] = (commodity['stf_dist'].
-                                     apply(effective_distance, m=m))
+        commodity['stf_dist'] = stf_dist(commodity['support_timeframe'], m)
+        commodity['discount-factor'] = discount_factor(
+            commodity['support_timeframe'], m)
+        commodity['eff-distance'] = effective_distance(
+            commodity['stf_dist'], m)
         commodity['cost_factor'] = (commodity['discount-factor'] *
                                     commodity['eff-distance'])
-        process['stf_dist'] = (process['support_timeframe'].
-                               apply(stf_dist, m=m))
-        process['discount-factor'] = (process['support_timeframe'].
-                                      apply(discount_factor, m=m))
-        process['eff-distance'] = (process['stf_dist'].
-                                   apply(effective_distance, m=m))
+        process['stf_dist'] = stf_dist(process['support_timeframe'], m)
+        process['discount-factor'] = discount_factor(
+            process['support_timeframe'], m)
+        process['eff-distance'] = effective_distance(process['stf_dist'], m)
         process['cost_factor'] = (process['discount-factor'] *
                                   process['eff-distance'])
 
@@ -375,12 +490,8 @@ def pyomo_model_prep(data, timesteps):
         # transmission mode
         if m.mode['tra']:
             # modify tra_const_cap for intertemporal mode
-            for index in tuple(tra_const_cap.index):
-                stf_transmission = transmission.xs((index[1, 2, 3, 4]),
-                                                   level=(1, 2, 3, 4))
-                if (not stf_transmission['cap-up'].max(axis=0) ==
-                        tra_const_cap.loc[index]['inst-cap']):
-                    tra_const_cap = tra_const_cap.drop(index)
+            tra_const_cap = stf_const_cap(tra_const_cap, transmission,
+                                          'cap-up', 'inst-cap')
             # derive invest factor from WACC, depreciation and
             # discount untility
             transmission['discount'] = (
@@ -392,51 +503,40 @@ def pyomo_model_prep(data, timesteps):
                                        (max(commodity.index.get_level_values
                                             ('support_timeframe').unique()),
                                         'Weight')]['value'] - 1)
-            transmission['invcost-factor'] = (
-                transmission.apply(lambda x: invcost_factor(
-                    x['depreciation'],
-                    x['wacc'],
-                    x['discount'],
-                    x['support_timeframe'],
-                    x['stf_min']),
-                    axis=1))
+            transmission['invcost-factor'] = invcost_factor(
+                transmission['depreciation'],
+                transmission['wacc'],
+                transmission['discount'],
+                transmission['support_timeframe'],
+                transmission['stf_min'])
             # derive overpay-factor from WACC, depreciation and
             # discount untility
-            transmission['overpay-factor'] = (
-                transmission.apply(lambda x: overpay_factor(
-                    x['depreciation'],
-                    x['wacc'],
-                    x['discount'],
-                    x['support_timeframe'],
-                    x['stf_min'],
-                    x['stf_end']),
-                    axis=1))
+            transmission['overpay-factor'] = overpay_factor(
+                transmission['depreciation'],
+                transmission['wacc'],
+                transmission['discount'],
+                transmission['support_timeframe'],
+                transmission['stf_min'],
+                transmission['stf_end'])
             # Derive multiplier for all energy based costs
             transmission.loc[(transmission['overpay-factor'] < 0) |
                              (transmission['overpay-factor'].isnull()),
                              'overpay-factor'] = 0
-            transmission['stf_dist'] = (transmission['support_timeframe'].
-                                        apply(stf_dist, m=m))
-            transmission['discount-factor'] = (
-                transmission['support_timeframe'].apply(discount_factor, m=m))
-            transmission['eff-distance'] = (transmission['stf_dist'].
-                                            apply(effective_distance, m=m))
+            transmission['stf_dist'] = stf_dist(
+                transmission['support_timeframe'], m)
+            transmission['discount-factor'] = discount_factor(
+                transmission['support_timeframe'], m)
+            transmission['eff-distance'] = effective_distance(
+                transmission['stf_dist'], m)
             transmission['cost_factor'] = (transmission['discount-factor'] *
                                            transmission['eff-distance'])
         # storage mode
         if m.mode['sto']:
             # modify sto_const_cap_c and sto_const_cap_p for intertemporal mode
-            for index in tuple(sto_const_cap_c.index):
-                stf_storage = storage.xs((index[1, 2, 3]), level=(1, 2, 3))
-                if (not stf_storage['cap-up-c'].max(axis=0) ==
-                        sto_const_cap_c.loc[index]['inst-cap-c']):
-                    sto_const_cap_c = sto_const_cap_c.drop(index)
-
-            for index in tuple(sto_const_cap_p.index):
-                stf_storage = storage.xs((index[1, 2, 3]), level=(1, 2, 3))
-                if (not stf_storage['cap-up-p'].max(axis=0) ==
-                        sto_const_cap_p.loc[index]['inst-cap-p']):
-                    sto_const_cap_p = sto_const_cap_p.drop(index)
+            sto_const_cap_c = stf_const_cap(sto_const_cap_c, storage,
+                                            'cap-up-c', 'inst-cap-c')
+            sto_const_cap_p = stf_const_cap(sto_const_cap_p, storage,
+                                            'cap-up-p', 'inst-cap-p')
 
             # derive invest factor from WACC, depreciation and
             # discount untility
@@ -448,45 +548,35 @@ def pyomo_model_prep(data, timesteps):
                                   (max(commodity.index.get_level_values
                                        ('support_timeframe').unique()),
                                    'Weight')]['value'] - 1)
-            storage['invcost-factor'] = (
-                storage.apply(
-                    lambda x: invcost_factor(
-                        x['depreciation'],
-                        x['wacc'],
-                        x['discount'],
-                        x['support_timeframe'],
-                        x['stf_min']),
-                    axis=1))
-            storage['overpay-factor'] = (
-                storage.apply(lambda x: overpay_factor(
-                    x['depreciation'],
-                    x['wacc'],
-                    x['discount'],
-                    x['support_timeframe'],
-                    x['stf_min'],
-                    x['stf_end']),
-                    axis=1))
+            storage['invcost-factor'] = invcost_factor(
+                storage['depreciation'],
+                storage['wacc'],
+                storage['discount'],
+                storage['support_timeframe'],
+                storage['stf_min'])
+            storage['overpay-factor'] = overpay_factor(
+                storage['depreciation'],
+                storage['wacc'],
+                storage['discount'],
+                storage['support_timeframe'],
+                storage['stf_min'],
+                storage['stf_end'])
 
             storage.loc[(storage['overpay-factor'] < 0) |
                         (storage['overpay-factor'].isnull()),
                         'overpay-factor'] = 0
 
-            storage['stf_dist'] = (storage['support_timeframe']
-                                   .apply(stf_dist, m=m))
-            storage['discount-factor'] = (storage['support_timeframe']
-                                          .apply(discount_factor, m=m))
-            storage['eff-distance'] = (storage['stf_dist']
-                                       .apply(effective_distance, m=m))
+            storage['stf_dist'] = stf_dist(storage['support_timeframe'], m)
+            storage['discount-factor'] = discount_factor(
+                storage['support_timeframe'], m)
+            storage['eff-distance'] = effective_distance(
+                storage['stf_dist'], m)
             storage['cost_factor'] = (storage['discount-factor'] *
                                       storage['eff-distance'])
     else:
         # for one year problems
-        process['invcost-factor'] = (
-            process.apply(
-                lambda x: invcost_factor(
-                    x['depreciation'],
-                    x['wacc']),
-                axis=1))
+        process['invcost-factor'] = invcost_factor(process['depreciation'],
+                                                   process['wacc'])
 
         # cost factor will be set to 1 for non intertemporal problems
         commodity['cost_factor'] = 1
@@ -494,30 +584,24 @@ def pyomo_model_prep(data, timesteps):
 
         # additional features
         if m.mode['tra']:
-            transmission['invcost-factor'] = (
-                transmission.apply(lambda x:
-                                   invcost_factor(x['depreciation'],
-                                                  x['wacc']),
-                                   axis=1))
+            transmission['invcost-factor'] = invcost_factor(
+                transmission['depreciation'], transmission['wacc'])
             transmission['cost_factor'] = 1
         if m.mode['sto']:
-            storage['invcost-factor'] = (
-                storage.apply(lambda x:
-                              invcost_factor(x['depreciation'],
-                                             x['wacc']),
-                              axis=1))
+            storage['invcost-factor'] = invcost_factor(
+                storage['depreciation'], storage['wacc'])
             storage['cost_factor'] = 1
 
-    # Converting Data frames to dictionaries
-    m.global_prop_dict = m.global_prop.to_dict()
-    m.commodity_dict = commodity.to_dict()
-    m.process_dict = process.to_dict()
+    # Converting Data frames to parameter tables
+    m.global_prop_dict = ParamTable(m.global_prop)
+    m.commodity_dict = ParamTable(commodity)
+    m.process_dict = ParamTable(process)
 
     # dictionaries for additional features
     if m.mode['tra']:
-        m.transmission_dict = transmission.to_dict()
+        m.transmission_dict = ParamTable(transmission)
     if m.mode['sto']:
-        m.storage_dict = storage.to_dict()
+        m.storage_dict = ParamTable(storage)
 
     # update m.mode['exp'] and write dictionaries with constant capacities
     m.mode['exp']['pro'] = identify_expansion(pro_const_cap['inst-cap'],
@@ -541,6 +625,26 @@ def pyomo_model_prep(data, timesteps):
     return m
 
 
+def select_support_timeframe(data, stf):
+    """Input data of a single support timeframe.
+
+    Args:
+        - data: input data dictionary
+        - stf: support timeframe
+
+    Returns:
+        a copy of data, with the rows of stf only
+    """
+    selected = {}
+    for name, df in data.items():
+        if 'support_timeframe' in df.index.names:
+            df = df[df.index.get_level_values('support_timeframe') == stf]
+            df = df.copy()
+            df.index = df.index.remove_unused_levels()
+        selected[name] = df
+    return selected
+
+
 def split_columns(columns, sep='.'):
     """Split columns by separator into MultiIndex.
 
@@ -591,3 +695,90 @@ def get_input(prob, name):
     else:
         # unknown
         raise ValueError("Unknown input DataFrame name!")
+
+
+class ParamColumn(object):
+    """Read access to one column of a ParamTable, like a dict.
+
+    Values are stored in a NumPy array; the index-to-position dict is shared
+    with all other columns of the same table.
+    """
+    def __init__(self, positions, values):
+        self._positions = positions
+        self._values = values
+
+    def __getitem__(self, key):
+        # item() returns native Python scalars, as DataFrame.to_dict does
+        return self._values.item(self._positions[key])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def keys(self):
+        return self._positions.keys()
+
+    def values(self):
+        return self._values.tolist()
+
+    def items(self):
+        return zip(self._positions.keys(), self._values.tolist())
+
+    def update(self, mapping):
+        """Set values of existing keys (e.g. from update_model)."""
+        mapping = dict(mapping)
+        if self._values.dtype.kind in 'biu':
+            # avoid truncating non-integer values in integer columns
+            self._values = self._values.astype(
+                np.result_type(self._values, *mapping.values()))
+        for key, value in mapping.items():
+            self._values[self._positions[key]] = value
+
+
+class ParamTable(object):
+    """Compact replacement of DataFrame.to_dict() for model parameters.
+
+    Maps the row index of a DataFrame to integer positions once and keeps
+    each column as a contiguous NumPy array. Supports the same lookups as
+    the dict of dicts returned by to_dict(), e.g. table[column][row].
+
+    Args:
+        - df: a DataFrame
+    """
+    def __init__(self, df):
+        positions = {key: pos for pos, key in enumerate(df.index)}
+        self._columns = {
+            col: ParamColumn(positions, df.iloc[:, i].values.copy())
+            for i, col in enumerate(df.columns)}
+
+    def __getitem__(self, col):
+        return self._columns[col]
+
+    def __contains__(self, col):
+        return col in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def keys(self):
+        return self._columns.keys()
+
+    def values(self):
+        return self._columns.values()
+
+    def items(self):
+        return self._columns.items()
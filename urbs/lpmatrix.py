@@ -0,0 +1,789 @@
+import math
+import numpy as np
+import pandas as pd
+from .features.modelhelper import invcost_factor
+from .identify import identify_mode
+from .saveload import ResultContainer
+
+# SPARSE MATRIX BACKEND
+# Assembles the (single support timeframe) urbs formulation directly as
+# sparse arrays from the input DataFrames, bypassing the construction of
+# Pyomo expression objects. Each variable and constraint family occupies a
+# contiguous block of columns/rows; time-indexed blocks are stored
+# timestep-major, i.e. position = offset + timestep position * size + tuple
+# position. This allows every constraint family to be written with a few
+# broadcast NumPy operations instead of one Python call per row.
+
+
+class _Block(object):
+    """ Contiguous range of columns or rows in the sparse LP. """
+    def __init__(self, name, offset, index, labels, steps=None):
+        self.name = name
+        self.offset = offset
+        self.index = index
+        self.labels = labels
+        self.steps = steps
+        self.size = len(index)
+
+    def __len__(self):
+        if self.steps is None:
+            return self.size
+        return len(self.steps) * self.size
+
+    def pos(self, k, ti=None):
+        """Absolute position of tuple(s) k in timestep position(s) ti."""
+        if ti is None:
+            return self.offset + np.asarray(k)
+        return (self.offset + np.asarray(ti)[:, None] * self.size +
+                np.asarray(k)[None, :])
+
+
+class SparseLP(object):
+    """ LP in matrix form: min c*x + c0 s.t. row_lo <= A*x <= row_up,
+    col_lo <= x <= col_up. Cost type contributions to c are kept
+    separately in cost_vectors for the result mapping. """
+    def __init__(self):
+        self.cols = []
+        self.rows = []
+        self.col_lo = []
+        self.col_up = []
+        self.row_lo = []
+        self.row_up = []
+        self.n_cols = 0
+        self.n_rows = 0
+        self.cost_vectors = {}
+        self.cost_constants = {}
+        self.blocks = {}
+        self._entries = ([], [], [])
+
+    def add_cols(self, name, index, labels, steps=None, lo=0.0, up=np.inf):
+        block = _Block(name, self.n_cols, index, labels, steps)
+        self.n_cols += len(block)
+        self.col_lo.append(np.broadcast_to(np.asarray(lo, dtype=float),
+                                           (len(block),)))
+        self.col_up.append(np.broadcast_to(np.asarray(up, dtype=float),
+                                           (len(block),)))
+        self.cols.append(block)
+        self.blocks[name] = block
+        return block
+
+    def add_rows(self, name, index, labels, steps=None, lo=-np.inf,
+                 up=np.inf):
+        block = _Block(name, self.n_rows, index, labels, steps)
+        self.n_rows += len(block)
+        self.row_lo.append(np.broadcast_to(np.asarray(lo, dtype=float),
+                                           (len(block),)).ravel())
+        self.row_up.append(np.broadcast_to(np.asarray(up, dtype=float),
+                                           (len(block),)).ravel())
+        self.rows.append(block)
+        self.blocks[name] = block
+        return block
+
+    def add_entries(self, rows, cols, vals):
+        rows, cols = np.broadcast_arrays(rows, cols)
+        vals = np.broadcast_to(np.asarray(vals, dtype=float), rows.shape)
+        self._entries[0].append(rows.ravel())
+        self._entries[1].append(cols.ravel())
+        self._entries[2].append(vals.ravel())
+
+    def add_cost(self, cost_type, cols, vals, constant=0):
+        cols = np.asarray(cols)
+        vals = np.broadcast_to(np.asarray(vals, dtype=float), cols.shape)
+        self.cost_vectors.setdefault(cost_type, ([], []))
+        self.cost_vectors[cost_type][0].append(cols.ravel())
+        self.cost_vectors[cost_type][1].append(vals.ravel())
+        self.cost_constants[cost_type] = (
+            self.cost_constants.get(cost_type, 0) + constant)
+
+    def finalize(self):
+        """Convert collected entries to CSR matrix and cost vectors."""
+        from scipy import sparse
+
+        rows, cols, vals = (np.concatenate(e) if e else np.empty(0)
+                            for e in self._entries)
+        self.A = sparse.csr_matrix((vals, (rows.astype(int),
+                                           cols.astype(int))),
+                                   shape=(self.n_rows, self.n_cols))
+        self.row_lo = np.concatenate(self.row_lo)
+        self.row_up = np.concatenate(self.row_up)
+        self.col_lo = np.concatenate(self.col_lo)
+        self.col_up = np.concatenate(self.col_up)
+
+        costs = {}
+        for cost_type, (cols, vals) in self.cost_vectors.items():
+            costs[cost_type] = np.bincount(
+                np.concatenate(cols).astype(int), np.concatenate(vals),
+                minlength=self.n_cols)
+        self.cost_vectors = costs
+        self.c = sum(costs.values())
+        self.c0 = sum(self.cost_constants.values())
+        self._entries = None
+        return self
+
+
+def create_lp(data, dt=1, timesteps=None):
+    """Create a sparse matrix urbs LP from given input data.
+
+    Builds the same formulation as create_model for a single support
+    timeframe with cost objective (processes incl. partial operation,
+    storage, transmission, commodity vertex, stock and environmental limits,
+    global CO2 limit), but as SciPy sparse arrays.
+
+    Args:
+        - data: a dict of input DataFrames, as returned by read_input
+        - dt: timestep duration in hours (default: 1)
+        - timesteps: optional list of timesteps, default: demand timeseries
+
+    Returns:
+        a SparseLP instance
+    """
+    mode = identify_mode(data)
+    unsupported = [feature for feature in ('int', 'dsm', 'bsp', 'tve', 'rep')
+                   if mode[feature]]
+    if unsupported:
+        raise NotImplementedError("Sparse LP backend does not support the "
+                                  "modes {}. Use create_model instead."
+                                  .format(', '.join(unsupported)))
+    if not np.isscalar(dt):
+        raise NotImplementedError("Sparse LP backend requires a constant "
+                                  "timestep duration dt.")
+
+    if not timesteps:
+        timesteps = data['demand'].index.get_level_values('t').tolist()
+    timesteps = list(timesteps)
+    stf = data['global_prop'].index.levels[0][0]
+    # c.f. m.weight: the length of simulation includes the initial timestep
+    weight = float(8760) / (len(timesteps) * dt)
+
+    lp = SparseLP()
+    lp.data = data
+    lp.timesteps = timesteps
+    lp.dt = dt
+    lp.weight = weight
+    lp.const_caps = {}
+    flows = []
+
+    _add_commodity_cols(lp, data, stf, dt, weight, flows)
+    _add_processes(lp, data, stf, dt, weight, flows)
+    if mode['sto']:
+        _add_storage(lp, data, dt, weight, flows)
+    if mode['tra']:
+        _add_transmission(lp, data, dt, weight, flows)
+    _add_commodity_rows(lp, data, stf, dt, weight, flows)
+
+    return lp.finalize()
+
+
+def _add_commodity_cols(lp, data, stf, dt, weight, flows):
+    commodity = data['commodity']
+    com_type = commodity.index.get_level_values('Type')
+    com_name = commodity.index.get_level_values('Commodity')
+
+    # stock commodity source term, bounded by maxperhour (res_stock_step)
+    stock_names = set(com_name[com_type == 'Stock'])
+    stock = commodity[com_name.isin(stock_names)]
+    block = lp.add_cols('e_co_stock', stock.index,
+                        ['t', 'stf', 'sit', 'com', 'com_type'],
+                        lp.timesteps[1:],
+                        up=np.tile(dt * stock['maxperhour'].values,
+                                   len(lp.timesteps) - 1))
+    k = np.arange(block.size)
+    ti = np.arange(len(lp.timesteps) - 1)
+    lp.add_cost('Fuel', block.pos(k, ti),
+                weight * stock['price'].values[None, :])
+    flows.append((block, [(s, sit, com) for (s, sit, com, _) in stock.index],
+                  -1.0))
+
+    # res_stock_total
+    limited = np.flatnonzero(np.isfinite(stock['max'].values))
+    if len(limited):
+        rows = lp.add_rows('res_stock_total', stock.index[limited],
+                           ['stf', 'sit', 'com', 'com_type'],
+                           up=stock['max'].values[limited])
+        lp.add_entries(rows.pos(np.arange(len(limited)))[None, :],
+                       block.pos(limited, ti), weight)
+
+
+def _add_processes(lp, data, stf, dt, weight, flows):
+    process = data['process']
+    labels = ['stf', 'sit', 'pro']
+    steps = lp.timesteps[1:]
+    ti = np.arange(len(steps))
+    inst = process['inst-cap'].fillna(0).values
+    const = (process['inst-cap'] == process['cap-up']).values
+    lp.const_caps['cap_pro'] = const
+
+    cap = lp.add_cols(
+        'cap_pro_new', process.index, labels,
+        lo=np.maximum(0, process['cap-lo'].values - inst),
+        up=np.where(const, 0, process['cap-up'].values - inst))
+    tau = lp.add_cols('tau_pro', process.index, ['t'] + labels,
+                      lp.timesteps)
+    k = np.arange(cap.size)
+
+    # costs
+    icf = invcost_factor(process['depreciation'], process['wacc'])
+    lp.add_cost('Invest', cap.pos(k), process['inv-cost'].values * icf)
+    lp.add_cost('Fixed', cap.pos(k), process['fix-cost'].values,
+                constant=(inst * process['fix-cost'].values).sum())
+    lp.add_cost('Variable', tau.pos(k, ti + 1),
+                weight * process['var-cost'].values[None, :])
+
+    # res_process_throughput_by_capacity
+    rows = lp.add_rows('res_process_throughput_by_capacity', process.index,
+                       labels, steps,
+                       up=np.tile(dt * inst, len(steps)))
+    lp.add_entries(rows.pos(k, ti), tau.pos(k, ti + 1), 1)
+    lp.add_entries(rows.pos(k, ti), cap.pos(k)[None, :], -dt)
+
+    # res_process_maxgrad_lower/_upper
+    grad = np.flatnonzero(process['max-grad'].values < 1.0 / dt)
+    if len(grad):
+        slope = dt * process['max-grad'].values[grad]
+        for name, sign in (('res_process_maxgrad_lower', 1),
+                           ('res_process_maxgrad_upper', -1)):
+            rows = lp.add_rows(name, process.index[grad], labels, steps,
+                               up=np.tile(slope * inst[grad], len(steps)))
+            r = rows.pos(np.arange(len(grad)), ti)
+            lp.add_entries(r, tau.pos(grad, ti), sign)
+            lp.add_entries(r, tau.pos(grad, ti + 1), -sign)
+            lp.add_entries(r, cap.pos(grad)[None, :], -slope[None, :])
+
+    # partial operation: processes with ratio-min for any input
+    pro_com = data['process_commodity']
+    pro_frame = process.index.to_frame(index=False)
+    pro_frame['k'] = k
+    min_fraction = process['min-fraction'].values
+    partial = set()
+    for direction in ('In', 'Out'):
+        ratios = pro_com.xs(direction, level='Direction')
+        ratios = pro_frame.merge(ratios.reset_index(),
+                                 on=['support_timeframe', 'Process'])
+        if direction == 'In':
+            partial = set(ratios.loc[ratios['ratio-min'] > 0, 'k'])
+            partial_rows = np.flatnonzero(ratios['ratio-min'] > 0)
+        else:
+            partial_rows = np.flatnonzero((ratios['ratio-min'] > 0) &
+                                          ratios['k'].isin(partial))
+        name = 'e_pro_in' if direction == 'In' else 'e_pro_out'
+        index = pd.MultiIndex.from_arrays(
+            [ratios['support_timeframe'], ratios['Site'],
+             ratios['Process'], ratios['Commodity']])
+        flow = lp.add_cols(name, index, ['t'] + labels + ['com'], steps)
+        kf = np.arange(flow.size)
+        pk = ratios['k'].values
+
+        # def_process_input/_output: flow == tau * ratio, or for partial
+        # operation flow == dt * cap * online + tau * throughput
+        R = ratios['ratio'].values
+        online = np.zeros(flow.size)
+        throughput = R.copy()
+        if len(partial_rows):
+            r = ratios['ratio-min'].values[partial_rows]
+            mf = min_fraction[pk[partial_rows]]
+            online[partial_rows] = mf * (r - R[partial_rows]) / (1 - mf)
+            throughput[partial_rows] = (R[partial_rows] - mf * r) / (1 - mf)
+        rows = lp.add_rows('def_process_' + direction.lower() + 'put', index,
+                           labels + ['com'], steps,
+                           lo=np.tile(dt * online * inst[pk], len(steps)),
+                           up=np.tile(dt * online * inst[pk], len(steps)))
+        lp.add_entries(rows.pos(kf, ti), flow.pos(kf, ti), 1)
+        lp.add_entries(rows.pos(kf, ti), tau.pos(pk, ti + 1),
+                       -throughput[None, :])
+        lp.add_entries(rows.pos(kf, ti), cap.pos(pk)[None, :],
+                       -dt * online[None, :])
+
+        flows.append((flow, list(zip(ratios['support_timeframe'],
+                                     ratios['Site'], ratios['Commodity'])),
+                      1.0 if direction == 'In' else -1.0))
+
+        if direction == 'In':
+            _add_intermittent_supply(lp, data, flow, cap, ratios, inst, dt)
+
+    # res_throughput_by_capacity_min
+    partial = np.array(sorted(partial), dtype=int)
+    if len(partial):
+        mf = min_fraction[partial]
+        rows = lp.add_rows('res_throughput_by_capacity_min',
+                           process.index[partial], labels, steps,
+                           lo=np.tile(dt * mf * inst[partial], len(steps)))
+        r = rows.pos(np.arange(len(partial)), ti)
+        lp.add_entries(r, tau.pos(partial, ti + 1), 1)
+        lp.add_entries(r, cap.pos(partial)[None, :], -dt * mf[None, :])
+
+    _add_area(lp, data, cap, inst)
+
+
+def _add_intermittent_supply(lp, data, flow, cap, ratios, inst, dt):
+    # def_intermittent_supply: e_pro_in == cap_pro * supim * dt
+    supim = data['supim']
+    com_supim = set(data['commodity'].xs('SupIm', level='Type')
+                    .index.get_level_values('Commodity'))
+    rows = np.flatnonzero(ratios['Commodity'].isin(com_supim).values)
+    if not len(rows):
+        return
+    steps = lp.timesteps[1:]
+    ti = np.arange(len(steps))
+    series = np.column_stack([
+        supim.loc[stf][(sit, com)].loc[steps].values
+        for stf, sit, com in zip(ratios['support_timeframe'].values[rows],
+                                 ratios['Site'].values[rows],
+                                 ratios['Commodity'].values[rows])])
+    pk = ratios['k'].values[rows]
+    block = lp.add_rows('def_intermittent_supply', flow.index[rows],
+                        flow.labels[1:], steps,
+                        lo=(dt * series * inst[pk][None, :]).ravel(),
+                        up=(dt * series * inst[pk][None, :]).ravel())
+    r = block.pos(np.arange(len(rows)), ti)
+    lp.add_entries(r, flow.pos(rows, ti), 1)
+    lp.add_entries(r, cap.pos(pk)[None, :], -dt * series)
+
+
+def _add_area(lp, data, cap, inst):
+    # res_area: used process area <= maximal process area
+    process = data['process']
+    if 'area-per-cap' not in process.columns:
+        return
+    area_per_cap = process['area-per-cap'].values
+    has_area = area_per_cap >= 0
+    site_area = data['site']['area']
+    pro_sites = {}
+    for k, (stf, sit, pro) in enumerate(process.index):
+        if has_area[k]:
+            pro_sites.setdefault((stf, sit), []).append(k)
+
+    sites = []
+    members = []
+    for site, area in site_area.items():
+        if area >= 0 and area_per_cap[pro_sites.get(site, [])].sum() > 0:
+            sites.append(site)
+            members.append(pro_sites[site])
+    if not sites:
+        return
+    rows = lp.add_rows(
+        'res_area', pd.MultiIndex.from_tuples(sites), ['stf', 'sit'],
+        up=[site_area[site] - (inst[k] * area_per_cap[k]).sum()
+            for site, k in zip(sites, members)])
+    for j, k in enumerate(members):
+        lp.add_entries(rows.pos([j]), cap.pos(k), area_per_cap[k])
+
+
+def _add_storage(lp, data, dt, weight, flows):
+    storage = data['storage'].dropna(axis=0, how='all')
+    labels = ['stf', 'sit', 'sto', 'com']
+    steps = lp.timesteps[1:]
+    ti = np.arange(len(steps))
+    k = np.arange(len(storage))
+    inst_c = storage['inst-cap-c'].fillna(0).values
+    inst_p = storage['inst-cap-p'].fillna(0).values
+    const_c = (storage['inst-cap-c'] == storage['cap-up-c']).values
+    const_p = (storage['inst-cap-p'] == storage['cap-up-p']).values
+    lp.const_caps['cap_sto_c'] = const_c
+    lp.const_caps['cap_sto_p'] = const_p
+
+    cap_c = lp.add_cols(
+        'cap_sto_c_new', storage.index, labels,
+        lo=np.maximum(0, storage['cap-lo-c'].values - inst_c),
+        up=np.where(const_c, 0, storage['cap-up-c'].values - inst_c))
+    cap_p = lp.add_cols(
+        'cap_sto_p_new', storage.index, labels,
+        lo=np.maximum(0, storage['cap-lo-p'].values - inst_p),
+        up=np.where(const_p, 0, storage['cap-up-p'].values - inst_p))
+    sto_in = lp.add_cols('e_sto_in', storage.index, ['t'] + labels, steps)
+    sto_out = lp.add_cols('e_sto_out', storage.index, ['t'] + labels, steps)
+    con = lp.add_cols('e_sto_con', storage.index, ['t'] + labels,
+                      lp.timesteps)
+    keys = [(stf, sit, com) for (stf, sit, sto, com) in storage.index]
+    flows.append((sto_in, keys, 1.0))
+    flows.append((sto_out, keys, -1.0))
+
+    # costs
+    icf = invcost_factor(storage['depreciation'], storage['wacc'])
+    lp.add_cost('Invest', cap_p.pos(k), storage['inv-cost-p'].values * icf)
+    lp.add_cost('Invest', cap_c.pos(k), storage['inv-cost-c'].values * icf)
+    lp.add_cost('Fixed', cap_p.pos(k), storage['fix-cost-p'].values,
+                constant=(inst_p * storage['fix-cost-p'].values).sum())
+    lp.add_cost('Fixed', cap_c.pos(k), storage['fix-cost-c'].values,
+                constant=(inst_c * storage['fix-cost-c'].values).sum())
+    lp.add_cost('Variable', con.pos(k, ti + 1),
+                weight * storage['var-cost-c'].values[None, :])
+    for flow in (sto_in, sto_out):
+        lp.add_cost('Variable', flow.pos(k, ti),
+                    weight * storage['var-cost-p'].values[None, :])
+
+    # def_storage_state
+    rows = lp.add_rows('def_storage_state', storage.index, labels, steps,
+                       lo=0, up=0)
+    r = rows.pos(k, ti)
+    lp.add_entries(r, con.pos(k, ti + 1), 1)
+    lp.add_entries(r, con.pos(k, ti),
+                   -(1 - storage['discharge'].values[None, :]) ** dt)
+    lp.add_entries(r, sto_in.pos(k, ti), -storage['eff-in'].values[None, :])
+    lp.add_entries(r, sto_out.pos(k, ti),
+                   1 / storage['eff-out'].values[None, :])
+
+    # res_storage_input_by_power/output_by_power
+    for name, flow in (('res_storage_input_by_power', sto_in),
+                       ('res_storage_output_by_power', sto_out)):
+        rows = lp.add_rows(name, storage.index, labels, steps,
+                           up=np.tile(dt * inst_p, len(steps)))
+        lp.add_entries(rows.pos(k, ti), flow.pos(k, ti), 1)
+        lp.add_entries(rows.pos(k, ti), cap_p.pos(k)[None, :], -dt)
+
+    # res_storage_state_by_capacity
+    tt = np.arange(len(lp.timesteps))
+    rows = lp.add_rows('res_storage_state_by_capacity', storage.index,
+                       labels, lp.timesteps,
+                       up=np.tile(inst_c, len(lp.timesteps)))
+    lp.add_entries(rows.pos(k, tt), con.pos(k, tt), 1)
+    lp.add_entries(rows.pos(k, tt), cap_c.pos(k)[None, :], -1)
+
+    # res_initial/final_storage_state, res_initial_and_final_storage_state_var
+    first, last = 0, len(lp.timesteps) - 1
+    init = storage['init'].values
+    bound = np.flatnonzero(init >= 0)
+    free = np.flatnonzero(~(init >= 0))
+    if len(bound):
+        rhs = init[bound] * inst_c[bound]
+        for name, lo, up, t in (('res_initial_storage_state', rhs, rhs,
+                                 first),
+                                ('res_final_storage_state', rhs, np.inf,
+                                 last)):
+            rows = lp.add_rows(name, storage.index[bound], labels,
+                               lo=lo, up=up)
+            r = rows.pos(np.arange(len(bound)))
+            lp.add_entries(r, con.pos(bound, [t])[0], 1)
+            lp.add_entries(r, cap_c.pos(bound), -init[bound])
+    if len(free):
+        rows = lp.add_rows('res_initial_and_final_storage_state_var',
+                           storage.index[free], labels, up=0)
+        r = rows.pos(np.arange(len(free)))
+        lp.add_entries(r, con.pos(free, [first])[0], 1)
+        lp.add_entries(r, con.pos(free, [last])[0], -1)
+
+    # def_storage_energy_power_ratio
+    if 'ep-ratio' in storage.columns:
+        ep = storage['ep-ratio'].values
+        fixed = np.flatnonzero(ep >= 0)
+        if len(fixed):
+            rhs = ep[fixed] * inst_p[fixed] - inst_c[fixed]
+            rows = lp.add_rows('def_storage_energy_power_ratio',
+                               storage.index[fixed], labels, lo=rhs, up=rhs)
+            r = rows.pos(np.arange(len(fixed)))
+            lp.add_entries(r, cap_c.pos(fixed), 1)
+            lp.add_entries(r, cap_p.pos(fixed), -ep[fixed])
+
+
+def _add_transmission(lp, data, dt, weight, flows):
+    transmission = data['transmission'].dropna(axis=0, how='all')
+    labels = ['stf', 'sit', 'sit_', 'tra', 'com']
+    steps = lp.timesteps[1:]
+    ti = np.arange(len(steps))
+    k = np.arange(len(transmission))
+    inst = transmission['inst-cap'].fillna(0).values
+    const = (transmission['inst-cap'] == transmission['cap-up']).values
+    lp.const_caps['cap_tra'] = const
+
+    cap = lp.add_cols(
+        'cap_tra_new', transmission.index, labels,
+        lo=np.maximum(0, transmission['cap-lo'].values - inst),
+        up=np.where(const, 0, transmission['cap-up'].values - inst))
+    tra_in = lp.add_cols('e_tra_in', transmission.index, ['t'] + labels,
+                         steps)
+    tra_out = lp.add_cols('e_tra_out', transmission.index, ['t'] + labels,
+                          steps)
+    flows.append((tra_in, [(stf, sin, com) for (stf, sin, sout, tra, com)
+                           in transmission.index], 1.0))
+    flows.append((tra_out, [(stf, sout, com) for (stf, sin, sout, tra, com)
+                            in transmission.index], -1.0))
+
+    # costs
+    icf = invcost_factor(transmission['depreciation'], transmission['wacc'])
+    lp.add_cost('Invest', cap.pos(k), transmission['inv-cost'].values * icf)
+    lp.add_cost('Fixed', cap.pos(k), transmission['fix-cost'].values,
+                constant=(inst * transmission['fix-cost'].values).sum())
+    lp.add_cost('Variable', tra_in.pos(k, ti),
+                weight * transmission['var-cost'].values[None, :])
+
+    # def_transmission_output
+    rows = lp.add_rows('def_transmission_output', transmission.index, labels,
+                       steps, lo=0, up=0)
+    lp.add_entries(rows.pos(k, ti), tra_out.pos(k, ti), 1)
+    lp.add_entries(rows.pos(k, ti), tra_in.pos(k, ti),
+                   -transmission['eff'].values[None, :])
+
+    # res_transmission_input_by_capacity
+    rows = lp.add_rows('res_transmission_input_by_capacity',
+                       transmission.index, labels, steps,
+                       up=np.tile(dt * inst, len(steps)))
+    lp.add_entries(rows.pos(k, ti), tra_in.pos(k, ti), 1)
+    lp.add_entries(rows.pos(k, ti), cap.pos(k)[None, :], -dt)
+
+    # res_transmission_symmetry
+    position = {key: j for j, key in enumerate(transmission.index)}
+    pairs = [(j, position[(stf, sout, sin, tra, com)])
+             for j, (stf, sin, sout, tra, com) in enumerate(
+                 transmission.index)
+             if (stf, sout, sin, tra, com) in position]
+    if pairs:
+        a, b = np.array(pairs).T
+        rows = lp.add_rows('res_transmission_symmetry',
+                           transmission.index[a], labels,
+                           lo=inst[b] - inst[a], up=inst[b] - inst[a])
+        r = rows.pos(np.arange(len(a)))
+        lp.add_entries(r, cap.pos(a), 1)
+        lp.add_entries(r, cap.pos(b), -1)
+
+
+def _match(left_keys, right_keys):
+    """Return position arrays (i, j) of all pairs with equal keys."""
+    lookup = {}
+    for j, key in enumerate(right_keys):
+        lookup.setdefault(key, []).append(j)
+    pairs = [(i, j) for i, key in enumerate(left_keys)
+             for j in lookup.get(key, ())]
+    if not pairs:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    return tuple(np.array(pairs, dtype=int).T)
+
+
+def _add_commodity_rows(lp, data, stf, dt, weight, flows):
+    commodity = data['commodity']
+    steps = lp.timesteps[1:]
+    ti = np.arange(len(steps))
+    labels = ['stf', 'sit', 'com', 'com_type']
+    com_type = commodity.index.get_level_values('Type')
+    com_name = commodity.index.get_level_values('Commodity')
+    env_names = set(com_name[com_type == 'Env'])
+    supim_names = set(com_name[com_type == 'SupIm'])
+    demand_names = set(com_name[com_type == 'Demand'])
+    stock = lp.blocks['e_co_stock']
+
+    # res_vertex: commodity balance == demand (stock source on lhs)
+    vertex = commodity[~com_name.isin(env_names | supim_names)]
+    demand = np.zeros((len(steps), len(vertex)))
+    for j, (s, sit, com, _) in enumerate(vertex.index):
+        if com in demand_names and (sit, com) in data['demand'].columns:
+            demand[:, j] = data['demand'].loc[s][(sit, com)].loc[
+                steps].values
+    rows = lp.add_rows('res_vertex', vertex.index, labels, steps,
+                       lo=demand.ravel(), up=demand.ravel())
+    vertex_keys = [(s, sit, com) for (s, sit, com, _) in vertex.index]
+    for flow, keys, sign in flows:
+        if flow is stock:
+            # stock source term of exactly this (stf, sit, com, com_type)
+            i, j = _match(list(stock.index), list(vertex.index))
+        else:
+            i, j = _match(keys, vertex_keys)
+        lp.add_entries(rows.pos(j, ti), flow.pos(i, ti), -sign)
+
+    # res_env_step and res_env_total: - balance <= limits
+    env = commodity[com_name.isin(env_names)]
+    env_keys = [(s, sit, com) for (s, sit, com, _) in env.index]
+    step_limit = dt * env['maxperhour'].values
+    limited = np.flatnonzero(np.isfinite(step_limit))
+    if len(limited):
+        rows = lp.add_rows('res_env_step', env.index[limited], labels,
+                           steps, up=np.tile(step_limit[limited],
+                                             len(steps)))
+        for flow, keys, sign in flows:
+            if flow is stock:
+                continue
+            i, j = _match(keys, [env_keys[l] for l in limited])
+            lp.add_entries(rows.pos(j, ti), flow.pos(i, ti), -sign)
+    limited = np.flatnonzero(np.isfinite(env['max'].values))
+    if len(limited):
+        rows = lp.add_rows('res_env_total', env.index[limited], labels,
+                           up=env['max'].values[limited])
+        for flow, keys, sign in flows:
+            if flow is stock:
+                continue
+            i, j = _match(keys, [env_keys[l] for l in limited])
+            lp.add_entries(rows.pos(j)[None, :], flow.pos(i, ti),
+                           -sign * weight)
+
+    # 'Environmental' costs
+    price = env['price'].values
+    for flow, keys, sign in flows:
+        if flow is stock:
+            continue
+        i, j = _match(keys, env_keys)
+        lp.add_cost('Environmental', flow.pos(i, ti),
+                    -sign * weight * price[j][None, :])
+
+    # res_global_co2_limit
+    limit = data['global_prop'].loc[(stf, 'CO2 limit'), 'value']
+    if not math.isinf(limit) and limit >= 0:
+        rows = lp.add_rows('res_global_co2_limit', pd.Index([stf]), ['stf'],
+                           up=[limit])
+        for flow, keys, sign in flows:
+            if flow is stock:
+                continue
+            i = np.array([n for n, key in enumerate(keys)
+                          if key[2] == 'CO2'], dtype=int)
+            lp.add_entries(rows.pos([0]), flow.pos(i, ti), -sign * weight)
+
+
+def write_mps(lp, filename):
+    """Write a SparseLP to a free-format MPS file.
+
+    Columns and rows are named c<n> and r<n> by their position; the block
+    structure in lp.blocks maps them back to urbs entity names.
+
+    Args:
+        - lp: a finalized SparseLP instance
+        - filename: MPS file to be written
+
+    Returns:
+        Nothing
+    """
+    A = lp.A.tocsc()
+    lines = ['NAME urbs', 'ROWS', ' N obj']
+    senses = []
+    for i, (lo, up) in enumerate(zip(lp.row_lo, lp.row_up)):
+        if lo == up:
+            sense = 'E'
+        elif np.isinf(lo):
+            sense = 'L'
+        elif np.isinf(up):
+            sense = 'G'
+        else:
+            sense = 'R'
+        senses.append(sense)
+        lines.append(' {} r{}'.format('L' if sense == 'R' else sense, i))
+
+    lines.append('COLUMNS')
+    for j in range(lp.n_cols):
+        if lp.c[j] != 0:
+            lines.append(' c{} obj {:.15g}'.format(j, lp.c[j]))
+        start, end = A.indptr[j], A.indptr[j + 1]
+        for i, val in zip(A.indices[start:end], A.data[start:end]):
+            lines.append(' c{} r{} {:.15g}'.format(j, i, val))
+
+    lines.append('RHS')
+    ranges = []
+    for i, sense in enumerate(senses):
+        rhs = lp.row_lo[i] if sense in 'EG' else lp.row_up[i]
+        if rhs != 0:
+            lines.append(' rhs r{} {:.15g}'.format(i, rhs))
+        if sense == 'R':
+            ranges.append(' rng r{} {:.15g}'.format(
+                i, lp.row_up[i] - lp.row_lo[i]))
+    if ranges:
+        lines.append('RANGES')
+        lines.extend(ranges)
+
+    lines.append('BOUNDS')
+    for j, (lo, up) in enumerate(zip(lp.col_lo, lp.col_up)):
+        if lo == up:
+            lines.append(' FX bnd c{} {:.15g}'.format(j, lo))
+            continue
+        if np.isinf(lo):
+            lines.append(' MI bnd c{}'.format(j))
+        elif lo != 0:
+            lines.append(' LO bnd c{} {:.15g}'.format(j, lo))
+        if not np.isinf(up):
+            lines.append(' UP bnd c{} {:.15g}'.format(j, up))
+    lines.append('ENDATA')
+
+    with open(filename, 'w') as mps:
+        mps.write('\n'.join(lines) + '\n')
+
+
+def solve_lp(lp):
+    """Solve a SparseLP in memory with the HiGHS solver shipped with SciPy.
+
+    Args:
+        - lp: a finalized SparseLP instance
+
+    Returns:
+        a scipy.optimize.OptimizeResult; on success, lp.x holds the primal
+        solution vector
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    eq = lp.row_lo == lp.row_up
+    upper = ~eq & np.isfinite(lp.row_up)
+    lower = ~eq & np.isfinite(lp.row_lo)
+    A_ub = sparse.vstack([lp.A[upper], -lp.A[lower]]).tocsr()
+    b_ub = np.concatenate([lp.row_up[upper], -lp.row_lo[lower]])
+
+    result = linprog(lp.c, A_ub=A_ub, b_ub=b_ub,
+                     A_eq=lp.A[eq], b_eq=lp.row_lo[eq],
+                     bounds=np.column_stack([
+                         np.where(np.isinf(lp.col_lo), None, lp.col_lo),
+                         np.where(np.isinf(lp.col_up), None, lp.col_up)]),
+                     method='highs')
+    if result.status == 0:
+        lp.x = result.x
+    return result
+
+
+def get_lp_result(lp, x=None):
+    """Map a solution vector of a SparseLP to urbs result entities.
+
+    Args:
+        - lp: a finalized SparseLP instance
+        - x: (optional) solution vector, default: lp.x from solve_lp
+
+    Returns:
+        a ResultContainer, usable with get_entity, report and
+        result_figures like a loaded result file
+    """
+    if x is None:
+        x = lp.x
+    result = {}
+    for block in lp.cols:
+        values = x[block.offset:block.offset + len(block)]
+        result[block.name] = _block_series(block, values)
+
+    # total capacities, i.e. expression objects cap_pro, cap_sto_c, ...
+    for name, new, inst in (('cap_pro', 'cap_pro_new', 'inst-cap'),
+                            ('cap_sto_c', 'cap_sto_c_new', 'inst-cap-c'),
+                            ('cap_sto_p', 'cap_sto_p_new', 'inst-cap-p'),
+                            ('cap_tra', 'cap_tra_new', 'inst-cap')):
+        if new not in result:
+            continue
+        frame = lp.data[{'cap_pro': 'process',
+                         'cap_tra': 'transmission'}.get(name, 'storage')]
+        frame = frame.dropna(axis=0, how='all')
+        total = frame[inst].fillna(0).values + np.where(
+            lp.const_caps[name], 0, result[new].values)
+        result[name] = pd.Series(total, index=result[new].index, name=name)
+
+    costs = {cost_type: vector.dot(x) + lp.cost_constants[cost_type]
+             for cost_type, vector in lp.cost_vectors.items()}
+    result['costs'] = pd.Series(costs, name='costs').reindex(
+        ['Invest', 'Fixed', 'Variable', 'Fuel', 'Environmental'],
+        fill_value=0)
+    result['costs'].index.name = 'cost_type'
+
+    result['t'] = pd.Series(1, index=pd.Index(lp.timesteps, name='t'),
+                            name='t_')
+    result['tm'] = pd.Series(1, index=pd.Index(lp.timesteps[1:], name='t'),
+                             name='tm')
+    result['dt'] = pd.Series(lp.dt, index=pd.Index(lp.timesteps[1:], name='t'),
+                             name='dt')
+    result['weight'] = pd.Series(lp.weight,
+                                 index=pd.Index(lp.timesteps[1:], name='t'),
+                                 name='weight')
+
+    return ResultContainer(lp.data, result)
+
+
+def _block_series(block, values):
+    """Series of block values, indexed like get_entity would index them."""
+    tuples = block.index
+    if not isinstance(tuples, pd.MultiIndex):
+        tuples = pd.MultiIndex.from_tuples(list(tuples))
+    if block.steps is None:
+        index = tuples.copy()
+    else:
+        n = len(block.steps)
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(np.asarray(block.steps), block.size)] +
+            [np.tile(tuples.get_level_values(level), n)
+             for level in range(tuples.nlevels)])
+    index.names = block.labels
+    return pd.Series(values, index=index, name=block.name)
@@ -6,17 +6,25 @@ from .input import *
 
 
 def create_model(data, dt=1, timesteps=None, objective='cost',
-                 dual=True):
+                 dual=True, mutable=False, compact=False):
     """Create a pyomo ConcreteModel urbs object from given input data.
 
     Args:
         - data: a dict of up to 12
-        - dt: timestep duration in hours (default: 1)
+        - dt: timestep duration in hours, either constant or a mapping of
+          modelled timesteps to durations, e.g. as returned by
+          aggregate_timesteps (default: 1)
         - timesteps: optional list of timesteps, default: demand timeseries
         - objective: Either "cost" or "CO2" for choice of objective function,
           default: "cost"
         - dual: set True to add dual variables to model output
           (marginally slower), default: True
+        - mutable: set True to declare the parameters changed by scenarios
+          (commodity prices, CO2 limits, process cap-up) as mutable, so
+          that scenarios can be applied with update_model, default: False
+        - compact: set True to substitute the process flows e_pro_in and
+          e_pro_out by expressions of tau_pro instead of declaring them as
+          variables with defining equalities, default: False
 
     Returns:
         a pyomo ConcreteModel object
@@ -24,30 +32,17 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
 
     # Optional
     if not timesteps:
-        timesteps = data['demand'].index.tolist()
+        timesteps = (data['demand'].index.get_level_values('t')
+                     .unique().tolist())
     m = pyomo_model_prep(data, timesteps)  # preparing pyomo model
     m.name = 'urbs'
     m.created = datetime.now().strftime('%Y%m%dT%H%M')
     m._data = data
+    m.compact = compact
+    m.mutable = mutable
 
     # Parameters
 
-    # weight = length of year (hours) / length of simulation (hours)
-    # weight scales costs and emissions from length of simulation to a full
-    # year, making comparisons among cost types (invest is annualized, fixed
-    # costs are annual by default, variable costs are scaled by weight) and
-    # among different simulation durations meaningful.
-    m.weight = pyomo.Param(
-        initialize=float(8760) / (len(m.timesteps) * dt),
-        doc='Pre-factor for variable costs and emissions for an annual result')
-
-    # dt = spacing between timesteps. Required for storage equation that
-    # converts between energy (storage content, e_sto_con) and power (all other
-    # quantities that start with "e_")
-    m.dt = pyomo.Param(
-        initialize=dt,
-        doc='Time step duration (in hours), default: 1')
-
     # import objective function information
     m.obj = pyomo.Param(
         initialize=objective,
@@ -73,6 +68,27 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         ordered=True,
         doc='Set of modelled timesteps')
 
+    # dt = spacing between timesteps. Required for storage equation that
+    # converts between energy (storage content, e_sto_con) and power (all other
+    # quantities that start with "e_")
+    durations = timestep_durations(m.timesteps, dt)
+    m.dt = pyomo.Param(
+        m.tm,
+        initialize=durations,
+        doc='Time step duration (in hours), default: 1')
+
+    # weight = length of year (hours) / length of simulation (hours)
+    # weight scales costs and emissions from length of simulation to a full
+    # year, making comparisons among cost types (invest is annualized, fixed
+    # costs are annual by default, variable costs are scaled by weight) and
+    # among different simulation durations meaningful. With representative
+    # periods (c.f. aggregate_periods), each timestep is additionally
+    # weighted by the number of periods its representative period stands for
+    m.weight = pyomo.Param(
+        m.tm,
+        initialize=timestep_weights(m, dt),
+        doc='Pre-factor for variable costs and emissions for an annual result')
+
     # support timeframes (e.g. 2020, 2030...)
     indexlist = set()
     for key in m.commodity_dict["price"]:
@@ -136,6 +152,25 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         initialize=commodity_subset(m.com_tuples, 'Stock'),
         doc='Commodities that can be purchased at some site(s)')
 
+    # parameters changed by scenarios (c.f. urbs.scenarios); if mutable,
+    # scenarios can be applied to the built model by update_model
+    m.commodity_price = pyomo.Param(
+        m.com_tuples,
+        initialize={c: m.commodity_dict['price'][c] for c in m.com_tuples},
+        mutable=mutable,
+        doc='Commodity price (EUR/MWh)')
+    m.co2_limit = pyomo.Param(
+        m.stf,
+        initialize={stf: m.global_prop_dict['value'][stf, 'CO2 limit']
+                    for stf in m.stf},
+        mutable=mutable,
+        doc='Global CO2 limit per support timeframe (t)')
+    m.process_cap_up = pyomo.Param(
+        m.pro_tuples,
+        initialize={p: m.process_dict['cap-up'][p] for p in m.pro_tuples},
+        mutable=mutable,
+        doc='Maximum total process capacity (MW)')
+
     if m.mode['int']:
         # tuples for operational status of technologies
         m.operational_pro_tuples = pyomo.Set(
@@ -169,6 +204,17 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         initialize=commodity_subset(m.com_tuples, 'Env'),
         doc='Commodities that (might) have a maximum creation limit')
 
+    # commodity tuple subsets
+    m.com_stock_tuples = pyomo.Set(
+        within=m.stf * m.sit * m.com * m.com_type,
+        initialize=[c for c in m.com_tuples if c[2] in m.com_stock],
+        doc='Combinations of stock commodities, e.g. (2018,Mid,Coal,Stock)')
+    m.com_env_tuples = pyomo.Set(
+        within=m.stf * m.sit * m.com * m.com_type,
+        initialize=[c for c in m.com_tuples if c[2] in m.com_env],
+        doc='Combinations of environmental commodities, e.g. '
+            '(2018,Mid,CO2,Env)')
+
     # process tuples for area rule
     m.pro_area_tuples = pyomo.Set(
         within=m.stf * m.sit * m.pro,
@@ -197,7 +243,8 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         within=m.stf * m.sit * m.pro,
         initialize=[(stf, sit, pro)
                     for (stf, sit, pro) in m.pro_tuples
-                    if m.process_dict['max-grad'][stf, sit, pro] < 1.0 / dt],
+                    if m.process_dict['max-grad'][stf, sit, pro] <
+                    1.0 / min(durations.values())],
         doc='Processes with maximum gradient smaller than timestep length')
 
     # process tuples for partial feature
@@ -237,15 +284,19 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         doc='Costs by type (EUR/a)')
 
     # commodity
+    # simple box constraints are stated as variable bounds instead of
+    # constraint rows, e.g. stock commodity input per step <= maxperhour
     m.e_co_stock = pyomo.Var(
-        m.tm, m.com_tuples,
+        m.tm, m.com_stock_tuples,
         within=pyomo.NonNegativeReals,
+        bounds=e_co_stock_bounds_rule,
         doc='Use of stock commodity source (MW) per timestep')
 
     # process
     m.cap_pro_new = pyomo.Var(
         m.pro_tuples,
         within=pyomo.NonNegativeReals,
+        bounds=cap_pro_new_bounds_rule,
         doc='New process capacity (MW)')
 
     # process capacity as expression object
@@ -259,14 +310,15 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         m.t, m.pro_tuples,
         within=pyomo.NonNegativeReals,
         doc='Power flow (MW) through process')
-    m.e_pro_in = pyomo.Var(
-        m.tm, m.pro_input_tuples,
-        within=pyomo.NonNegativeReals,
-        doc='Power flow of commodity into process (MW) per timestep')
-    m.e_pro_out = pyomo.Var(
-        m.tm, m.pro_output_tuples,
-        within=pyomo.NonNegativeReals,
-        doc='Power flow out of process (MW) per timestep')
+    if not m.compact:
+        m.e_pro_in = pyomo.Var(
+            m.tm, m.pro_input_tuples,
+            within=pyomo.NonNegativeReals,
+            doc='Power flow of commodity into process (MW) per timestep')
+        m.e_pro_out = pyomo.Var(
+            m.tm, m.pro_output_tuples,
+            within=pyomo.NonNegativeReals,
+            doc='Power flow out of process (MW) per timestep')
 
     # Add additional features
     # called features are declared in distinct files in features folder
@@ -285,6 +337,33 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
             within=m.stf * m.sit * m.pro * m.com,
             doc='empty set needed for (partial) process output')
 
+    if m.compact:
+        # compact formulation: process flows as expressions of tau_pro,
+        # replacing the variables and their defining equalities
+        m.e_pro_in = pyomo.Expression(
+            m.tm, m.pro_input_tuples,
+            rule=def_process_input_flow_rule,
+            doc='Power flow of commodity into process (MW) per timestep')
+        m.e_pro_out = pyomo.Expression(
+            m.tm, m.pro_output_tuples,
+            rule=def_process_output_flow_rule,
+            doc='Power flow out of process (MW) per timestep')
+
+    # commodity balance as expression object, built once per timestep and
+    # commodity and shared by the vertex, emission and cost rules
+    m.com_balance_tuples = pyomo.Set(
+        within=m.stf * m.sit * m.com,
+        initialize=sorted(set((stf, sit, com)
+                              for (stf, sit, com, com_type) in m.com_tuples
+                              if com not in m.com_supim)),
+        doc='Combinations of commodities with a balance, e.g. '
+            '(2020,Mid,Elec)')
+    m.e_co_balance = pyomo.Expression(
+        m.tm, m.com_balance_tuples,
+        rule=def_commodity_balance_rule,
+        doc='Commodity consumed (positive) or provided (negative) per '
+            'timestep')
+
     # Equation declarations
     # equation bodies are defined in separate functions, referred to here by
     # their name in the "rule" keyword.
@@ -294,33 +373,30 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         m.tm, m.com_tuples,
         rule=res_vertex_rule,
         doc='storage + transmission + process + source + buy - sell == demand')
-    m.res_stock_step = pyomo.Constraint(
-        m.tm, m.com_tuples,
-        rule=res_stock_step_rule,
-        doc='stock commodity input per step <= commodity.maxperstep')
     m.res_stock_total = pyomo.Constraint(
-        m.com_tuples,
+        m.com_stock_tuples,
         rule=res_stock_total_rule,
         doc='total stock commodity input <= commodity.max')
     m.res_env_step = pyomo.Constraint(
-        m.tm, m.com_tuples,
+        m.tm, m.com_env_tuples,
         rule=res_env_step_rule,
         doc='environmental output per step <= commodity.maxperstep')
     m.res_env_total = pyomo.Constraint(
-        m.com_tuples,
+        m.com_env_tuples,
         rule=res_env_total_rule,
         doc='total environmental commodity output <= commodity.max')
 
     # process
-    m.def_process_input = pyomo.Constraint(
-        m.tm, m.pro_input_tuples - m.pro_partial_input_tuples,
-        rule=def_process_input_rule,
-        doc='process input = process throughput * input ratio')
-    m.def_process_output = pyomo.Constraint(
-        m.tm, (m.pro_output_tuples - m.pro_partial_output_tuples -
-               m.pro_timevar_output_tuples),
-        rule=def_process_output_rule,
-        doc='process output = process throughput * output ratio')
+    if not m.compact:
+        m.def_process_input = pyomo.Constraint(
+            m.tm, m.pro_input_tuples - m.pro_partial_input_tuples,
+            rule=def_process_input_rule,
+            doc='process input = process throughput * input ratio')
+        m.def_process_output = pyomo.Constraint(
+            m.tm, (m.pro_output_tuples - m.pro_partial_output_tuples -
+                   m.pro_timevar_output_tuples),
+            rule=def_process_output_rule,
+            doc='process output = process throughput * output ratio')
     m.def_intermittent_supply = pyomo.Constraint(
         m.tm, m.pro_input_tuples,
         rule=def_intermittent_supply_rule,
@@ -351,20 +427,21 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
         m.tm, m.pro_partial_tuples,
         rule=res_throughput_by_capacity_min_rule,
         doc='cap_pro * min-fraction <= tau_pro')
-    m.def_partial_process_input = pyomo.Constraint(
-        m.tm, m.pro_partial_input_tuples,
-        rule=def_partial_process_input_rule,
-        doc='e_pro_in = '
-            ' cap_pro * min_fraction * (r - R) / (1 - min_fraction)'
-            ' + tau_pro * (R - min_fraction * r) / (1 - min_fraction)')
-    m.def_partial_process_output = pyomo.Constraint(
-        m.tm,
-        (m.pro_partial_output_tuples -
-            (m.pro_partial_output_tuples & m.pro_timevar_output_tuples)),
-        rule=def_partial_process_output_rule,
-        doc='e_pro_out = '
-            ' cap_pro * min_fraction * (r - R) / (1 - min_fraction)'
-            ' + tau_pro * (R - min_fraction * r) / (1 - min_fraction)')
+    if not m.compact:
+        m.def_partial_process_input = pyomo.Constraint(
+            m.tm, m.pro_partial_input_tuples,
+            rule=def_partial_process_input_rule,
+            doc='e_pro_in = '
+                ' cap_pro * min_fraction * (r - R) / (1 - min_fraction)'
+                ' + tau_pro * (R - min_fraction * r) / (1 - min_fraction)')
+        m.def_partial_process_output = pyomo.Constraint(
+            m.tm,
+            (m.pro_partial_output_tuples -
+                (m.pro_partial_output_tuples & m.pro_timevar_output_tuples)),
+            rule=def_partial_process_output_rule,
+            doc='e_pro_out = '
+                ' cap_pro * min_fraction * (r - R) / (1 - min_fraction)'
+                ' + tau_pro * (R - min_fraction * r) / (1 - min_fraction)')
 
     if m.mode['int']:
         m.res_global_co2_limit = pyomo.Constraint(
@@ -418,6 +495,107 @@ def create_model(data, dt=1, timesteps=None, objective='cost',
     return m
 
 
+# input columns that update_model can apply to a built model
+# (sheet, column, affected parameter)
+SCENARIO_COLUMNS = [
+    ('commodity', 'price', 'commodity_price'),
+    ('process', 'cap-up', 'process_cap_up'),
+    ('global_prop', 'value', 'co2_limit')]
+
+
+def update_model(m, data):
+    """Apply modified input data to an existing model without rebuilding it.
+
+    Only commodity prices, process cap-up values and the global CO2 limits
+    can be changed this way. They are written to the mutable parameters of
+    a model created with create_model(..., mutable=True). Any other change
+    to the input data (including changes of cap-up or CO2 limit that alter
+    the model structure, e.g. whether a process is expanded or whether a CO2
+    limit constraint exists) requires a new model.
+
+    Args:
+        - m: a pyomo ConcreteModel created with mutable=True
+        - data: input data dictionary of the new scenario, not yet passed
+          to create_model
+
+    Returns:
+        True if the model has been updated, False if it must be rebuilt
+    """
+    if not m.mutable:
+        return False
+    if set(data) != set(m._data):
+        return False
+
+    # any difference outside of the scenario columns needs a rebuild
+    changes = {}
+    for name, df in data.items():
+        old = m._data[name]
+        if (not df.index.equals(old.index) or
+                not df.columns.isin(old.columns).all()):
+            return False
+        columns = [col for (sheet, col, _) in SCENARIO_COLUMNS
+                   if sheet == name]
+        rest = df.columns.drop(columns)
+        if not df[rest].equals(old[rest]):
+            return False
+        for col in columns:
+            diff = df[col].ne(old[col]) & ~(df[col].isnull() &
+                                            old[col].isnull())
+            if name == 'global_prop':
+                diff &= df.index.get_level_values(1) == 'CO2 limit'
+                if not df.loc[~diff, col].equals(old.loc[~diff, col]):
+                    return False
+            if diff.any():
+                changes[name, col] = df.loc[diff, col]
+
+    # the CO2 limit constraint only exists for finite, non-negative limits
+    def co2_limit_active(value):
+        return not math.isinf(value) and value >= 0
+    if ('global_prop', 'value') in changes:
+        new = changes['global_prop', 'value']
+        old = m._data['global_prop'].loc[new.index, 'value']
+        if any(co2_limit_active(a) != co2_limit_active(b)
+               for a, b in zip(new, old)):
+            return False
+
+    # processes with inst-cap == cap-up are not expanded (constant capacity)
+    if ('process', 'cap-up') in changes:
+        new = changes['process', 'cap-up']
+        process = m._data['process']
+        if m.mode['int']:
+            # constant capacity depends on all support timeframes
+            sit_pro = (process.index.droplevel('support_timeframe')
+                       .isin(new.index.droplevel('support_timeframe')))
+            rows = process[sit_pro]
+            cap_up = data['process'].loc[sit_pro, 'cap-up']
+        else:
+            rows = process.loc[new.index]
+            cap_up = new
+        if ((rows['inst-cap'] == rows['cap-up']).any() or
+                (rows['inst-cap'] == cap_up).any()):
+            return False
+
+    # write changes to parameters, prepared dicts and model input data
+    for (sheet, col, param) in SCENARIO_COLUMNS:
+        if (sheet, col) not in changes:
+            continue
+        values = changes[sheet, col]
+        m._data[sheet].loc[values.index, col] = values
+        getattr(m, '{}_dict'.format(sheet))[col].update(values.to_dict())
+        for key, value in values.items():
+            if sheet == 'global_prop':
+                key = key[0]
+            getattr(m, param)[key] = value
+    return True
+
+
+# Expressions
+
+# commodity balance (for m.e_co_balance expression)
+def def_commodity_balance_rule(m, tm, stf, sit, com):
+    return commodity_balance(m, tm, stf, sit, com)
+
+
 # Constraints
 
 # commodity
@@ -433,13 +611,14 @@ def res_vertex_rule(m, tm, stf, sit, com, com_type):
     if com in m.com_supim:
         return pyomo.Constraint.Skip
 
-    # helper function commodity_balance calculates balance from input to
-    # and output from processes, storage and transmission.
+    # expression e_co_balance (cf. helper function commodity_balance)
+    # holds the balance from input to and output from processes, storage
+    # and transmission.
     # if power_surplus > 0: production/storage/imports create net positive
     #                       amount of commodity com
     # if power_surplus < 0: production/storage/exports consume a net
     #                       amount of the commodity com
-    power_surplus = - commodity_balance(m, tm, stf, sit, com)
+    power_surplus = - m.e_co_balance[tm, stf, sit, com]
 
     # if com is a stock commodity, the commodity source term e_co_stock
     # can supply a possibly negative power_surplus
@@ -464,34 +643,48 @@ def res_vertex_rule(m, tm, stf, sit, com, com_type):
 
     return power_surplus == 0
 
+# Variable bounds
+
 # stock commodity purchase == commodity consumption, according to
 # commodity_balance of current (time step, site, commodity);
 # limit stock commodity use per time step
-
-
-def res_stock_step_rule(m, tm, stf, sit, com, com_type):
-    if com not in m.com_stock:
-        return pyomo.Constraint.Skip
-    else:
-        return (m.e_co_stock[tm, stf, sit, com, com_type] <=
-                m.dt * m.commodity_dict['maxperhour']
-                [(stf, sit, com, com_type)])
+def e_co_stock_bounds_rule(m, tm, stf, sit, com, com_type):
+    return (0, finite_or_none(
+        pyomo.value(m.dt[tm]) *
+        m.commodity_dict['maxperhour'][(stf, sit, com, com_type)]))
+
+
+# lower bound <= process capacity <= upper bound, if the total process
+# capacity is new capacity plus a constant (c.f. res_process_capacity_rule)
+def cap_pro_new_bounds_rule(m, stf, sit, pro):
+    if not process_capacity_as_bounds(m, stf, sit, pro):
+        return (0, None)
+    inst_cap = m.process_dict['inst-cap'][(stf, sit, pro)]
+    return (max(0, m.process_dict['cap-lo'][(stf, sit, pro)] - inst_cap),
+            finite_or_none(m.process_dict['cap-up'][(stf, sit, pro)] -
+                           inst_cap))
+
+
+def process_capacity_as_bounds(m, stf, sit, pro):
+    """True if res_process_capacity is stated as bounds of cap_pro_new.
+    Applies to expandable processes of single-year models; with mutable
+    parameters (c.f. update_model), cap-up is kept in the constraint.
+    """
+    return (not m.mode['int'] and
+            not m.mutable and
+            (sit, pro, stf) not in m.pro_const_cap_dict)
 
 
 # limit stock commodity use in total (scaled to annual consumption, thanks
 # to m.weight)
 def res_stock_total_rule(m, stf, sit, com, com_type):
-    if com not in m.com_stock:
-        return pyomo.Constraint.Skip
-    else:
-        # calculate total consumption of commodity com
-        total_consumption = 0
-        for tm in m.tm:
-            total_consumption += (
-                m.e_co_stock[tm, stf, sit, com, com_type])
-        total_consumption *= m.weight
-        return (total_consumption <=
-                m.commodity_dict['max'][(stf, sit, com, com_type)])
+    # calculate total consumption of commodity com
+    total_consumption = 0
+    for tm in m.tm:
+        total_consumption += (
+            m.e_co_stock[tm, stf, sit, com, com_type] * m.weight[tm])
+    return (total_consumption <=
+            m.commodity_dict['max'][(stf, sit, com, com_type)])
 
 
 # environmental commodity creation == - commodity_balance of that commodity
@@ -499,28 +692,22 @@ def res_stock_total_rule(m, stf, sit, com, com_type):
 # any process activity;
 # limit environmental commodity output per time step
 def res_env_step_rule(m, tm, stf, sit, com, com_type):
-    if com not in m.com_env:
-        return pyomo.Constraint.Skip
-    else:
-        environmental_output = - commodity_balance(m, tm, stf, sit, com)
-        return (environmental_output <=
-                m.dt * m.commodity_dict['maxperhour']
-                [(stf, sit, com, com_type)])
+    environmental_output = - m.e_co_balance[tm, stf, sit, com]
+    return (environmental_output <=
+            m.dt[tm] * m.commodity_dict['maxperhour']
+            [(stf, sit, com, com_type)])
 
 
 # limit environmental commodity output in total (scaled to annual
 # emissions, thanks to m.weight)
 def res_env_total_rule(m, stf, sit, com, com_type):
-    if com not in m.com_env:
-        return pyomo.Constraint.Skip
-    else:
-        # calculate total creation of environmental commodity com
-        env_output_sum = 0
-        for tm in m.tm:
-            env_output_sum += (- commodity_balance(m, tm, stf, sit, com))
-        env_output_sum *= m.weight
-        return (env_output_sum <=
-                m.commodity_dict['max'][(stf, sit, com, com_type)])
+    # calculate total creation of environmental commodity com
+    env_output_sum = 0
+    for tm in m.tm:
+        env_output_sum += (- m.e_co_balance[tm, stf, sit, com] *
+                           m.weight[tm])
+    return (env_output_sum <=
+            m.commodity_dict['max'][(stf, sit, com, com_type)])
 
 
 # process
@@ -570,71 +757,84 @@ def def_intermittent_supply_rule(m, tm, stf, sit, pro, coin):
     if coin in m.com_supim:
         return (m.e_pro_in[tm, stf, sit, pro, coin] ==
                 m.cap_pro[stf, sit, pro] * m.supim_dict[(sit, coin)]
-                [(stf, tm)] * m.dt)
+                [(stf, tm)] * m.dt[tm])
     else:
         return pyomo.Constraint.Skip
 
 
 # process throughput <= process capacity
 def res_process_throughput_by_capacity_rule(m, tm, stf, sit, pro):
-    return (m.tau_pro[tm, stf, sit, pro] <= m.dt * m.cap_pro[stf, sit, pro])
+    return (m.tau_pro[tm, stf, sit, pro] <=
+            m.dt[tm] * m.cap_pro[stf, sit, pro])
 
 
 def res_process_maxgrad_lower_rule(m, t, stf, sit, pro):
-    return (m.tau_pro[t - 1, stf, sit, pro] -
+    return (previous_throughput(m, t, stf, sit, pro) -
             m.cap_pro[stf, sit, pro] *
-            m.process_dict['max-grad'][(stf, sit, pro)] * m.dt <=
+            m.process_dict['max-grad'][(stf, sit, pro)] * m.dt[t] <=
             m.tau_pro[t, stf, sit, pro])
 
 
 def res_process_maxgrad_upper_rule(m, t, stf, sit, pro):
-    return (m.tau_pro[t - 1, stf, sit, pro] +
+    return (previous_throughput(m, t, stf, sit, pro) +
             m.cap_pro[stf, sit, pro] *
-            m.process_dict['max-grad'][(stf, sit, pro)] * m.dt >=
+            m.process_dict['max-grad'][(stf, sit, pro)] * m.dt[t] >=
             m.tau_pro[t, stf, sit, pro])
 
 
+def previous_throughput(m, t, stf, sit, pro):
+    """Process throughput in the timestep before t, scaled to the duration
+    of t, so that the gradient rules compare power."""
+    tau = m.tau_pro[t - 1, stf, sit, pro]
+    if t - 1 in m.tm:
+        ratio = pyomo.value(m.dt[t]) / pyomo.value(m.dt[t - 1])
+        if ratio != 1:
+            tau = tau * ratio
+    return tau
+
+
 def res_throughput_by_capacity_min_rule(m, tm, stf, sit, pro):
     return (m.tau_pro[tm, stf, sit, pro] >=
             m.cap_pro[stf, sit, pro] *
-            m.process_dict['min-fraction'][(stf, sit, pro)] * m.dt)
+            m.process_dict['min-fraction'][(stf, sit, pro)] * m.dt[tm])
 
 
 def def_partial_process_input_rule(m, tm, stf, sit, pro, coin):
-    # input ratio at maximum operation point
-    R = m.r_in_dict[(stf, pro, coin)]
-    # input ratio at lowest operation point
-    r = m.r_in_min_fraction_dict[stf, pro, coin]
-    min_fraction = m.process_dict['min-fraction'][(stf, sit, pro)]
-
-    online_factor = min_fraction * (r - R) / (1 - min_fraction)
-    throughput_factor = (R - min_fraction * r) / (1 - min_fraction)
-
     return (m.e_pro_in[tm, stf, sit, pro, coin] ==
-            m.dt * m.cap_pro[stf, sit, pro] * online_factor +
-            m.tau_pro[tm, stf, sit, pro] * throughput_factor)
+            partial_process_input(m, tm, stf, sit, pro, coin))
 
 
 def def_partial_process_output_rule(m, tm, stf, sit, pro, coo):
-    # input ratio at maximum operation point
-    R = m.r_out_dict[stf, pro, coo]
-    # input ratio at lowest operation point
-    r = m.r_out_min_fraction_dict[stf, pro, coo]
-    min_fraction = m.process_dict['min-fraction'][(stf, sit, pro)]
+    return (m.e_pro_out[tm, stf, sit, pro, coo] ==
+            partial_process_output(m, tm, stf, sit, pro, coo))
 
-    online_factor = min_fraction * (r - R) / (1 - min_fraction)
-    throughput_factor = (R - min_fraction * r) / (1 - min_fraction)
 
-    return (m.e_pro_out[tm, stf, sit, pro, coo] ==
-            m.dt * m.cap_pro[stf, sit, pro] * online_factor +
-            m.tau_pro[tm, stf, sit, pro] * throughput_factor)
+# process flows as expressions of tau_pro (compact formulation), combining
+# the right-hand sides of the defining equalities above and of TimeVarEff
+def def_process_input_flow_rule(m, tm, stf, sit, pro, com):
+    if (stf, sit, pro, com) in m.pro_partial_input_tuples:
+        return partial_process_input(m, tm, stf, sit, pro, com)
+    return m.tau_pro[tm, stf, sit, pro] * m.r_in_dict[(stf, pro, com)]
+
+
+def def_process_output_flow_rule(m, tm, stf, sit, pro, com):
+    if (stf, sit, pro, com) in m.pro_partial_output_tuples:
+        flow = partial_process_output(m, tm, stf, sit, pro, com)
+    else:
+        flow = m.tau_pro[tm, stf, sit, pro] * m.r_out_dict[(stf, pro, com)]
+    if (stf, sit, pro, com) in m.pro_timevar_output_tuples:
+        flow = flow * m.eff_factor_dict[(sit, pro)][(stf, tm)]
+    return flow
 
 
 # lower bound <= process capacity <= upper bound
 def res_process_capacity_rule(m, stf, sit, pro):
+    if process_capacity_as_bounds(m, stf, sit, pro):
+        # c.f. cap_pro_new_bounds_rule
+        return pyomo.Constraint.Skip
     return (m.process_dict['cap-lo'][stf, sit, pro],
             m.cap_pro[stf, sit, pro],
-            m.process_dict['cap-up'][stf, sit, pro])
+            m.process_cap_up[stf, sit, pro])
 
 
 # used process area <= maximal process area
@@ -655,21 +855,21 @@ def res_area_rule(m, stf, sit):
 
 # total CO2 output <= Global CO2 limit
 def res_global_co2_limit_rule(m, stf):
-    if math.isinf(m.global_prop_dict['value'][stf, 'CO2 limit']):
+    if math.isinf(pyomo.value(m.co2_limit[stf])):
         return pyomo.Constraint.Skip
-    elif m.global_prop_dict['value'][stf, 'CO2 limit'] >= 0:
+    elif pyomo.value(m.co2_limit[stf]) >= 0:
         co2_output_sum = 0
         for tm in m.tm:
             for sit in m.sit:
+                if (stf, sit, 'CO2') not in m.com_balance_tuples:
+                    continue
                 # minus because negative commodity_balance represents creation
-                # of that commodity.
-                co2_output_sum += (- commodity_balance(m, tm,
-                                                       stf, sit, 'CO2'))
-
-        # scaling to annual output (cf. definition of m.weight)
-        co2_output_sum *= m.weight
-        return (co2_output_sum <= m.global_prop_dict['value']
-                                                    [stf, 'CO2 limit'])
+                # of that commodity; scaling to annual output (cf.
+                # definition of m.weight)
+                co2_output_sum += (- m.e_co_balance[tm, stf, sit, 'CO2'] *
+                                   m.weight[tm])
+
+        return (co2_output_sum <= m.co2_limit[stf])
     else:
         return pyomo.Constraint.Skip
 
@@ -683,11 +883,12 @@ def res_global_co2_budget_rule(m):
         for stf in m.stf:
             for tm in m.tm:
                 for sit in m.sit:
+                    if (stf, sit, 'CO2') not in m.com_balance_tuples:
+                        continue
                     # minus because negative commodity_balance represents
                     # creation of that commodity.
-                    co2_output_sum += (- commodity_balance
-                                       (m, tm, stf, sit, 'CO2') *
-                                       m.weight *
+                    co2_output_sum += (- m.e_co_balance[tm, stf, sit, 'CO2'] *
+                                       m.weight[tm] *
                                        stf_dist(stf, m))
 
         return (co2_output_sum <=
@@ -755,7 +956,7 @@ def def_costs_rule(m, cost_type):
 
     elif cost_type == 'Variable':
         cost = \
-            sum(m.tau_pro[(tm,) + p] * m.weight *
+            sum(m.tau_pro[(tm,) + p] * m.weight[tm] *
                 m.process_dict['var-cost'][p] *
                 m.process_dict['cost_factor'][p]
                 for tm in m.tm
@@ -768,20 +969,18 @@ def def_costs_rule(m, cost_type):
 
     elif cost_type == 'Fuel':
         return m.costs[cost_type] == sum(
-            m.e_co_stock[(tm,) + c] * m.weight *
-            m.commodity_dict['price'][c] *
+            m.e_co_stock[(tm,) + c] * m.weight[tm] *
+            m.commodity_price[c] *
             m.commodity_dict['cost_factor'][c]
-            for tm in m.tm for c in m.com_tuples
-            if c[2] in m.com_stock)
+            for tm in m.tm for c in m.com_stock_tuples)
 
     elif cost_type == 'Environmental':
         return m.costs[cost_type] == sum(
-            - commodity_balance(m, tm, stf, sit, com) * m.weight *
-            m.commodity_dict['price'][(stf, sit, com, com_type)] *
+            - m.e_co_balance[tm, stf, sit, com] * m.weight[tm] *
+            m.commodity_price[(stf, sit, com, com_type)] *
             m.commodity_dict['cost_factor'][(stf, sit, com, com_type)]
             for tm in m.tm
-            for stf, sit, com, com_type in m.com_tuples
-            if com in m.com_env)
+            for stf, sit, com, com_type in m.com_env_tuples)
 
     # Revenue and Purchase costs defined in BuySellPrice.py
     elif cost_type == 'Revenue':
@@ -804,11 +1003,12 @@ def co2_rule(m):
     for stf in m.stf:
         for tm in m.tm:
             for sit in m.sit:
+                if (stf, sit, 'CO2') not in m.com_balance_tuples:
+                    continue
                 # minus because negative commodity_balance represents
                 # creation of that commodity.
-                co2_output_sum += (- commodity_balance
-                                   (m, tm, stf, sit, 'CO2') *
-                                   m.weight *
+                co2_output_sum += (- m.e_co_balance[tm, stf, sit, 'CO2'] *
+                                   m.weight[tm] *
                                    stf_dist(stf, m))
 
     return (co2_output_sum)
@@ -97,10 +97,7 @@ def get_timeseries(instance, stf, com, sites, timesteps=None):
         # select commodity (xs), then the sites from remaining simple columns
         # and sum all together to form a Series
         demand = (
-            pd.DataFrame.from_dict(
-                get_input(
-                    instance,
-                    'demand_dict')).loc[stf] .loc[timesteps].xs(
+            get_input(instance, 'demand').loc[stf].loc[timesteps].xs(
                 com,
                 axis=1,
                 level=1)[sites].sum(
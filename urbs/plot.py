@@ -70,7 +70,8 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
         - stf: support timeframe
         - com: commodity name to plot
         - sit: site name to plot
-        - dt: length of each time step (unit: hours)
+        - dt: length of each modelled time step (unit: hours), a constant
+          or a Series
         - timesteps: modelled timesteps
         - timesteps_plot: timesteps to be plotted
         - power_name: optional string for 'power' label; default: 'Power'
@@ -90,9 +91,19 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
         # default to all simulated timesteps
         timesteps = sorted(get_entity(prob, 'tm').index)
 
+    # duration of each timestep; the initial timestep takes the duration of
+    # the first modelled one
+    if np.isscalar(dt):
+        dt = pd.Series(dt, index=timesteps)
+    else:
+        dt = pd.Series(dt).reindex(timesteps).bfill()
+
     # convert timesteps to hour series for the plots
-    hoursteps = timesteps * dt[0]
-    hoursteps_plot = timesteps_plot * dt[0]
+    hours = pd.Series(timesteps[0] * dt.iloc[0] + dt.cumsum() - dt.iloc[0],
+                      index=timesteps)
+    hoursteps = hours.values
+    hoursteps_plot = hours.loc[timesteps_plot].values
+    step = dt.min()  # for the xtick distance
 
     if is_string(sit):
         # wrap single site in 1-element list for consistent behaviour
@@ -163,7 +174,7 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
 
     # stack plot for consumed commodities (divided by dt for power)
     sp00 = ax0.stackplot(hoursteps[1:],
-                         -consumed.values.T / dt[0],
+                         -consumed.values.T / dt.values[1:],
                          labels=tuple(consumed.columns),
                          linewidth=0.15)
     # color
@@ -177,7 +188,7 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
 
     # stack plot for created commodities (divided by dt for power)
     sp0 = ax0.stackplot(hoursteps[1:],
-                        created.values.T / dt[0],
+                        created.values.T / dt.values[1:],
                         labels=tuple(created.columns),
                         linewidth=0.15)
 
@@ -223,12 +234,12 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
 
     # PLOT DEMAND
     # line plot for demand (unshifted) commodities (divided by dt for power)
-    ax0.plot(hoursteps, original.values / dt[0], linewidth=0.8,
+    ax0.plot(hoursteps, original.values / dt.values, linewidth=0.8,
              color=to_color('Unshifted'))
 
     # line plot for demand (in case of DSM mode: shifted) commodities
     # (divided by dt for power)
-    ax0.plot(hoursteps[1:], demand.values / dt[0], linewidth=1.0,
+    ax0.plot(hoursteps[1:], demand.values / dt.values[1:], linewidth=1.0,
              color=to_color('Shifted'))
 
     # PLOT STORAGE
@@ -265,7 +276,7 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
 
         # bar plot for DSM up-/downshift power (bar width depending on dt)
         ax2.bar(hoursteps,
-                deltademand.values / dt[0], width=0.8 * dt[0],
+                deltademand.values / dt.values, width=0.8 * dt.values,
                 color=to_color('Delta'),
                 edgecolor='none')
 
@@ -274,16 +285,16 @@ def plot(prob, stf, com, sit, dt, timesteps, timesteps_plot,
         ax2.set_ylabel('{} ({})'.format(power_name, power_unit))
 
     # make xtick distance duration-dependent
-    if len(timesteps_plot) > 26 * 168 / dt[0]:     # time horizon > half a year
-        steps_between_ticks = int(168 * 4 / dt[0])  # tick every four weeks
-    elif len(timesteps_plot) > 3 * 168 / dt[0]:    # time horizon > three weeks
-        steps_between_ticks = int(168 / dt[0])     # tick every week
-    elif len(timesteps_plot) > 2 * 24 / dt[0]:     # time horizon > two days
-        steps_between_ticks = int(24 / dt[0])      # tick every day
-    elif len(timesteps_plot) > 24 / dt[0]:         # time horizon > a day
-        steps_between_ticks = int(6 / dt[0])       # tick every six hours
+    if len(timesteps_plot) > 26 * 168 / step:      # time horizon > half a year
+        steps_between_ticks = int(168 * 4 / step)   # tick every four weeks
+    elif len(timesteps_plot) > 3 * 168 / step:     # time horizon > three weeks
+        steps_between_ticks = int(168 / step)      # tick every week
+    elif len(timesteps_plot) > 2 * 24 / step:      # time horizon > two days
+        steps_between_ticks = int(24 / step)       # tick every day
+    elif len(timesteps_plot) > 24 / step:          # time horizon > a day
+        steps_between_ticks = int(6 / step)        # tick every six hours
     else:                                          # time horizon <= a day
-        steps_between_ticks = int(3 / dt[0])       # tick every three hours
+        steps_between_ticks = int(3 / step)        # tick every three hours
 
     hoursteps_plot_ = hoursteps_plot[(steps_between_ticks - 1):]
     hoursteps_plot_ = hoursteps_plot_[::steps_between_ticks]   # take hole h's
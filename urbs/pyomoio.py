@@ -41,12 +41,13 @@ def get_entity(instance, name):
             name = name + '_'
 
     elif isinstance(entity, pyomo.Param):
+        # pyomo.value also resolves the values of mutable parameters
         if entity.dim() > 1:
             results = pd.DataFrame(
-                [v[0] + (v[1],) for v in entity.iteritems()])
+                [v[0] + (pyomo.value(v[1]),) for v in entity.iteritems()])
         elif entity.dim() == 1:
             results = pd.DataFrame(
-                [(v[0], v[1]) for v in entity.iteritems()])
+                [(v[0], pyomo.value(v[1])) for v in entity.iteritems()])
         else:
             results = pd.DataFrame(
                 [(v[0], v[1].value) for v in entity.iteritems()])
@@ -273,3 +274,30 @@ def _get_onset_names(entity):
         raise ValueError("Unknown entity type!")
 
     return labels
+
+
+def set_start_values(instance, previous):
+    """ Set the variable values of a model instance to a previous solution.
+
+    Variables are mapped by name and index, so that the previous solution
+    may stem from a model of different input (e.g. another scenario, or an
+    overlapping timestep window); fixed variables and variables without a
+    previous value keep their value.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        previous: a solved Pyomo ConcreteModel instance or a result
+            container (c.f. load)
+
+    Returns:
+        number of variable values set
+    """
+    count = 0
+    for name in list_entities(instance, 'var').index:
+        var = getattr(instance, name)
+        for index, value in get_entity(previous, name).items():
+            if pd.isnull(value) or index not in var or var[index].fixed:
+                continue
+            var[index].value = value
+            count += 1
+    return count
@@ -0,0 +1,199 @@
+import pandas as pd
+import pyomo.core as pyomo
+from .model import create_model
+from .pyomoio import get_entity, set_start_values
+from .runfunctions import setup_solver, warm_start_options
+from .saveload import ResultContainer, create_result_cache
+
+# ROLLING HORIZON DISPATCH
+# Operates given capacities (e.g. of an expansion run) over a long horizon
+# in consecutive windows, each solved with a lookahead to avoid end effects
+# (e.g. emptied storages). Only one window is held in memory at a time; the
+# storage content and process throughput at the end of the committed part
+# of a window are the initial values of the next; its solution on the
+# overlapping timesteps is the start of the next solve.
+
+# new capacity variables fixed to the values of a given result
+CAPACITY_VARIABLES = ['cap_pro_new', 'cap_sto_c_new', 'cap_sto_p_new',
+                      'cap_tra_new']
+
+# cost types that scale with the modelled timesteps
+TIME_DEPENDENT_COSTS = ['Variable', 'Fuel', 'Environmental', 'Revenue',
+                        'Purchase']
+
+
+def run_rolling_horizon(data, capacities, Solver, timesteps, window=168,
+                        lookahead=24, dt=1, objective='cost',
+                        logfile='solver.log'):
+    """Dispatch fixed capacities over a long horizon in rolling windows.
+
+    Each window models window + lookahead timesteps, of which the first
+    window are kept. The new capacities are fixed to the values of a
+    previous result, so that only the dispatch is optimized. The storage
+    initial state constraints apply to the first window, the final state
+    constraints to the last; variable initial storage contents of the first
+    window must be reached again at the end of the last. Annual limits
+    (stock, environmental, CO2) apply to each window pro rata (c.f.
+    m.weight).
+
+    Args:
+        - data: a dict of input DataFrames, as returned by read_input
+        - capacities: result with the capacities to be dispatched, e.g. as
+          returned by load (uses cap_pro_new, cap_sto_c_new, cap_sto_p_new
+          and cap_tra_new)
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761)
+        - window: number of kept timesteps per window, default: 168
+        - lookahead: number of additional timesteps per window, default: 24
+        - dt: length of each time step (unit: hours)
+        - objective: objective function chosen (either "cost" or "CO2")
+        - logfile: solver log file name
+
+    Returns:
+        a ResultContainer with the results of all windows, for report and
+        result_figures
+    """
+    if 'period' in data:
+        raise ValueError('Rolling horizon dispatch requires chronological '
+                         'timesteps, not representative periods.')
+
+    timesteps = list(timesteps)
+    steps = timesteps[1:]
+    fixed = {name: get_entity(capacities, name)
+             for name in CAPACITY_VARIABLES}
+
+    optim = setup_solver(Solver, logfile=logfile)
+
+    results = []
+    previous = None
+    initial_levels = None
+    for start in range(0, len(steps), window):
+        kept = steps[start:start + window]
+        last = start + window >= len(steps)
+        prob = create_model(data, dt,
+                            [timesteps[start]] +
+                            steps[start:start + window + lookahead],
+                            objective)
+        fix_capacities(prob, fixed)
+        link_window(prob, previous, initial_levels, last)
+
+        options = {}
+        if previous is not None:
+            set_start_values(prob, ResultContainer(data, previous))
+            options = warm_start_options(optim, prob)
+        result = optim.solve(prob, **options)
+        if str(result.solver.termination_condition) != 'optimal':
+            raise RuntimeError('Window starting at timestep {} is {}.'.format(
+                kept[0], result.solver.termination_condition))
+
+        previous = create_result_cache(prob)
+        if initial_levels is None and hasattr(prob, 'e_sto_con'):
+            initial_levels = previous['e_sto_con'].xs(timesteps[0],
+                                                      level=0)
+        results.append((kept if start else timesteps[:1] + kept,
+                        len(kept), previous))
+
+    return ResultContainer(data, stitch_results(results, len(steps)))
+
+
+def fix_capacities(prob, fixed):
+    """Fix the new capacity variables of a model.
+
+    Args:
+        - prob: a urbs model instance
+        - fixed: dict of Series with the values of CAPACITY_VARIABLES
+    """
+    for name, values in fixed.items():
+        var = prob.find_component(name)
+        if var is None:
+            continue
+        for index in var:
+            var[index].fix(max(0, values[index]))
+
+
+def link_window(prob, previous, initial_levels, last):
+    """Connect a window to the result of the previous one.
+
+    Fixes the storage content and process throughput of the initial timestep
+    to the previous result and (de)activates the storage initial and final
+    state constraints, c.f. run_rolling_horizon.
+
+    Args:
+        - prob: a urbs model instance of the window
+        - previous: result cache of the previous window, or None
+        - initial_levels: storage contents at the start of the first window
+        - last: True for the last window
+    """
+    t0 = prob.t.first()
+    first = previous is None
+    sto = hasattr(prob, 'e_sto_con')
+
+    if not first:
+        for index in prob.pro_tuples:
+            prob.tau_pro[(t0,) + index].fix(
+                previous['tau_pro'][(t0,) + index])
+        if sto:
+            for index in prob.sto_tuples:
+                prob.e_sto_con[(t0,) + index].fix(
+                    max(0, previous['e_sto_con'][(t0,) + index]))
+            prob.res_initial_storage_state.deactivate()
+    if not sto or (first and last):
+        return
+
+    prob.res_initial_and_final_storage_state_var.deactivate()
+    if not last:
+        prob.res_final_storage_state.deactivate()
+    else:
+        prob.initial_storage_levels = initial_levels
+        prob.res_rolling_final_storage_state = pyomo.Constraint(
+            prob.sto_tuples - prob.sto_init_bound_tuples,
+            rule=res_rolling_final_storage_state_rule,
+            doc='storage content final >= storage content initial of the '
+                'first window')
+
+
+def res_rolling_final_storage_state_rule(m, stf, sit, sto, com):
+    return (m.e_sto_con[m.t.last(), stf, sit, sto, com] >=
+            m.initial_storage_levels[(stf, sit, sto, com)])
+
+
+def stitch_results(results, steps):
+    """Combine the result caches of rolling windows.
+
+    Time-indexed entities are taken from the kept timesteps of each window,
+    all others from the first window. The annual time-dependent costs are
+    averaged over the windows, weighted by their kept timesteps; the weight
+    covers the full horizon.
+
+    Args:
+        - results: list of (kept timesteps, number of kept modelled
+          timesteps, result cache) tuples
+        - steps: total number of modelled timesteps
+
+    Returns:
+        a result cache dict
+    """
+    stitched = {}
+    for name, first in results[0][2].items():
+        if 't' not in first.index.names:
+            stitched[name] = first
+            continue
+        stitched[name] = pd.concat(
+            [cache[name][cache[name].index.get_level_values('t')
+                         .isin(kept)]
+             for kept, _, cache in results])
+
+    costs = stitched['costs'].copy()
+    for cost_type in TIME_DEPENDENT_COSTS:
+        if cost_type in costs.index:
+            costs[cost_type] = sum(
+                cache['costs'][cost_type] * count / steps
+                for _, count, cache in results)
+    stitched['costs'] = costs
+
+    # c.f. timestep_weights, the initial timestep lasting as the first one
+    durations = stitched['dt']
+    hours = durations.iloc[0] + durations.sum()
+    stitched['weight'] = pd.Series(float(8760) / hours,
+                                   index=durations.index, name='weight')
+    return stitched
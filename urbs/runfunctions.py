@@ -1,8 +1,13 @@
 import os
 import pyomo.environ
+from concurrent.futures import ProcessPoolExecutor
 from pyomo.opt.base import SolverFactory
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
 from datetime import datetime, date
-from .model import create_model
+from .aggregation import aggregate_periods
+from .independent import run_independent
+from .model import create_model, update_model
+from .pyomoio import set_start_values
 from .report import *
 from .plot import *
 from .input import *
@@ -31,12 +36,58 @@ def prepare_result_directory(result_name):
     return result_dir
 
 
-def setup_solver(optim, logfile='solver.log'):
-    """ """
-    if optim.name == 'gurobi':
+# in-memory interfaces of solvers with Python bindings, which pass the model
+# to the solver and read the solution back directly, without writing and
+# parsing problem and solution files
+IN_MEMORY_SOLVERS = {
+    'highs': 'appsi_highs',  # package highspy
+    'gurobi': 'gurobi_direct',  # package gurobipy
+}
+
+
+def solver_factory(Solver):
+    """Create a solver instance, preferring its in-memory interface.
+
+    Args:
+        - Solver: solver name, e.g. 'glpk', 'gurobi' or 'highs'
+
+    Returns:
+        the in-memory interface (c.f. IN_MEMORY_SOLVERS) if available,
+        otherwise SolverFactory(Solver)
+    """
+    if Solver in IN_MEMORY_SOLVERS:
+        optim = SolverFactory(IN_MEMORY_SOLVERS[Solver])
+        if optim.available(exception_flag=False):
+            return optim
+    return SolverFactory(Solver)
+
+
+def setup_solver(optim, logfile='solver.log', threads=None):
+    """ set log file (and thread) options of a solver instance
+
+    Args:
+        - optim: a solver instance, or a solver name to select the solver
+          instance by (c.f. solver_factory)
+        - logfile: solver log file name
+        - threads: (optional) number of solver threads
+
+    Returns:
+        the solver instance
+    """
+    if isinstance(optim, str):
+        optim = solver_factory(optim)
+
+    if hasattr(optim, 'highs_options'):
+        # in-memory HiGHS interface (appsi_highs), options of highspy
+        optim.options['log_file'] = logfile
+        if threads:
+            optim.options['threads'] = threads
+    elif optim.name in ('gurobi', 'gurobi_persistent', 'gurobi_direct'):
         # reference with list of option names
         # http://www.gurobi.com/documentation/5.6/reference-manual/parameters
         optim.set_options("logfile={}".format(logfile))
+        if threads:
+            optim.set_options("threads={}".format(threads))
         # optim.set_options("timelimit=7200")  # seconds
         # optim.set_options("mipgap=5e-4")  # default = 1e-4
     elif optim.name == 'glpk':
@@ -47,16 +98,69 @@ def setup_solver(optim, logfile='solver.log'):
         # optim.set_options("mipgap=.0005")
     elif optim.name == 'cplex':
         optim.set_options("log={}".format(logfile))
+        if threads:
+            optim.set_options("threads={}".format(threads))
     else:
         print("Warning from setup_solver: no options set for solver "
               "'{}'!".format(optim.name))
     return optim
 
 
+def warm_start_options(optim, prob):
+    """Pass the variable values of a model instance as start to a solver.
+
+    The values are typically those of a previous solution (c.f.
+    set_start_values). A persistent Gurobi instance (with prob already set
+    as its instance) receives them as primal start vector, which Gurobi
+    also uses for LPs; other solvers that support warm starts get the
+    warmstart option.
+
+    Args:
+        - optim: a solver instance
+        - prob: a urbs model instance with start values
+
+    Returns:
+        dict of keyword arguments for optim.solve
+    """
+    if getattr(optim, 'name', None) == 'gurobi_persistent':
+        for var in prob.component_data_objects(pyomo.environ.Var):
+            if var.value is not None and not var.fixed:
+                optim.set_var_attr(var, 'PStart', var.value)
+        return {}
+    if (hasattr(optim, 'warm_start_capable') and
+            optim.warm_start_capable()):
+        return {'warmstart': True}
+    return {}
+
+
+def scenario_cache_dir(input_files, cache):
+    """Return the directory of cached scenario results.
+
+    Args:
+        - input_files: filenames of input Excel spreadsheets
+        - cache: True for the default directory, the subfolder
+          '.cache/results' next to the input spreadsheets, which persists
+          between runs; or a directory name; or False for no cache
+
+    Returns:
+        the cache directory, or None if cache is False
+    """
+    if not cache:
+        return None
+    if cache is not True:
+        return cache
+    if os.path.isdir(input_files):
+        input_dir = input_files
+    else:
+        input_dir = os.path.dirname(input_files)
+    return os.path.join(input_dir, '.cache', 'results')
+
+
 def run_scenario(input_files, Solver, timesteps, scenario, result_dir, dt,
                  objective, plot_tuples=None,  plot_sites_name=None,
                  plot_periods=None, report_tuples=None,
-                 report_sites_name=None):
+                 report_sites_name=None, warmstart=None, cache=False,
+                 decompose=False):
     """ run an urbs model for given input, time steps and scenario
 
     Args:
@@ -75,9 +179,26 @@ def run_scenario(input_files, Solver, timesteps, scenario, result_dir, dt,
           (c.f. urbs.report)
         - report_sites_name: (optional) dict of names for sites in
           report_tuples
+        - warmstart: (optional) previous solution to start from, e.g. of a
+          similar scenario: a solved urbs model instance, a result
+          container or the filename of a saved result (c.f. load);
+          variables are mapped by name and index
+        - cache: (optional) if True or a directory name, the result is
+          saved to, or if already present loaded from, a cache file named
+          by a hash of the scenario input, settings and model code (c.f.
+          scenario_cache_file), so that reruns skip solved scenarios; the
+          cache directory defaults to the subfolder '.cache/results' next to
+          the input (c.f. scenario_cache_dir), default: False
+        - decompose: (optional) if True and the support timeframes are
+          independent (c.f. identify_independent), they are solved in
+          parallel by run_independent instead of as one model; if that
+          fails, the model is solved as a whole, default: False
 
     Returns:
-        the urbs model instance
+        the solved urbs model instance; with cache or decompose, a
+        ResultContainer of its result in every case (c.f. load), as the
+        result may be loaded from the cache or merged from the independent
+        support timeframes
     """
 
     # sets a modeled year for non-intertemporal problems
@@ -90,21 +211,84 @@ def run_scenario(input_files, Solver, timesteps, scenario, result_dir, dt,
     data = scenario(data)
     validate_input(data)
 
-    # create model
-    prob = create_model(data, dt, timesteps, objective)
-    # prob.write('model.lp', io_options={'symbolic_solver_labels':True})
-
     # refresh time stamp string and create filename for logfile
     log_filename = os.path.join(result_dir, '{}.log').format(sce)
 
-    # solve model and read results
-    optim = SolverFactory(Solver)  # cplex, glpk, gurobi, ...
-    optim = setup_solver(optim, logfile=log_filename)
-    result = optim.solve(prob, tee=True)
-    assert str(result.solver.termination_condition) == 'optimal'
+    cache_file = None
+    if cache:
+        cache_file = scenario_cache_file(
+            data, (list(timesteps), dt, objective, Solver, {}),
+            scenario_cache_dir(input_files, cache))
+
+    prob = None
+    if cache_file is not None and os.path.exists(cache_file):
+        # solved before with identical input
+        prob = load(cache_file)
+    elif decompose and objective == 'cost' and identify_independent(data):
+        # solve the support timeframes in parallel (c.f. run_independent)
+        try:
+            prob = run_independent(data, Solver, timesteps, dt,
+                                   logfile=log_filename)
+        except Exception as error:
+            print("Warning from run_scenario: independent support "
+                  "timeframes failed ({!r}), solving the whole model "
+                  "instead".format(error))
+
+    if prob is None:
+        # create model
+        prob = create_model(data, dt, timesteps, objective)
+        # prob.write('model.lp', io_options={'symbolic_solver_labels':True})
+
+        # solve model and read results
+        # cplex, glpk, gurobi, highs, ...
+        optim = setup_solver(Solver, logfile=log_filename)
+        options = {}
+        if warmstart is not None:
+            if isinstance(warmstart, str):
+                warmstart = load(warmstart)
+            set_start_values(prob, warmstart)
+            options = warm_start_options(optim, prob)
+        result = optim.solve(prob, tee=True, **options)
+        assert str(result.solver.termination_condition) == 'optimal'
+
+    if cache_file is not None and not os.path.exists(cache_file):
+        write_scenario_cache(prob, cache_file)
+
+    write_results(prob, sce, result_dir, timesteps,
+                  plot_tuples=plot_tuples,
+                  plot_sites_name=plot_sites_name,
+                  plot_periods=plot_periods,
+                  report_tuples=report_tuples,
+                  report_sites_name=report_sites_name)
+
+    if (cache or decompose) and not isinstance(prob, ResultContainer):
+        # the same return type whether or not the model was solved here
+        prob = ResultContainer(prob._data, prob._result)
+    return prob
+
+
+def write_results(prob, sce, result_dir, timesteps, plot_tuples=None,
+                  plot_sites_name=None, plot_periods=None,
+                  report_tuples=None, report_sites_name=None,
+                  save_only=False):
+    """ save, report and plot the results of a solved scenario
+
+    Args:
+        - prob: a solved urbs model instance
+        - sce: scenario name, used as file name prefix
+        - result_dir: directory name for result spreadsheet and plots
+        - timesteps: a list of timesteps, e.g. range(0,8761)
+        - plot_tuples, plot_sites_name, plot_periods, report_tuples,
+          report_sites_name: (optional) c.f. run_scenario
+        - save_only: (optional) if True, only the HDF5 file is written
 
+    Returns:
+        Nothing
+    """
     # save problem solution (and input data) to HDF5 file
     save(prob, os.path.join(result_dir, '{}.h5'.format(sce)))
+    if save_only:
+        return
 
     # write report to spreadsheet
     report(
@@ -124,4 +308,271 @@ def run_scenario(input_files, Solver, timesteps, scenario, result_dir, dt,
         periods=plot_periods,
         figure_size=(24, 9))
 
-    return prob
+
+# constraints containing the parameters changed by update_model
+UPDATED_CONSTRAINTS = ['def_costs', 'res_process_capacity',
+                       'res_global_co2_limit']
+
+
+def run_scenarios(input_files, Solver, timesteps, scenarios, result_dir, dt,
+                  objective, plot_tuples=None, plot_sites_name=None,
+                  plot_periods=None, report_tuples=None,
+                  report_sites_name=None, jobs=1, threads=None,
+                  periods=None, period_length=24, cache=False,
+                  save_only=False, decompose=False):
+    """ run an urbs model for a batch of scenarios, reusing the model
+
+    The input is read once. The model is built with mutable parameters for
+    the first scenario; following scenarios are applied to it with
+    update_model and re-solved, if possible with a persistent solver
+    instance (e.g. 'gurobi_persistent') that keeps the previous solution as
+    a warm start. Scenarios that change the model structure (e.g.
+    scenario_no_dsm) lead to a rebuild of the model, which starts from the
+    previous solution, mapped by variable name and index (c.f.
+    warm_start_options).
+
+    The warm start, and thus most of the speedup of the reused model, only
+    applies to solvers with a persistent interface (e.g. gurobi, cplex) or
+    warm start support. Solvers without either, such as the default glpk,
+    ignore the start values and re-solve each updated model from scratch;
+    which path is taken is printed at the start of the batch.
+
+    With jobs > 1, the scenarios are split into consecutive groups that are
+    run in parallel worker processes, each with its own model. Scenario
+    functions must therefore be picklable (i.e. defined at module level)
+    and the calling script must be guarded by if __name__ == '__main__'.
+
+    With cache, scenarios solved before with identical input, settings and
+    model code (in this or an earlier, e.g. interrupted, batch) are loaded
+    from the cache instead of solved (c.f. run_scenario).
+
+    With periods, the input time series are aggregated to representative
+    periods once, before the scenarios are applied (c.f.
+    aggregate_periods). Plot periods then refer to the timesteps of the
+    aggregated time series.
+
+    Args:
+        - input_files: filenames of input Excel spreadsheets
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761)
+        - scenarios: list of scenario functions (c.f. run_scenario)
+        - result_dir: directory name for result spreadsheet and plots
+        - dt: length of each time step (unit: hours)
+        - objective: objective function chosen (either "cost" or "CO2")
+        - plot_tuples, plot_sites_name, plot_periods, report_tuples,
+          report_sites_name: (optional) c.f. run_scenario
+        - jobs: (optional) number of worker processes, default: 1
+        - threads: (optional) number of threads per solver, default: all
+          cores if jobs == 1, otherwise cores divided by jobs
+        - periods: (optional) number of representative periods, default:
+          no aggregation
+        - period_length: (optional) timesteps per representative period,
+          default: 24
+        - cache: (optional) use the scenario result cache, True or its
+          directory (c.f. run_scenario), default: False
+        - save_only: (optional) if True, only the HDF5 file of each scenario
+          is written, without report spreadsheet and plots
+        - decompose: (optional) solve scenarios with independent support
+          timeframes by run_independent (c.f. run_scenario), default: False
+
+    Returns:
+        list of termination conditions (strings), in order of scenarios
+    """
+    # input is read once and passed to the worker processes
+    year = date.today().year
+    base = read_input(input_files, year)
+    if periods:
+        base = aggregate_periods(base, timesteps, periods, period_length)
+        timesteps = (base['demand'].index.get_level_values('t')
+                     .unique().tolist())
+
+    cache_dir = scenario_cache_dir(input_files, cache)
+
+    jobs = min(jobs, len(scenarios))
+    if jobs > 1:
+        if threads is None:
+            threads = max(1, (os.cpu_count() or 1) // jobs)
+
+        # consecutive groups of scenarios with sizes differing by at most 1
+        size, rest = divmod(len(scenarios), jobs)
+        groups, start = [], 0
+        for i in range(jobs):
+            end = start + size + (1 if i < rest else 0)
+            groups.append(scenarios[start:end])
+            start = end
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(_run_scenario_group, base, Solver, timesteps,
+                            group, result_dir, dt, objective,
+                            plot_tuples=plot_tuples,
+                            plot_sites_name=plot_sites_name,
+                            plot_periods=plot_periods,
+                            report_tuples=report_tuples,
+                            report_sites_name=report_sites_name,
+                            threads=threads, independent_jobs=1,
+                            cache_dir=cache_dir, save_only=save_only,
+                            decompose=decompose)
+                for group in groups]
+            status = []
+            for group, future in zip(groups, futures):
+                try:
+                    status.extend(future.result())
+                except Exception as error:
+                    # keep the statuses of the other groups
+                    print("Warning from run_scenarios: scenario group {} "
+                          "failed: {!r}".format(
+                              [s.__name__ for s in group], error))
+                    status.extend(['error'] * len(group))
+            return status
+
+    return _run_scenario_group(base, Solver, timesteps, scenarios,
+                               result_dir, dt, objective,
+                               plot_tuples=plot_tuples,
+                               plot_sites_name=plot_sites_name,
+                               plot_periods=plot_periods,
+                               report_tuples=report_tuples,
+                               report_sites_name=report_sites_name,
+                               threads=threads, cache_dir=cache_dir,
+                               save_only=save_only, decompose=decompose)
+
+
+def _run_scenario_group(base, Solver, timesteps, scenarios, result_dir, dt,
+                        objective, plot_tuples=None, plot_sites_name=None,
+                        plot_periods=None, report_tuples=None,
+                        report_sites_name=None, threads=None,
+                        independent_jobs=None, cache_dir=None,
+                        save_only=False, decompose=False):
+    """ run scenarios one after another on a reused model
+
+    Scenarios found in the result cache are loaded instead of solved.
+    With decompose, scenarios with independent support timeframes (c.f.
+    identify_independent) are solved by run_independent instead, falling
+    back to the reused model if that fails.
+
+    Args: c.f. run_scenarios, with base being the unmodified input data dict,
+    independent_jobs the number of worker processes of run_independent and
+    cache_dir the directory of the scenario result cache (None: no cache)
+
+    Returns:
+        list of termination conditions (strings), in order of scenarios
+    """
+    # use persistent solver interface if available
+    optim = SolverFactory('{}_persistent'.format(Solver))
+    if not optim.available(exception_flag=False):
+        optim = solver_factory(Solver)
+    persistent = isinstance(optim, PersistentSolver)
+    if persistent:
+        print("Info from run_scenarios: solver '{}' reuses its instance "
+              "and warm starts from the previous scenario's solution"
+              .format(optim.name))
+    elif not (hasattr(optim, 'warm_start_capable') and
+              optim.warm_start_capable()):
+        print("Info from run_scenarios: solver '{}' has no persistent "
+              "interface and ignores start values; updated models are "
+              "re-solved from scratch".format(optim.name))
+    else:
+        print("Info from run_scenarios: solver '{}' has no persistent "
+              "interface; updated models are re-solved with the previous "
+              "solution as warm start".format(optim.name))
+
+    prob = None
+    optimal = False  # prob holds an optimal solution
+    status = []
+    for scenario in scenarios:
+        sce = scenario.__name__
+        data = scenario({name: df.copy(deep=True)
+                         for name, df in base.items()})
+        validate_input(data)
+
+        log_filename = os.path.join(result_dir, '{}.log').format(sce)
+        cache_file = None
+        if cache_dir is not None:
+            cache_file = scenario_cache_file(
+                data, (list(timesteps), dt, objective, Solver,
+                       {'mutable': True}),
+                cache_dir)
+            if os.path.exists(cache_file):
+                # solved before with identical input
+                status.append('optimal')
+                write_results(load(cache_file), sce, result_dir, timesteps,
+                              plot_tuples=plot_tuples,
+                              plot_sites_name=plot_sites_name,
+                              plot_periods=plot_periods,
+                              report_tuples=report_tuples,
+                              report_sites_name=report_sites_name,
+                              save_only=save_only)
+                continue
+
+        independent = None
+        if (decompose and objective == 'cost' and
+                identify_independent(data)):
+            try:
+                independent = run_independent(data, Solver, timesteps, dt,
+                                              jobs=independent_jobs,
+                                              logfile=log_filename)
+            except Exception as error:
+                print("Warning from run_scenarios: independent support "
+                      "timeframes of {} failed ({!r}), solving the whole "
+                      "model instead".format(sce, error))
+        if independent is not None:
+            status.append('optimal')
+            if cache_file is not None:
+                write_scenario_cache(independent, cache_file)
+            write_results(independent, sce, result_dir, timesteps,
+                          plot_tuples=plot_tuples,
+                          plot_sites_name=plot_sites_name,
+                          plot_periods=plot_periods,
+                          report_tuples=report_tuples,
+                          report_sites_name=report_sites_name,
+                          save_only=save_only)
+            continue
+
+        optim = setup_solver(optim, logfile=log_filename, threads=threads)
+
+        if prob is not None and update_model(prob, data):
+            # remove cached results of the previous scenario
+            if hasattr(prob, '_result'):
+                del prob._result
+            if persistent:
+                for name in UPDATED_CONSTRAINTS:
+                    con = prob.find_component(name)
+                    if con is None:
+                        continue
+                    for c in con.values():
+                        optim.remove_constraint(c)
+                        optim.add_constraint(c)
+            # the reused model holds the previous solution
+            options = {}
+            if optimal and not persistent:
+                options = warm_start_options(optim, prob)
+        else:
+            previous = prob
+            prob = create_model(data, dt, timesteps, objective, mutable=True)
+            if persistent:
+                optim.set_instance(prob)
+            # start from the solution of the previous scenario
+            options = {}
+            if optimal:
+                set_start_values(prob, previous)
+                options = warm_start_options(optim, prob)
+
+        if persistent:
+            result = optim.solve(tee=True, **options)
+        else:
+            result = optim.solve(prob, tee=True, **options)
+        status.append(str(result.solver.termination_condition))
+        optimal = status[-1] == 'optimal'
+
+        if optimal:
+            if cache_file is not None:
+                write_scenario_cache(prob, cache_file)
+            write_results(prob, sce, result_dir, timesteps,
+                          plot_tuples=plot_tuples,
+                          plot_sites_name=plot_sites_name,
+                          plot_periods=plot_periods,
+                          report_tuples=report_tuples,
+                          report_sites_name=report_sites_name,
+                          save_only=save_only)
+
+    return status
@@ -1,3 +1,7 @@
+import glob
+import hashlib
+import os
+import tempfile
 import pandas as pd
 from .pyomoio import get_entity, list_entities
 
@@ -11,6 +15,11 @@ def create_result_cache(prob):
     for entity_type in entity_types:
         entities.extend(list_entities(prob, entity_type).index.tolist())
 
+    # process flows are expressions in the compact formulation
+    for entity in ['e_pro_in', 'e_pro_out']:
+        if entity not in entities and hasattr(prob, entity):
+            entities.append(entity)
+
     result_cache = {}
     for entity in entities:
         result_cache[entity] = get_entity(prob, entity)
@@ -41,6 +50,84 @@ def save(prob, filename):
             store['result/'+name] = prob._result[name]
 
 
+_source_hash = None
+
+
+def source_hash():
+    """Return a hash of the source code of the urbs package.
+
+    It serves as version stamp of cached results, so that a change of the
+    model code does not match results cached before.
+    """
+    global _source_hash
+    if _source_hash is None:
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha1()
+        for filename in sorted(glob.glob(os.path.join(package_dir, '**',
+                                                      '*.py'),
+                                         recursive=True)):
+            digest.update(os.path.relpath(filename, package_dir).encode())
+            with open(filename, 'rb') as f:
+                digest.update(f.read())
+        _source_hash = digest.hexdigest()
+    return _source_hash
+
+
+def scenario_cache_file(data, settings, cache_dir):
+    """Return the cache file name of a scenario result.
+
+    The name is a hash of the input data of the scenario (i.e. after the
+    scenario function is applied), of the settings of the run and of the
+    urbs source code (c.f. source_hash), so that scenarios with identical
+    input share their result and any change to the input or the model does
+    not match a previous cache file.
+
+    Args:
+        - data: input data dict of the scenario
+        - settings: tuple of everything else determining the result, e.g.
+          (timesteps, dt, objective, solver, create_model options)
+        - cache_dir: cache directory, e.g. given by scenario_cache_dir
+
+    Returns:
+        the HDF5 cache file name
+    """
+    digest = hashlib.sha1(source_hash().encode())
+    for name in sorted(data):
+        df = data[name]
+        digest.update(repr((name, list(df.index.names),
+                            df.columns.tolist())).encode())
+        digest.update(pd.util.hash_pandas_object(df).values.tobytes())
+    for setting in settings:
+        if isinstance(setting, (pd.Series, pd.DataFrame)):
+            # the repr of long Series is abbreviated
+            digest.update(
+                pd.util.hash_pandas_object(setting).values.tobytes())
+        else:
+            digest.update(repr(setting).encode())
+    return os.path.join(cache_dir, '{}.h5'.format(digest.hexdigest()))
+
+
+def write_scenario_cache(prob, cache_file):
+    """Save a scenario result to its cache file.
+
+    The file is written to a temporary file first, so that an interrupted
+    run or concurrent runs never leave an incomplete cache file.
+
+    Args:
+        - prob: a urbs model instance or result container with a solution
+        - cache_file: file name given by scenario_cache_file
+
+    Returns:
+        Nothing
+    """
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    handle, tmp_file = tempfile.mkstemp(suffix='.h5', dir=cache_dir)
+    os.close(handle)
+    save(prob, tmp_file)
+    os.replace(tmp_file, cache_file)
+
+
 class ResultContainer(object):
     """ Result/input data container for reporting functions. """
     def __init__(self, data, result):
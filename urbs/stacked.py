@@ -0,0 +1,108 @@
+import pyomo.core as pyomo
+from .model import create_model
+from .runfunctions import setup_solver
+from .saveload import ResultContainer, create_result_cache
+from .validation import validate_input
+
+# STACKED SCENARIOS
+# For small models, writing the problem file and starting the solver take
+# longer than the solution itself. run_stacked therefore builds the models
+# of several scenarios as independent blocks of one model, whose objective
+# is the sum of their objectives, and solves them with a single solver call.
+# As the blocks share no variables, the optimum of the stack is the optimum
+# of each scenario.
+
+
+def run_stacked(data, scenarios, Solver, timesteps=None, dt=1,
+                objective='cost', logfile='solver.log'):
+    """Solve several scenarios of a small model as one stacked model.
+
+    Args:
+        - data: input data dict, not modified
+        - scenarios: list of scenario functions (c.f. urbs.scenarios)
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761); default: all
+          timesteps of the demand time series
+        - dt: length of each time step (unit: hours)
+        - objective: objective function chosen (either "cost" or "CO2")
+        - logfile: solver log file name
+
+    Returns:
+        dict of ResultContainers by scenario name, e.g. for save, report
+        and result_figures
+    """
+    inputs = {}
+    for scenario in scenarios:
+        scenario_data = scenario({name: df.copy(deep=True)
+                                  for name, df in data.items()})
+        validate_input(scenario_data)
+        inputs[scenario.__name__] = scenario_data
+
+    stack = create_stacked_model(inputs, dt, timesteps, objective)
+    optim = setup_solver(Solver, logfile=logfile)
+    result = optim.solve(stack, tee=True)
+    if str(result.solver.termination_condition) != 'optimal':
+        raise RuntimeError('Stacked model is {}.'.format(
+            result.solver.termination_condition))
+    return split_stacked_model(stack)
+
+
+def create_stacked_model(inputs, dt=1, timesteps=None, objective='cost',
+                         dual=True):
+    """Create one model with a block per scenario.
+
+    Args:
+        - inputs: dict of input data dicts by scenario name
+        - dt, timesteps, objective, dual: c.f. create_model
+
+    Returns:
+        a pyomo ConcreteModel with the scenario models as blocks
+        scenario_0, scenario_1, ... (in order of inputs), minimizing the
+        sum of their objectives
+    """
+    stack = pyomo.ConcreteModel()
+    stack.name = 'urbs-stacked'
+    stack.scenario_names = list(inputs)
+
+    for i, data in enumerate(inputs.values()):
+        m = create_model(data, dt, timesteps, objective, dual=False)
+        m.objective_function.deactivate()
+        stack.add_component('scenario_{}'.format(i), m)
+
+    stack.objective_function = pyomo.Objective(
+        expr=sum(m.objective_function.expr for m in stacked_blocks(stack)),
+        sense=pyomo.minimize,
+        doc='minimize(sum of scenario objectives)')
+
+    # duals are imported into the top-level model only (c.f.
+    # split_stacked_model)
+    if dual:
+        stack.dual = pyomo.Suffix(direction=pyomo.Suffix.IMPORT)
+    return stack
+
+
+def stacked_blocks(stack):
+    """List the scenario blocks of a stacked model, in order."""
+    return [getattr(stack, 'scenario_{}'.format(i))
+            for i in range(len(stack.scenario_names))]
+
+
+def split_stacked_model(stack):
+    """Result caches of the scenarios of a solved stacked model.
+
+    Args:
+        - stack: a solved model created by create_stacked_model
+
+    Returns:
+        dict of ResultContainers by scenario name
+    """
+    results = {}
+    for name, m in zip(stack.scenario_names, stacked_blocks(stack)):
+        if hasattr(stack, 'dual'):
+            m.dual = pyomo.Suffix(direction=pyomo.Suffix.IMPORT)
+            for con in m.component_data_objects(pyomo.Constraint,
+                                                active=True):
+                if con in stack.dual:
+                    m.dual[con] = stack.dual[con]
+        results[name] = ResultContainer(m._data, create_result_cache(m))
+    return results
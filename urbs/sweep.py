@@ -0,0 +1,180 @@
+import itertools
+import os
+from collections import namedtuple
+from functools import partial
+import numpy as np
+import pandas as pd
+from .output import get_constants
+from .runfunctions import run_scenarios
+from .saveload import load
+
+# PARAMETER SWEEPS
+# A sweep is the grid of all combinations of the values of its axes. Each
+# axis modifies one column of one input DataFrame, restricted to the rows
+# matching the given index labels, e.g.
+#   SweepAxis('co2', 'global_prop', 'value', [1, 0.5, 0.1],
+#             rows={'Property': 'CO2 limit'})
+#   SweepAxis('gas', 'commodity', 'price', [1, 1.5, 2],
+#             rows={'Commodity': 'Gas'})
+#   SweepAxis('pv', 'process', 'cap-up', [1e5, 2e5],
+#             rows={'Process': 'Photovoltaics'}, operation='set')
+# The values scale the selected entries (operation 'scale') or replace them
+# (operation 'set'). Each grid point becomes a scenario of run_scenarios.
+
+SweepAxis = namedtuple('SweepAxis',
+                       ['name', 'sheet', 'column', 'values', 'rows',
+                        'operation'],
+                       defaults=[None, 'scale'])
+
+SWEEP_OPERATIONS = ['scale', 'set']
+
+
+def sweep_scenarios(axes):
+    """Expand sweep axes to scenario functions.
+
+    The grid points are ordered with the last axis varying fastest, so that
+    consecutive scenarios mostly differ in one value and can be solved on
+    the same model (c.f. update_model).
+
+    Args:
+        - axes: list of SweepAxis
+
+    Returns:
+        (coordinates, scenarios) tuple: a DataFrame of the axis values per
+        scenario name and the list of scenario functions (picklable, with
+        the scenario name as __name__)
+    """
+    axes = tuple(axes)
+    for axis in axes:
+        if axis.operation not in SWEEP_OPERATIONS:
+            raise ValueError("Unknown operation '{}' of sweep axis '{}'."
+                             .format(axis.operation, axis.name))
+
+    points = list(itertools.product(*(axis.values for axis in axes)))
+    names = ['sweep_{:0{}d}'.format(i, len(str(len(points))))
+             for i in range(len(points))]
+    scenarios = []
+    for name, point in zip(names, points):
+        scenario = partial(apply_sweep_point, axes=axes, point=point)
+        scenario.__name__ = name
+        scenarios.append(scenario)
+
+    coordinates = pd.DataFrame(points, columns=[axis.name for axis in axes],
+                               index=pd.Index(names, name='scenario'))
+    return coordinates, scenarios
+
+
+def apply_sweep_point(data, axes, point):
+    """Scenario function of one grid point.
+
+    Args:
+        - data: input data dict
+        - axes: list of SweepAxis
+        - point: one value per axis
+
+    Returns:
+        the modified input data dict
+    """
+    for axis, value in zip(axes, point):
+        df = data[axis.sheet]
+        if axis.column not in df.columns:
+            raise ValueError("Sweep axis '{}': no column '{}' in '{}'."
+                             .format(axis.name, axis.column, axis.sheet))
+        selected = np.ones(len(df), dtype=bool)
+        for level, labels in (axis.rows or {}).items():
+            if not isinstance(labels, (list, tuple, set)):
+                labels = [labels]
+            selected &= df.index.get_level_values(level).isin(labels)
+        if not selected.any():
+            raise ValueError("Sweep axis '{}' selects no rows of '{}'."
+                             .format(axis.name, axis.sheet))
+        if axis.operation == 'scale':
+            df.loc[selected, axis.column] *= value
+        else:
+            df.loc[selected, axis.column] = value
+    return data
+
+
+def run_sweep(input_files, Solver, timesteps, axes, result_dir, dt,
+              objective, jobs=1, threads=None, periods=None,
+              period_length=24, cache=False):
+    """Solve all grid points of a parameter sweep.
+
+    The grid points are run as a batch of scenarios (c.f. run_scenarios),
+    i.e. split into consecutive groups solved in parallel worker processes,
+    each reusing its model between points where possible. Only the HDF5
+    file of each point is written to result_dir; the summary of all points
+    is collected in the result store 'sweep.h5' (c.f. collect_sweep).
+
+    Args:
+        - input_files: filenames of input Excel spreadsheets
+        - Solver: the user specified solver
+        - timesteps: a list of timesteps, e.g. range(0,8761)
+        - axes: list of SweepAxis
+        - result_dir: directory name for the result files
+        - dt: length of each time step (unit: hours)
+        - objective: objective function chosen (either "cost" or "CO2")
+        - jobs, threads, periods, period_length, cache: (optional) c.f.
+          run_scenarios
+
+    Returns:
+        dict of DataFrames, c.f. collect_sweep
+    """
+    coordinates, scenarios = sweep_scenarios(axes)
+    coordinates['status'] = run_scenarios(
+        input_files, Solver, timesteps, scenarios, result_dir, dt, objective,
+        jobs=jobs, threads=threads, periods=periods,
+        period_length=period_length, cache=cache, save_only=True)
+
+    results = collect_sweep(coordinates, result_dir)
+    with pd.HDFStore(os.path.join(result_dir, 'sweep.h5'), mode='w') as store:
+        for name, df in results.items():
+            store[name] = df
+    return results
+
+
+def collect_sweep(coordinates, result_dir):
+    """Collect the summary of all optimal grid points of a sweep.
+
+    Args:
+        - coordinates: DataFrame of the axis values and 'status' per
+          scenario name (c.f. sweep_scenarios)
+        - result_dir: directory with the HDF5 files of the scenarios
+
+    Returns:
+        dict of the coordinates and of the costs, process, transmission and
+        storage capacities (c.f. get_constants) of all optimal points,
+        indexed by the axis values followed by the index of get_constants
+    """
+    axes = [name for name in coordinates.columns if name != 'status']
+    summaries = {'costs': [], 'process': [], 'transmission': [],
+                 'storage': []}
+    keys = {name: [] for name in summaries}
+    for sce, row in coordinates.iterrows():
+        if row['status'] != 'optimal':
+            continue
+        key = tuple(row[axes]) if len(axes) > 1 else row[axes[0]]
+        prob = load(os.path.join(result_dir, '{}.h5'.format(sce)))
+        for name, df in zip(summaries, get_constants(prob)):
+            if not df.empty:
+                summaries[name].append(df)
+                keys[name].append(key)
+
+    results = {'coordinates': coordinates}
+    for name, parts in summaries.items():
+        if parts:
+            results[name] = pd.concat(parts, keys=keys[name], names=axes)
+    return results
+
+
+def load_sweep(filename):
+    """Load the result store of a sweep (c.f. run_sweep).
+
+    Args:
+        filename: an existing sweep.h5 file
+
+    Returns:
+        dict of DataFrames, c.f. collect_sweep
+    """
+    with pd.HDFStore(filename, mode='r') as store:
+        return {key.lstrip('/'): store[key] for key in store.keys()}
@@ -0,0 +1,91 @@
+import multiprocessing
+from multiprocessing.connection import Connection
+
+# SUBPROBLEM WORKERS
+# Decomposition methods (c.f. run_benders, run_admm) keep their subproblems
+# in memory and solve them repeatedly with updated parameters. Each
+# subproblem lives either in this process or in a worker process of its
+# own, connected by a pipe, so that all subproblems of an iteration are
+# solved in parallel. Requests are answered by a function serve(state,
+# request); the request 'result' is the last one.
+
+
+def start_subproblem(build, serve, args, parallel=True):
+    """Start a subproblem.
+
+    Args:
+        - build: function returning the state of the subproblem (e.g. the
+          model and solver instance), called with args
+        - serve: function answering a request, called with (state, request)
+        - args: tuple of arguments of build; must be picklable if parallel
+        - parallel: build and keep the subproblem in a worker process
+
+    Returns:
+        a subproblem handle for ask_subproblems and stop_subproblems
+    """
+    if not parallel:
+        return (build(*args), serve)
+    conn, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_worker,
+                                      args=(child, build, serve, args))
+    process.start()
+    child.close()
+    return (conn, process)
+
+
+def ask_subproblems(subproblems, requests):
+    """Send one request per subproblem and collect the replies.
+
+    Args:
+        - subproblems: dict of subproblem handles
+        - requests: dict of requests with the same keys (or a subset)
+
+    Returns:
+        dict of replies; errors of a subproblem are raised
+    """
+    for key, request in requests.items():
+        if isinstance(subproblems[key][0], Connection):
+            subproblems[key][0].send(request)
+    replies = {}
+    for key, request in requests.items():
+        handle, other = subproblems[key]
+        if isinstance(handle, Connection):
+            reply = handle.recv()
+        else:
+            reply = other(handle, request)
+        if isinstance(reply, Exception):
+            raise reply
+        replies[key] = reply
+    return replies
+
+
+def stop_subproblems(subproblems):
+    """End the worker processes of subproblems."""
+    for handle, other in subproblems.values():
+        if isinstance(handle, Connection):
+            handle.close()
+            other.join()
+
+
+def _worker(conn, build, serve, args):
+    """Build a subproblem and answer requests; an error while building is
+    the reply to the first request."""
+    try:
+        state, failure = build(*args), None
+    except Exception as error:
+        state, failure = None, error
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if failure is not None:
+            conn.send(failure)
+            return
+        try:
+            reply = serve(state, request)
+        except Exception as error:
+            reply = error
+        conn.send(reply)
+        if request == 'result':
+            return